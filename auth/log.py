@@ -0,0 +1,107 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+# copied into every service; tests/test_shared_modules.py keeps the copies identical
+
+# attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "sample"}
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """Keeps a fraction of records below WARNING.
+
+    ``LOG_SAMPLE_RATE`` sets the default; a call can pass
+    ``extra={"sample": 0.01}`` to sample one noisy site harder.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = getattr(record, "sample", self.rate)
+        return rate >= 1 or random.random() < rate
+
+
+# client libraries that log every upstream call at INFO / DEBUG
+QUIET_LOGGERS = ("httpx", "httpcore")
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: when the queue is full the record is dropped."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # merge args here but leave the JSON formatting to the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def setup_logging(service: str) -> logging.handlers.QueueListener:
+    """Route the root logger through a bounded queue to a stdout writer thread.
+
+    Configured from ``LOG_LEVEL``, ``LOG_SAMPLE_RATE`` and ``LOG_QUEUE_SIZE``.
+    """
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+    queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(SampleFilter(sample_rate))
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter(service))
+    listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -1,7 +1,11 @@
 from fastapi import FastAPI,HTTPException,Depends,status
-from fastapi.responses import JSONResponse
+from fastjson import JSONResponse
 from schema.auth import LoginSchema,DeleteSchema,Multi_query,UpdateSchema
-app=FastAPI()
+from log import setup_logging
+import logging
+setup_logging("auth")
+logger = logging.getLogger(__name__)
+app=FastAPI(default_response_class=JSONResponse)
 
 
 
@@ -19,7 +23,7 @@ async def get(skip:int=0,limit:int=10):
         )
     
     except Exception as e:
-        print(str(e))
+        logger.exception("request failed")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -29,7 +33,7 @@ async def get(skip:int=0,limit:int=10):
 @app.get("/test",status_code=status.HTTP_200_OK)
 async def get_query(name:str):
     try:
-        print("name",name)
+        logger.debug("lookup", extra={"query_name": name})
         for item in fake_items_db:
             for key,value in item.items():
                 if key==name:
@@ -42,7 +46,7 @@ async def get_query(name:str):
             status_code=status.HTTP_200_OK
         )
     except Exception as e:
-        print(str(e))
+        logger.exception("request failed")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -65,7 +69,7 @@ async def multi_query(name:str,values:str):
             status_code=status.HTTP_200_OK
         )
     except Exception as e:
-        print(str(e))
+        logger.exception("request failed")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -77,7 +81,7 @@ async def multi_query(name:str,values:str):
 @app.post("/login", status_code=status.HTTP_200_OK)
 async def login(payload: LoginSchema):
     try:
-        print("Login attempt with:", payload)
+        logger.info("Login attempt", extra={"email": payload.email})
         return JSONResponse(
             content={ 
                 "message": "Login successful",
@@ -89,7 +93,7 @@ async def login(payload: LoginSchema):
             status_code=status.HTTP_200_OK
         )
     except Exception as e:
-        print(str(e))
+        logger.exception("request failed")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -100,13 +104,13 @@ async def login(payload: LoginSchema):
 @app.delete("/delete", status_code=status.HTTP_200_OK)
 async def delete(payload: DeleteSchema):
     try:
-        print("Logout attempt for user:", payload.user_id)
+        logger.info("Logout attempt", extra={"user_id": payload.user_id})
         return JSONResponse(
             {"message": "Logout successful"},
             status_code=status.HTTP_200_OK
         )
     except Exception as e:
-        print(e)
+        logger.exception("request failed")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Logout failed"
@@ -117,13 +121,13 @@ async def delete(payload: DeleteSchema):
 @app.put("/update", status_code=200)
 async def update(payload: UpdateSchema):
     try:
-        print("Update attempt with:", payload)
+        logger.info("Update attempt", extra={"email": payload.email})
         return JSONResponse(
             {"message": "Update successful"},
             status_code=status.HTTP_200_OK,
         )
     except Exception as e:
-        print(e)
+        logger.exception("request failed")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Update failed"
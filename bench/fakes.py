@@ -0,0 +1,91 @@
+"""Stand-in upstream services for the gateway benchmarks.
+
+They answer the same routes as the real auth, mldataset and websocket
+services with fixed payloads, so the numbers measure the gateway and not
+the backends.
+"""
+import struct
+import threading
+import time
+from typing import Annotated, List
+
+import uvicorn
+from fastapi import FastAPI, File, Form, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+ITEMS = [{"aman": "doc_1"}, {"singh": "doc_2"}, {"raj": "doc_3"}]
+
+auth_app = FastAPI()
+
+
+@auth_app.get("/")
+async def auth_list(skip: int = 0, limit: int = 10):
+    return JSONResponse(ITEMS[skip:skip + limit])
+
+
+@auth_app.get("/test")
+async def auth_lookup(name: str):
+    return JSONResponse("found" if any(name in item for item in ITEMS) else "not found")
+
+
+@auth_app.post("/login")
+async def auth_login(payload: dict):
+    return JSONResponse({"message": "Login successful", "user_data": payload})
+
+
+mldataset_app = FastAPI()
+
+
+@mldataset_app.post("/form_files", status_code=201)
+async def mldataset_upload(file_name: Annotated[str, Form()],
+                           files: Annotated[List[UploadFile], File()] = []):
+    return JSONResponse({"message": "formdata successful", "files": len(files)}, status_code=201)
+
+
+websocket_app = FastAPI()
+MUX_HEADER = struct.Struct("!IB")
+
+
+@websocket_app.websocket("/")
+async def websocket_echo(websocket: WebSocket):
+    await websocket.accept()
+    await websocket.send_text("Connected to WebSocket server")
+    try:
+        while True:
+            await websocket.send_text((await websocket.receive_text()).upper())
+    except WebSocketDisconnect:
+        pass
+
+
+@websocket_app.websocket("/mux")
+async def websocket_mux(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        while True:
+            frame = await websocket.receive_bytes()
+            channel, op = MUX_HEADER.unpack_from(frame)
+            payload = frame[MUX_HEADER.size:]
+            if op == 1:
+                await websocket.send_bytes(MUX_HEADER.pack(channel, 2) + b"Connected to WebSocket server")
+            elif op == 2:
+                await websocket.send_bytes(MUX_HEADER.pack(channel, 2) + payload.upper())
+    except WebSocketDisconnect:
+        pass
+
+
+class BackgroundServer:
+    """Runs one app under uvicorn on a thread of its own."""
+
+    def __init__(self, app: FastAPI, port: int):
+        config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
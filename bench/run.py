@@ -0,0 +1,246 @@
+"""Gateway load test against in-process stand-in upstreams.
+
+Boots the fake auth, mldataset and websocket apps from ``bench.fakes`` on
+local ports, starts the gateway as a uvicorn subprocess pointed at them and
+drives REST (uncached and cached), multipart upload and WebSocket echo
+workloads. Everything runs on 127.0.0.1.
+
+    python -m bench.run --concurrency 50 --requests 5000
+    python -m bench.run --workload rest --save-baseline
+    python -m bench.run --tolerance 0.15   # exit 1 on regression vs baseline
+
+Per workload it reports p50/p99 latency, throughput and the gateway's RSS
+after the run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncContextManager, Awaitable, Callable, Dict, List
+
+import httpx
+from httpx_ws import aconnect_ws
+
+from bench.fakes import BackgroundServer, auth_app, mldataset_app, websocket_app
+
+ROOT = Path(__file__).resolve().parent.parent
+GATEWAY_DIR = ROOT / "gateway"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+WORKLOADS = ("rest", "cached", "upload", "ws")
+LOGIN = {"email": "bench@example.com", "password": "benchmark"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def start_gateway(port: int, upstreams: Dict[str, int], env_overrides: Dict[str, str]) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "AUTH_SERVICE_URL": f"http://127.0.0.1:{upstreams['auth']}",
+        "MLDATASET_SERVICE_URL": f"http://127.0.0.1:{upstreams['mldataset']}",
+        "WEBSOCKET_SERVICE_URL": f"http://127.0.0.1:{upstreams['websocket']}",
+        "LOG_LEVEL": "WARNING",
+    })
+    env.update(env_overrides)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=GATEWAY_DIR,
+        env=env,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/metrics")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("gateway did not start")
+
+
+Operation = Callable[[], Awaitable[None]]
+
+
+async def drive(concurrency: int, total: int, session: Callable[[], AsyncContextManager[Operation]]) -> Dict:
+    """Run ``total`` operations spread over ``concurrency`` workers.
+
+    Each worker enters its own ``session()``, which yields the operation to
+    repeat, and leaves it from the same task once the work is done.
+    """
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        async with session() as operation:
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    await operation()
+                    latencies.append(time.perf_counter() - started)
+                except Exception:
+                    errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    if not latencies:
+        raise RuntimeError("every request failed")
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+    }
+
+
+async def http_workload(base_url: str, args, total: int, send: Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]) -> Dict:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        @asynccontextmanager
+        async def session():
+            async def operation():
+                (await send(client)).raise_for_status()
+            yield operation
+        return await drive(args.concurrency, total, session)
+
+
+async def rest_workload(base_url: str, args) -> Dict:
+    # /login is not cached, so every request goes through to the upstream
+    return await http_workload(base_url, args, args.requests, lambda client: client.post("/login", json=LOGIN))
+
+
+async def cached_workload(base_url: str, args) -> Dict:
+    # /test is declared with cache_ttl: after the first call these are cache hits
+    return await http_workload(base_url, args, args.requests, lambda client: client.get("/test", params={"name": "raj"}))
+
+
+async def upload_workload(base_url: str, args) -> Dict:
+    body = os.urandom(args.upload_kb * 1024)
+    return await http_workload(base_url, args, max(1, args.requests // 10), lambda client: client.post(
+        "/form_files",
+        data={"file_name": "bench"},
+        files=[("files", ("bench.bin", body, "application/octet-stream"))],
+    ))
+
+
+async def ws_workload(base_url: str, args) -> Dict:
+    ws_url = base_url.replace("http://", "ws://") + "/ws"
+
+    @asynccontextmanager
+    async def session():
+        async with httpx.AsyncClient() as client, aconnect_ws(ws_url, client) as ws:
+            await ws.receive_text()  # greeting
+
+            async def operation():
+                await ws.send_text("ping")
+                await ws.receive_text()
+            yield operation
+
+    return await drive(args.concurrency, args.requests, session)
+
+
+RUNNERS = {"rest": rest_workload, "cached": cached_workload, "upload": upload_workload, "ws": ws_workload}
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {current['p99_ms']}ms vs baseline {previous['p99_ms']}ms")
+        if current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['rps']} req/s vs baseline {previous['rps']} req/s")
+    return regressions
+
+
+async def main(args) -> int:
+    upstreams = {"auth": free_port(), "mldataset": free_port(), "websocket": free_port()}
+    servers = [
+        BackgroundServer(auth_app, upstreams["auth"]),
+        BackgroundServer(mldataset_app, upstreams["mldataset"]),
+        BackgroundServer(websocket_app, upstreams["websocket"]),
+    ]
+    for server in servers:
+        server.start()
+
+    env_overrides = dict(item.split("=", 1) for item in args.env)
+    gateway_port = free_port()
+    gateway = start_gateway(gateway_port, upstreams, env_overrides)
+    base_url = f"http://127.0.0.1:{gateway_port}"
+    results: Dict[str, Dict] = {}
+    try:
+        await wait_ready(base_url)
+        for name in args.workload:
+            result = await RUNNERS[name](base_url, args)
+            result["rss_mb"] = round(rss_mb(gateway.pid), 1)
+            results[name] = result
+            print(f"{name:>7}: p50 {result['p50_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms  "
+                  f"{result['rps']:9.1f} req/s  rss {result['rss_mb']:7.1f}MB  errors {result['errors']}")
+    finally:
+        gateway.terminate()
+        gateway.wait(timeout=10)
+        for server in servers:
+            server.stop()
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if args.baseline.exists():
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000, help="operations per workload (uploads use a tenth)")
+    parser.add_argument("--upload-kb", type=int, default=512)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before failing")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra gateway setting, e.g. --env WEBSOCKET_MULTIPLEX=true")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,96 @@
+import itertools
+import time
+from typing import Dict, List, Optional
+from conf.conf import settings
+
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
+EWMA = "ewma"
+
+
+class Endpoint:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.ewma: Optional[float] = None  # seconds
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    @property
+    def cost(self) -> float:
+        # unmeasured endpoints cost nothing so they get tried first
+        return (self.ewma or 0.0) * (self.outstanding + 1)
+
+
+class UpstreamGroup:
+    """Replicas of one service and the strategy used to pick between them.
+
+    Endpoints that fail ``eject_failures`` times in a row are ejected for
+    ``eject_seconds``. If every endpoint is ejected they are all used again
+    rather than failing every request.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        strategy: str = settings.LOAD_BALANCER_STRATEGY,
+        eject_failures: int = settings.LB_EJECT_FAILURES,
+        eject_seconds: float = settings.LB_EJECT_SECONDS,
+        ewma_decay: float = settings.LB_EWMA_DECAY,
+    ):
+        if strategy not in (ROUND_ROBIN, LEAST_OUTSTANDING, EWMA):
+            raise ValueError(f"Unknown load balancer strategy: {strategy}")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.strategy = strategy
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.ewma_decay = ewma_decay
+        self._counter = itertools.count()
+
+    def acquire(self) -> Endpoint:
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e.available(now)] or self.endpoints
+        if len(candidates) == 1:
+            endpoint = candidates[0]
+        elif self.strategy == LEAST_OUTSTANDING:
+            offset = next(self._counter)
+            endpoint = min(
+                (candidates[(offset + i) % len(candidates)] for i in range(len(candidates))),
+                key=lambda e: e.outstanding
+            )
+        elif self.strategy == EWMA:
+            endpoint = min(candidates, key=lambda e: e.cost)
+        else:
+            endpoint = candidates[next(self._counter) % len(candidates)]
+        endpoint.outstanding += 1
+        return endpoint
+
+    def release(self, endpoint: Endpoint, elapsed: Optional[float], failed: bool):
+        endpoint.outstanding -= 1
+        if failed:
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.eject_failures:
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                endpoint.consecutive_failures = 0
+            return
+        endpoint.consecutive_failures = 0
+        if elapsed is not None:
+            if endpoint.ewma is None:
+                endpoint.ewma = elapsed
+            else:
+                endpoint.ewma = self.ewma_decay * endpoint.ewma + (1 - self.ewma_decay) * elapsed
+
+
+_groups: Dict[str, UpstreamGroup] = {}
+
+
+def get_group(service_url: str) -> UpstreamGroup:
+    """The group for a service URL, using its configured replicas if any."""
+    group = _groups.get(service_url)
+    if group is None:
+        replicas = settings.replicas().get(service_url) or [service_url]
+        group = _groups[service_url] = UpstreamGroup(replicas)
+    return group
@@ -0,0 +1,205 @@
+import asyncio
+import base64
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+from conf.conf import settings
+
+
+@dataclass
+class CacheEntry:
+    status_code: int
+    body: bytes
+    media_type: Optional[str]
+    etag: Optional[str]
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at if self.expires_at else False
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+
+class CacheBackend:
+    """Storage for cached upstream responses.
+
+    Entries are kept past their freshness window (``stale_ttl``) so that an
+    upstream ETag can still be revalidated with a conditional request.
+    """
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    async def set(self, key: str, entry: CacheEntry, ttl: float):
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU bounded by entry count and total body bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int, stale_ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[str, tuple[CacheEntry, float]]" = OrderedDict()
+        self._bytes = 0
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        entry, evict_at = item
+        if time.monotonic() >= evict_at:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry, ttl: float):
+        if entry.size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (entry, time.monotonic() + ttl + self.stale_ttl)
+        self._bytes += entry.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._bytes -= item[0].size
+
+
+class RedisCache(CacheBackend):
+    """Shared store so several gateway replicas reuse each other's entries."""
+
+    def __init__(self, url: str, stale_ttl: float, prefix: str = "gateway:cache:"):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+        self._redis = aioredis.from_url(url)
+        self.stale_ttl = stale_ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        raw = await self._redis.get(self.prefix + key)
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        # expiry is stored as a wall-clock time since monotonic clocks differ per process
+        remaining = data.pop("expires_in_epoch") - time.time()
+        data["body"] = base64.b64decode(data["body"])
+        data["expires_at"] = time.monotonic() + remaining
+        return CacheEntry(**data)
+
+    async def set(self, key: str, entry: CacheEntry, ttl: float):
+        data = asdict(entry)
+        data["body"] = base64.b64encode(entry.body).decode("ascii")
+        data["expires_in_epoch"] = time.time() + (entry.expires_at - time.monotonic())
+        del data["expires_at"]
+        await self._redis.set(self.prefix + key, json.dumps(data), ex=max(1, int(ttl + self.stale_ttl)))
+
+    async def aclose(self):
+        await self._redis.aclose()
+
+
+def cache_lifetime(response: httpx.Response, ttl: float) -> float:
+    """Clamp the route ttl by the upstream Cache-Control header."""
+    directives = {}
+    for part in response.headers.get("cache-control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+
+    if {"no-store", "no-cache", "private"} & directives.keys():
+        return 0
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                return min(ttl, float(directives[name]))
+            except ValueError:
+                return 0
+    return ttl
+
+
+Loader = Callable[[Optional[str]], Awaitable[httpx.Response]]
+
+
+class ResponseCache:
+    """Caches upstream responses and coalesces concurrent misses per key."""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def key(method: str, path: str, query_params) -> str:
+        query = "&".join(f"{k}={v}" for k, v in sorted(query_params.multi_items()))
+        return f"{method.upper()} {path}?{query}"
+
+    async def get_or_fetch(self, key: str, ttl: float, loader: Loader) -> CacheEntry:
+        entry = await self.backend.get(key)
+        if entry is not None and entry.fresh:
+            return entry
+
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._load(key, ttl, entry, loader)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters get it; don't warn if there are none
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self._inflight[key]
+
+    async def _load(self, key: str, ttl: float, stale: Optional[CacheEntry], loader: Loader) -> CacheEntry:
+        response = await loader(stale.etag if stale is not None else None)
+        lifetime = cache_lifetime(response, ttl)
+        expires_at = time.monotonic() + lifetime if lifetime else 0
+
+        if response.status_code == 304 and stale is not None:
+            entry = CacheEntry(stale.status_code, stale.body, stale.media_type, stale.etag, expires_at)
+        else:
+            entry = CacheEntry(
+                status_code=response.status_code,
+                body=response.content,
+                media_type=response.headers.get("content-type"),
+                etag=response.headers.get("etag"),
+                expires_at=expires_at,
+            )
+
+        if lifetime and entry.status_code == 200:
+            await self.backend.set(key, entry, lifetime)
+        return entry
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+
+def build_cache_backend() -> CacheBackend:
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCache(settings.CACHE_REDIS_URL, settings.CACHE_STALE_TTL)
+    return MemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_MAX_BYTES, settings.CACHE_STALE_TTL)
+
+
+response_cache = ResponseCache(build_cache_backend())
@@ -1,4 +1,5 @@
 import os
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 
 
@@ -8,4 +9,62 @@ class Settings(BaseSettings):
     AUTH_SERVICE_URL: str = "http://auth:8002"
     WEBSOCKET_SERVICE_URL: str = "http://websocket:8003"
     GATEWAY_TIMEOUT: int = 59
-settings = Settings()
\ No newline at end of file
+
+    # optional replicas per service (JSON list in env); the *_SERVICE_URL
+    # above is used alone when its list is empty
+    AUTH_SERVICE_REPLICAS: List[str] = []
+    MLDATASET_SERVICE_REPLICAS: List[str] = []
+    WEBSOCKET_SERVICE_REPLICAS: List[str] = []
+    LOAD_BALANCER_STRATEGY: str = "round_robin"  # round_robin, least_outstanding, ewma
+    LB_EJECT_FAILURES: int = 5
+    LB_EJECT_SECONDS: float = 30.0
+    LB_EWMA_DECAY: float = 0.8
+
+    # upstream connection pool (one per service)
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    UPSTREAM_HTTP2: bool = False
+    UPSTREAM_TIMEOUT: float = 30.0
+
+    # circuit breaker per upstream (rates are fractions of the rolling window)
+    BREAKER_WINDOW: int = 50
+    BREAKER_MIN_CALLS: int = 10
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_SLOW_CALL_SECONDS: float = 5.0
+    BREAKER_SLOW_CALL_RATE: float = 0.8
+    BREAKER_OPEN_SECONDS: float = 10.0
+    BREAKER_HALF_OPEN_PROBES: int = 3
+
+    # frames buffered per direction before a websocket reader pauses
+    WEBSOCKET_QUEUE_SIZE: int = 64
+
+    # share a few upstream sockets between all /ws clients
+    WEBSOCKET_MULTIPLEX: bool = False
+    WEBSOCKET_MUX_PATH: str = "/mux"
+    WEBSOCKET_MUX_CONNECTIONS: int = 4
+
+    # response cache for routes declared with cache_ttl ("memory" or "redis")
+    CACHE_BACKEND: str = "memory"
+    CACHE_MAX_ENTRIES: int = 1024
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_STALE_TTL: float = 300.0
+    CACHE_REDIS_URL: str = "redis://redis:6379/0"
+
+    # request body limits (bytes); form_data routes use the upload limits,
+    # and uploads above the spool threshold are buffered on disk
+    MAX_BODY_SIZE: int = 10 * 1024 * 1024
+    MAX_UPLOAD_BODY_SIZE: int = 512 * 1024 * 1024
+    MAX_UPLOAD_FILE_SIZE: int = 256 * 1024 * 1024
+    UPLOAD_SPOOL_THRESHOLD: int = 1024 * 1024
+    # one PUT of the chunked upload API; keep it at or above the mldataset
+    # service's MAX_UPLOAD_CHUNK_SIZE
+    MAX_UPLOAD_CHUNK_SIZE: int = 64 * 1024 * 1024
+
+    def replicas(self) -> Dict[str, List[str]]:
+        return {
+            self.AUTH_SERVICE_URL: self.AUTH_SERVICE_REPLICAS,
+            self.MLDATASET_SERVICE_URL: self.MLDATASET_SERVICE_REPLICAS,
+            self.WEBSOCKET_SERVICE_URL: self.WEBSOCKET_SERVICE_REPLICAS,
+        }
+settings = Settings()
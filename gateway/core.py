@@ -9,6 +9,9 @@ from starlette.datastructures import UploadFile as StarletteUploadFile
 from urllib.parse import urlparse, urlunparse
 from httpx_ws import aconnect_ws
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class APIError(Exception):
     def __init__(self, status_code: int, detail: str, headers: Optional[Dict[str, str]] = None):
@@ -33,7 +36,7 @@ class SimpleWebSocketProxy:
     def __init__(self, target_url: str):
         parsed = urlparse(target_url)
         self.ws_url = f"ws://{parsed.netloc}{parsed.path}"
-        print(f"Target WebSocket URL: {self.ws_url}")
+        logger.debug("Target WebSocket URL", extra={"upstream": self.ws_url})
 
     async def handle_message(self, data: Dict[str, Any], ws, client_ws: WebSocket):
 
@@ -70,26 +73,26 @@ class SimpleWebSocketProxy:
 
     async def proxy(self, client_ws: WebSocket):
         """Main proxy method to handle WebSocket connections"""
-        print("Starting websocket proxy")
+        logger.debug("Starting websocket proxy")
         await client_ws.accept()
-        print("Client connection accepted")
+        logger.debug("Client connection accepted")
 
         async with httpx.AsyncClient() as client:
             try:
                 async with aconnect_ws(self.ws_url, client) as ws:
-                    print("Connected to target service")
+                    logger.debug("Connected to target service")
                     
                     while True:
                         try:
                             data = await client_ws.receive()
-                            print(f"Received message: {data}")
+                            logger.debug("Received message", extra={"size": len(data.get("text") or data.get("bytes") or ""), "sample": 0.01})
                             await self.handle_message(data, ws, client_ws)
                             
                         except WebSocketDisconnect:
-                            print("Client disconnected")
+                            logger.debug("Client disconnected")
                             break
                         except Exception as e:
-                            print(f"Error in message handling: {str(e)}")
+                            logger.warning("Error in message handling", extra={"error": str(e)})
                             try:
                                 await client_ws.send_json({
                                     "type": "error",
@@ -100,7 +103,7 @@ class SimpleWebSocketProxy:
                             break
                             
             except Exception as e:
-                print(f"Connection error: {str(e)}")
+                logger.warning("Connection error", extra={"error": str(e)})
                 try:
                     await client_ws.close(code=1011)
                 except:
@@ -169,12 +172,12 @@ def route(
         def websocket_wrapper(func):
             @request_method(path)
             async def inner(websocket: WebSocket):
-                print("New websocket connection request")
+                logger.debug("New websocket connection request")
                 try:
                     proxy = SimpleWebSocketProxy(service_url)
                     await proxy.proxy(websocket)
                 except Exception as e:
-                    print(f"WebSocket error: {str(e)}")
+                    logger.exception("WebSocket error")
                     try:
                         await websocket.close(code=1011)
                     except:
@@ -1,14 +1,51 @@
+import asyncio
+import inspect
+import logging
+import math
+import time
+import types
 import httpx
 from fastapi import Request, Response, status, WebSocket, UploadFile,WebSocketDisconnect
-from typing import List, Optional, Dict, Any, Union, Callable
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from typing import List, Optional, Dict, Any, Union, Callable, Annotated, get_args, get_origin
 from importlib import import_module
 import base64
 from pydantic import BaseModel
 import functools
 from starlette.datastructures import UploadFile as StarletteUploadFile
 from urllib.parse import urlparse, urlunparse
-from httpx_ws import aconnect_ws
+from httpx_ws import aconnect_ws, WebSocketDisconnect as WSUpstreamDisconnect
+from wsproto.events import BytesMessage, TextMessage
+from conf.conf import settings
+from pool import upstream_pool
+import fastjson
+from cache import response_cache
+from resilience import UpstreamGuard, UpstreamUnavailable, get_guard
+from balancer import Endpoint, UpstreamGroup, get_group
+from metrics import (
+    IN_FLIGHT, PAYLOAD_LATENCY, REQUEST_LATENCY, REQUEST_SIZE, RESPONSE_SIZE,
+    UPSTREAM_CONNECT, UPSTREAM_TRANSFER, UPSTREAM_TTFB, WS_CONNECTIONS, WS_FRAMES,
+)
+from ws_mux import get_mux_pool
+from limits import BodyTooLarge, register_body_limit
 
+# headers that describe a single connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+logger = logging.getLogger(__name__)
+
+# per-frame debug records are sampled on top of LOG_SAMPLE_RATE
+FRAME_LOG_SAMPLE = 0.01
+
+# nginx's status for a request the client gave up on before it was answered
+HTTP_499_CLIENT_CLOSED_REQUEST = 499
+
+WS_FRAMES_TO_UPSTREAM = WS_FRAMES.labels(direction="to_upstream")
+WS_FRAMES_TO_CLIENT = WS_FRAMES.labels(direction="to_client")
 
 class APIError(Exception):
     def __init__(self, status_code: int, detail: str, headers: Optional[Dict[str, str]] = None):
@@ -30,6 +67,32 @@ class AuthenticationError(APIError):
         )
 
 class Client:
+    """Calls one upstream service.
+
+    With a ``group`` the ``url`` passed to each call is a path, resolved
+    against the replica the load balancer picks for that call.
+    """
+
+    def __init__(
+        self,
+        guard: Optional[UpstreamGuard] = None,
+        timeout: float = 30.0,
+        group: Optional[UpstreamGroup] = None
+    ):
+        self.guard = guard or UpstreamGuard(None, None)
+        self.timeout = timeout
+        self.group = group
+
+    def resolve(self, url: str) -> tuple[Optional[Endpoint], str]:
+        if self.group is None:
+            return None, url
+        endpoint = self.group.acquire()
+        return endpoint, f"{endpoint.url}{url}"
+
+    def release(self, endpoint: Optional[Endpoint], started: float, failed: bool):
+        if endpoint is not None:
+            self.group.release(endpoint, time.monotonic() - started, failed)
+
     async def http_request(
         self,
         url: str,
@@ -37,33 +100,205 @@ class Client:
         data: Optional[Dict[str, Any]] = None,
         headers: Optional[Dict[str, str]] = None,
         params: Optional[Dict[str, Any]] = None,
-        timeout: float = 30.0
+        timeout: Optional[float] = None,
+        files: Optional[List[tuple]] = None
     ) -> tuple[Any, int]:
+        response = await self.fetch(url, method, data, headers, params, timeout, files)
+        return fastjson.loads(response.content), response.status_code
+
+    async def fetch(
+        self,
+        url: str,
+        method: str,
+        data: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        files: Optional[List[tuple]] = None
+    ) -> httpx.Response:
         headers = headers or {}
         params = params or {}
+        # a conditional request answered 304 is a result, not an error
+        conditional = any(key.lower() == "if-none-match" for key in headers)
+        # with files the payload goes out as streamed multipart form fields;
+        # bytes are already-encoded JSON, anything else is encoded here
+        if files is not None:
+            body = {"data": data, "files": files}
+        elif data is None:
+            body = {}
+        else:
+            body = {"content": data if isinstance(data, bytes) else fastjson.dumps(data)}
+            headers = {"Content-Type": "application/json", **headers}
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.request(
+        try:
+            async with self.guard.call() as call:
+                endpoint, target = self.resolve(url)
+                client = upstream_pool.client(target)
+                timer = UpstreamTimer(upstream_pool.origin(target))
+                started = time.monotonic()
+                try:
+                    request = client.build_request(
+                        method=method.upper(),
+                        url=target,
+                        headers=headers,
+                        params=params,
+                        timeout=timeout or self.timeout,
+                        extensions={"trace": timer.trace},
+                        **body
+                    )
+                    response = await client.send(request, stream=True)
+                    timer.headers_received()
+                    call.timed(timer.response_wait)
+                    if response.status_code >= 500:
+                        call.mark_failed()
+                    try:
+                        await response.aread()
+                    finally:
+                        await response.aclose()
+                    timer.body_received(len(response.content))
+                    if not (conditional and response.status_code == status.HTTP_304_NOT_MODIFIED):
+                        response.raise_for_status()
+                    return response
+                except httpx.HTTPStatusError as e:
+                    raise APIError(
+                        status_code=e.response.status_code,
+                        detail=str(e)
+                    )
+                except httpx.TimeoutException as e:
+                    call.mark_failed()
+                    raise APIError(
+                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                        detail=str(e) or "Upstream timed out"
+                    )
+                except httpx.TransportError as e:
+                    call.mark_failed()
+                    raise APIError(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=str(e)
+                    )
+                except Exception as e:
+                    raise APIError(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=str(e)
+                    )
+                finally:
+                    self.release(endpoint, started, call.failed)
+        except UpstreamUnavailable as e:
+            raise unavailable_error(e)
+
+    async def stream_request(
+        self,
+        url: str,
+        method: str,
+        content: Optional[Any] = None,
+        headers: Optional[List[tuple]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None
+    ) -> httpx.Response:
+        """Send the request and return as soon as the upstream headers arrive.
+
+        The caller owns the returned response and must ``aclose()`` it once
+        the body has been consumed.
+        """
+        try:
+            async with self.guard.call() as call:
+                endpoint, target = self.resolve(url)
+                client = upstream_pool.client(target)
+                timer = UpstreamTimer(upstream_pool.origin(target))
+                request = client.build_request(
                     method=method.upper(),
-                    url=url,
-                    json=data,
+                    url=target,
+                    content=content,
                     headers=headers,
                     params=params,
-                    timeout=timeout
-                )
-                response.raise_for_status()
-                return response.json(), response.status_code
-            except httpx.HTTPStatusError as e:
-                raise APIError(
-                    status_code=e.response.status_code,
-                    detail=str(e)
-                )
-            except Exception as e:
-                raise APIError(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=str(e)
+                    timeout=timeout or self.timeout,
+                    extensions={"trace": timer.trace}
                 )
+                started = time.monotonic()
+                try:
+                    response = await client.send(request, stream=True)
+                    timer.headers_received()
+                    call.timed(timer.response_wait)
+                    if response.status_code >= 500:
+                        call.mark_failed()
+                    return response
+                except httpx.TimeoutException as e:
+                    call.mark_failed()
+                    raise APIError(
+                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                        detail=str(e) or "Upstream timed out"
+                    )
+                except httpx.TransportError as e:
+                    call.mark_failed()
+                    raise APIError(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=str(e)
+                    )
+                # the request body is read while it is sent: these two are
+                # the client's doing, not the upstream's
+                except ClientDisconnect:
+                    raise APIError(
+                        status_code=HTTP_499_CLIENT_CLOSED_REQUEST,
+                        detail="Client closed the request"
+                    )
+                except BodyTooLarge:
+                    raise APIError(
+                        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                        detail="Request body too large"
+                    )
+                except Exception as e:
+                    raise APIError(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=str(e)
+                    )
+                finally:
+                    self.release(endpoint, started, call.failed)
+        except UpstreamUnavailable as e:
+            raise unavailable_error(e)
+
+class UpstreamTimer:
+    """Splits one upstream call into connect, time-to-first-byte and transfer."""
+
+    def __init__(self, upstream: str):
+        self.upstream = upstream
+        self.started = time.perf_counter()
+        self.first_byte = self.started
+        self.connect_started: Optional[float] = None
+        self.body_sent: Optional[float] = None
+
+    async def trace(self, event_name: str, info: Dict[str, Any]):
+        # httpx only emits connect events when a new connection is opened
+        if event_name == "connection.connect_tcp.started":
+            self.connect_started = time.perf_counter()
+        elif event_name == "connection.connect_tcp.complete" and self.connect_started is not None:
+            UPSTREAM_CONNECT.labels(self.upstream).observe(time.perf_counter() - self.connect_started)
+        elif event_name.endswith(".send_request_body.complete"):
+            self.body_sent = time.perf_counter()
+
+    @property
+    def response_wait(self) -> float:
+        """Seconds from the last request byte sent to the response headers."""
+        return self.first_byte - (self.body_sent or self.started)
+
+    def headers_received(self):
+        self.first_byte = time.perf_counter()
+        UPSTREAM_TTFB.labels(self.upstream).observe(self.first_byte - self.started)
+
+    def body_received(self, size: int):
+        UPSTREAM_TRANSFER.labels(self.upstream).observe(time.perf_counter() - self.first_byte)
+        RESPONSE_SIZE.labels(self.upstream).observe(size)
+
+def unavailable_error(error: UpstreamUnavailable) -> APIError:
+    headers = {"Retry-After": str(math.ceil(error.retry_after))} if error.retry_after else None
+    return APIError(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=error.detail,
+        headers=headers
+    )
+
+def forward_headers(headers) -> List[tuple]:
+    items = headers.multi_items() if hasattr(headers, "multi_items") else headers.items()
+    return [(key, value) for key, value in items if key.lower() not in HOP_BY_HOP_HEADERS]
 
 def route_rest(
     request_method: Any,
@@ -73,46 +308,239 @@ def route_rest(
     form_data: bool = False,
     status_code: Optional[int] = None,
     payload_key: Optional[str] = None,
+    stream: bool = False,
+    multipart: bool = False,
+    cache_ttl: Optional[float] = None,
+    breaker: bool = True,
+    max_in_flight: Optional[int] = None,
+    timeout: float = settings.UPSTREAM_TIMEOUT,
+    max_body_size: Optional[int] = None,
+    max_file_size: Optional[int] = None,
 ):
+    # stream=True pipes the raw request body to the upstream and the raw
+    # upstream response back to the client without decoding it; use it on
+    # routes that do not declare body parameters of their own.
+    # multipart=True (with form_data=True) re-sends uploads as a streamed
+    # multipart body instead of base64 inside JSON.
+    # cache_ttl caches GET responses for that many seconds (see cache.py).
+    # breaker / max_in_flight guard the upstream with a circuit breaker and a
+    # concurrency cap that sheds excess calls with 503 (see resilience.py).
+    # max_body_size / max_file_size answer 413 past those many bytes; they
+    # default to the upload limits on form_data routes and MAX_BODY_SIZE
+    # elsewhere (see limits.py).
+
+    if form_data:
+        max_body_size = max_body_size or settings.MAX_UPLOAD_BODY_SIZE
+        max_file_size = max_file_size or settings.MAX_UPLOAD_FILE_SIZE
+    if max_body_size or max_file_size:
+        register_body_limit(path, max_body_size or settings.MAX_BODY_SIZE, max_file_size)
 
     real_link = request_method(
         path,
         status_code=status_code
     )
-    client = Client()
+    client = Client(
+        guard=get_guard(service_url, breaker, max_in_flight),
+        timeout=timeout,
+        group=get_group(service_url)
+    )
 
 
+    in_flight = IN_FLIGHT.labels(route=path)
+    request_size = REQUEST_SIZE.labels(route=path)
+
     def wrapper(func):
+        forward = compile_forwarder(
+            func, request_method, path, client,
+            payload_key=payload_key,
+            form_data=form_data,
+            multipart=multipart,
+            stream=stream,
+            cache_ttl=cache_ttl
+        )
+
         @real_link
         @functools.wraps(func)
         async def inner(request: Request, response: Response=None, **kwargs):           
+            started = time.perf_counter()
+            outcome = status.HTTP_500_INTERNAL_SERVER_ERROR
+            in_flight.inc()
+            content_length = request.headers.get("content-length")
+            if content_length:
+                request_size.observe(int(content_length))
             try:
-                method = request.method.lower()
-                url = f'{service_url}{request.url.path}'
-                payload = await process_payload(payload_key, kwargs, form_data)
-                query_params = dict(request.query_params)
-                
-                resp_data, status_code_from_service = await client.http_request(
-                    url=url,
-                    method=method,
-                    data=payload,
-                    headers={},
-                    params=query_params
-                )
-                response.status_code = status_code_from_service
-                return resp_data
-
-            except APIError:
+                result = await forward(request, response, kwargs)
+                outcome = result.status_code if isinstance(result, Response) else response.status_code
+                return result
+            except APIError as e:
+                outcome = e.status_code
                 raise
             except Exception:
                 raise APIError(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Internal server error"
                 )
+            finally:
+                in_flight.dec()
+                REQUEST_LATENCY.labels(path, request.method, outcome).observe(time.perf_counter() - started)
 
         return inner
     return wrapper
 
+UPLOAD_ENCODE_CHUNK = 3 * 64 * 1024
+HTTP_METHODS = {"get", "post", "put", "patch", "delete", "head", "options"}
+
+def compile_forwarder(
+    func: Callable,
+    request_method: Any,
+    path: str,
+    client: Client,
+    payload_key: Optional[str],
+    form_data: bool,
+    multipart: bool,
+    stream: bool,
+    cache_ttl: Optional[float],
+) -> Callable:
+    """Build the per-request forwarding function for one route.
+
+    Everything that only depends on the route declaration (method, upstream
+    path, payload shape, stream/cache mode) is decided here so the returned
+    function does no introspection per request.
+    """
+    method = getattr(request_method, "__name__", "").lower()
+    fixed_method = method if method in HTTP_METHODS else None
+    # templated paths have to be taken from the request
+    fixed_path = None if "{" in path else path
+
+    if stream:
+        async def forward(request: Request, response: Response, kwargs: Dict[str, Any]):
+            return await stream_passthrough(
+                client, request,
+                fixed_path or request.url.path,
+                fixed_method or request.method.lower()
+            )
+        return forward
+
+    if cache_ttl and fixed_method == "get":
+        async def forward(request: Request, response: Response, kwargs: Dict[str, Any]):
+            return await cached_response(client, request, fixed_path or request.url.path, cache_ttl)
+        return forward
+
+    build_payload = compile_payload(func, payload_key, form_data, multipart)
+    payload_latency = PAYLOAD_LATENCY.labels(route=path)
+
+    async def forward(request: Request, response: Response, kwargs: Dict[str, Any]):
+        started = time.perf_counter()
+        payload, files = await build_payload(kwargs)
+        payload_latency.observe(time.perf_counter() - started)
+
+        upstream = await client.fetch(
+            url=fixed_path or request.url.path,
+            method=fixed_method or request.method.lower(),
+            data=payload,
+            headers={},
+            params=dict(request.query_params),
+            files=files
+        )
+        # the upstream body is relayed as-is instead of decoded and re-encoded
+        return Response(
+            content=upstream.content,
+            status_code=upstream.status_code,
+            media_type=upstream.headers.get("content-type")
+        )
+    return forward
+
+def compile_payload(func: Callable, payload_key: Optional[str], form_data: bool, multipart: bool) -> Callable:
+    """Pick how the endpoint arguments become the upstream body.
+
+    Returns a coroutine function mapping kwargs to ``(payload, files)``.
+    """
+    params = {
+        name: param.annotation
+        for name, param in inspect.signature(func).parameters.items()
+        if param.annotation not in (Request, Response)
+    }
+
+    if form_data and multipart:
+        async def build(kwargs: Dict[str, Any]):
+            return process_multipart(payload_key, kwargs)
+    elif form_data:
+        async def build(kwargs: Dict[str, Any]):
+            return await process_payload(payload_key, kwargs, True), None
+    elif payload_key in params and is_model(params[payload_key]):
+        async def build(kwargs: Dict[str, Any]):
+            payload_obj = kwargs.get(payload_key)
+            if payload_obj is None:
+                # as in process_payload, the other arguments go out instead
+                return kwargs, None
+            return payload_obj.model_dump_json().encode(), None
+    else:
+        async def build(kwargs: Dict[str, Any]):
+            return await process_payload(payload_key, kwargs, False), None
+    return build
+
+def _unwrap(annotation: Any) -> List[Any]:
+    if get_origin(annotation) is Annotated:
+        annotation = get_args(annotation)[0]
+    if get_origin(annotation) in (Union, types.UnionType):
+        return [a for a in get_args(annotation) if a is not type(None)]
+    return [annotation]
+
+def is_model(annotation: Any) -> bool:
+    return any(inspect.isclass(a) and issubclass(a, BaseModel) for a in _unwrap(annotation))
+
+async def cached_response(client: Client, request: Request, url: str, ttl: float) -> Response:
+    key = response_cache.key("get", request.url.path, request.query_params)
+    query_params = dict(request.query_params)
+
+    async def load(etag: Optional[str]) -> httpx.Response:
+        headers = {"If-None-Match": etag} if etag else {}
+        return await client.fetch(url=url, method="get", headers=headers, params=query_params)
+
+    entry = await response_cache.get_or_fetch(key, ttl, load)
+    headers = {"ETag": entry.etag} if entry.etag else {}
+    if entry.etag and request.headers.get("if-none-match") == entry.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=entry.body,
+        status_code=entry.status_code,
+        media_type=entry.media_type,
+        headers=headers
+    )
+
+async def stream_passthrough(client: Client, request: Request, url: str, method: str) -> StreamingResponse:
+    content = request.stream() if method not in ("get", "head", "options") else None
+    upstream = await client.stream_request(
+        url=url,
+        method=method,
+        content=content,
+        headers=forward_headers(request.headers),
+        params=request.query_params.multi_items()
+    )
+    response = StreamingResponse(relay_body(upstream), status_code=upstream.status_code)
+    response.raw_headers.extend(
+        (key.encode("latin-1"), value.encode("latin-1"))
+        for key, value in forward_headers(upstream.headers)
+    )
+    return response
+
+async def relay_body(upstream: httpx.Response):
+    try:
+        async for chunk in upstream.aiter_raw():
+            yield chunk
+    finally:
+        await upstream.aclose()
+
+async def encode_upload(file: Union[UploadFile, StarletteUploadFile]) -> str:
+    # encode in multiples of 3 bytes so the chunks concatenate into valid
+    # base64 without holding the raw file in memory next to its encoding
+    parts = []
+    await file.seek(0)
+    while chunk := await file.read(UPLOAD_ENCODE_CHUNK):
+        parts.append(base64.b64encode(chunk).decode('ascii'))
+    await file.seek(0)
+    return ''.join(parts)
+
 async def process_payload(payload_key: str, kwargs: Dict[str, Any], form_data: bool = False) -> Optional[Any]:
     try:
         if not kwargs:
@@ -144,6 +572,34 @@ async def process_payload(payload_key: str, kwargs: Dict[str, Any], form_data: b
             detail=f"Error processing payload: {str(e)}"
         )
 
+def process_multipart(payload_key: str, kwargs: Dict[str, Any]) -> tuple[Dict, List[tuple]]:
+    """Split form kwargs into plain fields and httpx file tuples.
+
+    Uploads are passed as their underlying spooled file objects, so httpx
+    reads them in chunks while sending instead of loading them whole.
+    """
+    payload_obj = kwargs.get(payload_key)
+    data = payload_obj if isinstance(payload_obj, dict) else kwargs
+
+    fields: Dict[str, Any] = {}
+    files: List[tuple] = []
+    for key, value in data.items():
+        for item in (value if isinstance(value, list) else [value]):
+            if isinstance(item, (UploadFile, StarletteUploadFile)):
+                item.file.seek(0)
+                files.append((key, (
+                    item.filename,
+                    item.file,
+                    item.content_type or 'application/octet-stream'
+                )))
+            elif item is None:
+                continue
+            elif isinstance(item, BaseModel):
+                fields.setdefault(key, []).append(item.model_dump_json())
+            else:
+                fields.setdefault(key, []).append(str(item))
+    return fields, files
+
 async def process_form_data(data: Dict) -> Dict:
     if not data:
         return {}
@@ -161,11 +617,9 @@ async def process_form_data(data: Dict) -> Dict:
                     if not isinstance(file, (UploadFile, StarletteUploadFile)):
                         continue
                     try:
-                        file_content = await file.read()
-                        await file.seek(0)
                         processed_data[key].append({
                             'filename': file.filename,
-                            'content': base64.b64encode(file_content).decode('utf-8'),
+                            'content': await encode_upload(file),
                             'content_type': file.content_type or 'application/octet-stream'
                         })
                     except Exception:
@@ -175,11 +629,9 @@ async def process_form_data(data: Dict) -> Dict:
                 
         elif isinstance(value, (UploadFile, StarletteUploadFile)):
             try:
-                file_content = await value.read()
-                await value.seek(0)
                 processed_data[key] = {
                     'filename': value.filename,
-                    'content': base64.b64encode(file_content).decode('utf-8'),
+                    'content': await encode_upload(value),
                     'content_type': value.content_type or 'application/octet-stream'
                 }
             except Exception:
@@ -204,9 +656,18 @@ async def process_form_data(data: Dict) -> Dict:
 
 
 class SimpleWebSocketProxy:
-    def __init__(self, service_url: str):
+    """Full-duplex proxy between a client socket and the upstream service.
+
+    Each direction has a reader task feeding a bounded queue and a writer
+    task draining it, so frames flow both ways independently and a slow
+    receiver stops its reader once the queue is full.
+    """
+
+    def __init__(self, service_url: str, queue_size: int = settings.WEBSOCKET_QUEUE_SIZE):
         self.ws_url = service_url
-        print(f"Initializing proxy to connect to: {self.ws_url}")
+        self.queue_size = queue_size
+        self.upstream_failed = False
+        logger.debug("Initializing proxy", extra={"upstream": self.ws_url})
 
     async def proxy(self, client_ws: WebSocket):
         try:
@@ -215,49 +676,10 @@ class SimpleWebSocketProxy:
             async with httpx.AsyncClient() as client: 
                 try:
                     async with aconnect_ws(self.ws_url, client) as ws:
-                        while True:
-                            try:
-                                # Receive and handle different message types from client
-                                data = await client_ws.receive()
-                                
-                                # Handle different message types
-                                if 'text' in data:
-                                    message=data['text']
-                                    await ws.send_text(message)
-
-                                elif 'bytes' in data:
-                                    message=data['bytes']
-                                    await ws.send_bytes(message)
-                                   
-                                elif 'json' in message:
-                                    message=data['json']
-                                    await ws.send_json(message)
-                        
-                                
-                                # Receive response from service
-                                response = await ws.receive()
-                                
-                                # Forward response back to client
-                                if isinstance(response, str):
-                                    await client_ws.send_text(response)
-                                elif isinstance(response, bytes):
-                                    await client_ws.send_bytes(response)
-                                elif isinstance(response, dict):
-                                    await client_ws.send_json(response)
-                                    
-                            except WebSocketDisconnect:
-                                print("Client disconnected")
-                                break
-                            except Exception as e:
-                                print(f"Message handling error: {str(e)}")
-                                await client_ws.send_json({
-                                    "type": "error",
-                                    "error": str(e)
-                                })
-                                break
+                        await self.pump(client_ws, ws)
                 except httpx.ConnectError as e:
-                    print(f"Service connection refused: {self.ws_url}")
-                    print(f"Detailed error: {str(e)}")
+                    self.upstream_failed = True
+                    logger.warning("Service connection refused", extra={"upstream": self.ws_url, "error": str(e)})
                     await client_ws.send_json({
                         "type": "error",
                         "error": "Service connection refused",
@@ -265,7 +687,8 @@ class SimpleWebSocketProxy:
                     })
                     
                 except Exception as e:
-                    print(f"Service connection error: {str(e)}")
+                    self.upstream_failed = True
+                    logger.warning("Service connection error", extra={"upstream": self.ws_url, "error": str(e)})
                     await client_ws.send_json({
                         "type": "error",
                         "error": str(e)
@@ -278,30 +701,171 @@ class SimpleWebSocketProxy:
                         pass 
 
         except Exception as e:
-            print(f"Client connection error: {str(e)}")
+            logger.warning("Client connection error", extra={"error": str(e)})
+            try:
+                await client_ws.close(code=1011)
+            except:
+                pass
+
+    async def pump(self, client_ws: WebSocket, ws):
+        to_upstream: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        to_client: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        readers = [
+            asyncio.create_task(self.read_client(client_ws, to_upstream)),
+            asyncio.create_task(self.read_upstream(ws, to_client)),
+        ]
+        writers = [
+            asyncio.create_task(self.write_upstream(ws, to_upstream)),
+            asyncio.create_task(self.write_client(client_ws, to_client)),
+        ]
+
+        # a writer finishes once it has forwarded a close to its side;
+        # any task failing tears the whole session down
+        pending = set(readers + writers)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if any(task in writers or task.exception() for task in done):
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        for task in readers + writers:
+            if task.done() and not task.cancelled() and task.exception():
+                raise task.exception()
+
+    @staticmethod
+    async def read_client(client_ws: WebSocket, queue: asyncio.Queue):
+        while True:
+            message = await client_ws.receive()
+            if message["type"] == "websocket.disconnect":
+                await queue.put(WebSocketClose(message.get("code", 1000)))
+                return
+            if message.get("text") is not None:
+                await queue.put(message["text"])
+            elif message.get("bytes") is not None:
+                await queue.put(message["bytes"])
+
+    @staticmethod
+    async def read_upstream(ws, queue: asyncio.Queue):
+        while True:
+            try:
+                event = await ws.receive()
+            except WSUpstreamDisconnect as e:
+                await queue.put(WebSocketClose(e.code))
+                return
+            if isinstance(event, TextMessage):
+                await queue.put(event.data)
+            elif isinstance(event, BytesMessage):
+                await queue.put(bytes(event.data))
+
+    @staticmethod
+    async def write_upstream(ws, queue: asyncio.Queue):
+        while True:
+            message = await queue.get()
+            if isinstance(message, WebSocketClose):
+                await ws.close(message.sendable_code)
+                return
+            WS_FRAMES_TO_UPSTREAM.inc()
+            logger.debug("frame", extra={"direction": "to_upstream", "sample": FRAME_LOG_SAMPLE})
+            if isinstance(message, str):
+                await ws.send_text(message)
+            else:
+                await ws.send_bytes(message)
+
+    @staticmethod
+    async def write_client(client_ws: WebSocket, queue: asyncio.Queue):
+        while True:
+            message = await queue.get()
+            if isinstance(message, WebSocketClose):
+                await client_ws.close(code=message.sendable_code)
+                return
+            WS_FRAMES_TO_CLIENT.inc()
+            logger.debug("frame", extra={"direction": "to_client", "sample": FRAME_LOG_SAMPLE})
+            if isinstance(message, str):
+                await client_ws.send_text(message)
+            else:
+                await client_ws.send_bytes(message)
+
+class MultiplexedWebSocketProxy(SimpleWebSocketProxy):
+    """Proxies a client over a channel of a shared upstream socket."""
+
+    async def proxy(self, client_ws: WebSocket):
+        pool = get_mux_pool(
+            f"{self.ws_url}{settings.WEBSOCKET_MUX_PATH}",
+            settings.WEBSOCKET_MUX_CONNECTIONS,
+            self.queue_size
+        )
+        try:
+            await client_ws.accept()
+            channel = await pool.open_channel()
+        except Exception as e:
+            self.upstream_failed = True
+            logger.warning("Service connection error", extra={"upstream": self.ws_url, "error": str(e)})
             try:
                 await client_ws.close(code=1011)
             except:
                 pass
+            return
+
+        try:
+            await self.pump(client_ws, channel)
+        except Exception as e:
+            logger.warning("Message handling error", extra={"error": str(e)})
+        finally:
+            await channel.close()
+            try:
+                await client_ws.close()
+            except:
+                pass
+
+class WebSocketClose:
+    """Queue marker carrying the close code from one side to the other."""
+
+    # codes that may only be observed, never sent in a close frame
+    RESERVED = {1005, 1006, 1015}
+
+    def __init__(self, code: Optional[int]):
+        self.code = code or 1000
+
+    @property
+    def sendable_code(self) -> int:
+        return 1000 if self.code in self.RESERVED else self.code
 
 def route_ws(
         request_methods:Any,
         path: str, 
         service_url: str, 
-        authentication_required: bool = False):
+        authentication_required: bool = False,
+        multiplex: bool = False):
+
+        group = get_group(service_url)
+        connections = WS_CONNECTIONS.labels()
 
         def websocket_wrapper(func):
             @request_methods(path)
             async def inner(websocket: WebSocket):
+                endpoint = group.acquire()
+                failed = False
+                connections.inc()
                 try:
-                    print(f"Attempting to establish proxy to {service_url}")  # Debug log
-                    proxy = SimpleWebSocketProxy(service_url)  # Use provided service_url
+                    logger.debug("Attempting to establish proxy", extra={"upstream": endpoint.url})
+                    proxy_class = MultiplexedWebSocketProxy if multiplex else SimpleWebSocketProxy
+                    proxy = proxy_class(endpoint.url)
                     await proxy.proxy(websocket)
+                    failed = proxy.upstream_failed
                 except Exception as e:
-                    print(f"WebSocket error: {str(e)}")
+                    failed = True
+                    logger.exception("WebSocket error")
                     try:
                         await websocket.close(code=1011)
                     except:
                         pass
+                finally:
+                    connections.dec()
+                    # connection lifetime says nothing about latency, so no ewma sample
+                    group.release(endpoint, None, failed)
             return inner
         return websocket_wrapper
\ No newline at end of file
@@ -0,0 +1,114 @@
+import re
+from typing import List, Optional, Tuple
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from conf.conf import settings
+from spooling import spool_uploads
+
+# (path regex, max body bytes, max file bytes) registered by
+# route_rest(max_body_size=..., max_file_size=...)
+_route_limits: List[Tuple[re.Pattern, int, Optional[int]]] = []
+
+
+def register_body_limit(path: str, max_body_size: int, max_file_size: Optional[int] = None):
+    path_regex, _, _ = compile_path(path)
+    _route_limits.append((path_regex, max_body_size, max_file_size))
+
+
+def limits_for(path: str) -> Tuple[int, Optional[int]]:
+    """(max body bytes, max bytes per uploaded file or None) for ``path``."""
+    for path_regex, limit, file_limit in _route_limits:
+        if path_regex.match(path):
+            return limit, file_limit
+    return settings.MAX_BODY_SIZE, None
+
+
+def body_limit_for(path: str) -> int:
+    return limits_for(path)[0]
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class BodyLimitMiddleware:
+    """Rejects request bodies over the route's limit with 413.
+
+    A declared Content-Length over the limit is refused before any of the
+    body is read. Otherwise bytes are counted as the app pulls them, and
+    once the limit is crossed reading stops; whatever error the app then
+    produces is replaced by the 413 as long as no response has started.
+    Uploads it lets through roll over to disk past ``spool_max_size``, and
+    parsing stops with 413 once a file passes the route's file limit.
+    """
+
+    def __init__(self, app: ASGIApp, spool_max_size: int = settings.UPLOAD_SPOOL_THRESHOLD):
+        self.app = app
+        self.spool_max_size = spool_max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit, file_limit = limits_for(scope["path"])
+        content_length = _header(scope, b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self.reject(send, limit)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise BodyTooLarge()
+            return message
+
+        async def guarded_send(message: Message):
+            nonlocal started
+            if exceeded:
+                # swap the app's own error for the 413
+                if message["type"] == "http.response.start" and not started:
+                    started = True
+                    await self.reject(send, limit)
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            with spool_uploads(self.spool_max_size, file_limit):
+                await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if exceeded and not started:
+                await self.reject(send, limit)
+                return
+            raise
+
+    @staticmethod
+    async def reject(send: Send, limit: int):
+        body = f'{{"detail":"Request body exceeds {limit} bytes"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
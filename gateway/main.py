@@ -2,10 +2,46 @@ from fastapi import FastAPI, status, Request, Response,UploadFile,File,Form,WebS
 from typing import List
 from schema.mldataset import Formdata
 from conf.conf import settings
-from core_1 import route_rest,route_ws
+from core_1 import route_rest,route_ws,APIError
+from fastjson import JSONResponse
 from schema.auth import UpdateSchema,LoginSchema,DeleteSchema
 from  typing import Annotated
-app = FastAPI()
+from contextlib import asynccontextmanager
+from pool import upstream_pool
+from ws_mux import close_mux_pools
+from cache import response_cache
+from metrics import registry
+from log import setup_logging
+from limits import BodyLimitMiddleware
+
+
+setup_logging("gateway")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await upstream_pool.startup()
+    yield
+    await close_mux_pools()
+    await response_cache.aclose()
+    await upstream_pool.aclose()
+
+app = FastAPI(lifespan=lifespan, default_response_class=JSONResponse)
+app.add_middleware(BodyLimitMiddleware)
+
+
+@app.exception_handler(APIError)
+async def api_error_handler(request: Request, exc: APIError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers=exc.headers
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
 
 @route_rest(
     request_method=app.get,
@@ -14,6 +50,7 @@ app = FastAPI()
     service_url=settings.AUTH_SERVICE_URL,
     payload_key="",
     authentication_required=False,
+    cache_ttl=30,
 )
 async def test(request:Request,response:Response):
     pass
@@ -25,6 +62,7 @@ async def test(request:Request,response:Response):
     service_url=settings.AUTH_SERVICE_URL,
     payload_key=None,
     authentication_required=False,
+    cache_ttl=30,
 )
 async def page(request:Request,response:Response,name:str):
     pass
@@ -37,6 +75,7 @@ async def page(request:Request,response:Response,name:str):
     service_url=settings.AUTH_SERVICE_URL,
     payload_key=None,
     authentication_required=False,
+    cache_ttl=30,
 )
 async def test_query(request:Request,response:Response,name:str,values:str):
     pass
@@ -83,7 +122,8 @@ async def update(update_data:UpdateSchema,request: Request, response: Response):
     service_url=settings.MLDATASET_SERVICE_URL,
     payload_key="form_data",
     authentication_required=False,
-    form_data=True
+    form_data=True,
+    multipart=True
 )
 async def image_upload_multiple(request:Request,response:Response,
                                 file_name: Annotated[str, Form()],
@@ -92,11 +132,89 @@ async def image_upload_multiple(request:Request,response:Response,
     pass
 
 
+@route_rest(
+    request_method=app.delete,
+    path="/datasets/{dataset_id}",
+    status_code=status.HTTP_202_ACCEPTED,
+    service_url=settings.MLDATASET_SERVICE_URL,
+    stream=True,
+)
+async def dataset_delete(request: Request, response: Response, dataset_id: int):
+    pass
+
+
+# resumable chunked uploads; every call is piped through untouched, so a
+# multi-GB file never has to fit one request or one GATEWAY_TIMEOUT. They
+# stay off the mldataset breaker: a flaky uploader must not open it for
+# every other route.
+
+@route_rest(
+    request_method=app.post,
+    path="/uploads",
+    status_code=status.HTTP_201_CREATED,
+    service_url=settings.MLDATASET_SERVICE_URL,
+    stream=True,
+    breaker=False,
+)
+async def upload_init(request: Request, response: Response):
+    pass
+
+
+@route_rest(
+    request_method=app.get,
+    path="/uploads/{upload_id}",
+    status_code=status.HTTP_200_OK,
+    service_url=settings.MLDATASET_SERVICE_URL,
+    stream=True,
+    breaker=False,
+)
+async def upload_status(request: Request, response: Response, upload_id: str):
+    pass
+
+
+@route_rest(
+    request_method=app.put,
+    path="/uploads/{upload_id}",
+    status_code=status.HTTP_200_OK,
+    service_url=settings.MLDATASET_SERVICE_URL,
+    stream=True,
+    breaker=False,
+    max_body_size=settings.MAX_UPLOAD_CHUNK_SIZE,
+)
+async def upload_chunk(request: Request, response: Response, upload_id: str):
+    pass
+
+
+@route_rest(
+    request_method=app.post,
+    path="/uploads/{upload_id}/complete",
+    status_code=status.HTTP_202_ACCEPTED,
+    service_url=settings.MLDATASET_SERVICE_URL,
+    stream=True,
+    breaker=False,
+)
+async def upload_complete(request: Request, response: Response, upload_id: str):
+    pass
+
+
+@route_rest(
+    request_method=app.delete,
+    path="/uploads/{upload_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    service_url=settings.MLDATASET_SERVICE_URL,
+    stream=True,
+    breaker=False,
+)
+async def upload_abort(request: Request, response: Response, upload_id: str):
+    pass
+
+
 @route_ws(
     request_methods=app.websocket,
     path="/ws",
     service_url=settings.WEBSOCKET_SERVICE_URL,
     authentication_required=False,
+    multiplex=settings.WEBSOCKET_MULTIPLEX,
 )
 async def websocket_test(websocket:WebSocket):
     pass
@@ -0,0 +1,33 @@
+from prometheus import SIZE_BUCKETS, Counter, Gauge, Histogram, Registry
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "gateway_request_duration_seconds", "Total time spent handling a proxied request.",
+    ("route", "method", "status")))
+PAYLOAD_LATENCY = registry.register(Histogram(
+    "gateway_payload_processing_seconds", "Time spent preparing the upstream payload.",
+    ("route",)))
+REQUEST_SIZE = registry.register(Histogram(
+    "gateway_request_body_bytes", "Size of client request bodies.",
+    ("route",), SIZE_BUCKETS))
+RESPONSE_SIZE = registry.register(Histogram(
+    "gateway_response_body_bytes", "Size of upstream response bodies.",
+    ("upstream",), SIZE_BUCKETS))
+IN_FLIGHT = registry.register(Gauge(
+    "gateway_requests_in_flight", "Requests currently being proxied.",
+    ("route",)))
+UPSTREAM_CONNECT = registry.register(Histogram(
+    "gateway_upstream_connect_seconds", "Time to open a new upstream connection.",
+    ("upstream",)))
+UPSTREAM_TTFB = registry.register(Histogram(
+    "gateway_upstream_ttfb_seconds", "Time from sending the request to upstream response headers.",
+    ("upstream",)))
+UPSTREAM_TRANSFER = registry.register(Histogram(
+    "gateway_upstream_transfer_seconds", "Time to read the upstream response body.",
+    ("upstream",)))
+WS_FRAMES = registry.register(Counter(
+    "gateway_websocket_frames_total", "WebSocket frames forwarded by the proxy.",
+    ("direction",)))
+WS_CONNECTIONS = registry.register(Gauge(
+    "gateway_websocket_connections", "Client WebSocket connections currently proxied."))
@@ -1,5 +1,6 @@
 import httpx
 from conf.conf import settings
+from pool import upstream_pool
 
 
 async def make_request(
@@ -12,8 +13,7 @@ async def make_request(
     if not data:
         data = {}
     timeout = httpx.Timeout(settings.GATEWAY_TIMEOUT)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        request = getattr(client, method)
-        response = await request(url, json=data, headers=headers)
-        new_data = response.json()
-        return (new_data, response.status_code)
\ No newline at end of file
+    client = upstream_pool.client(url)
+    response = await client.request(method.upper(), url, json=data, headers=headers, timeout=timeout)
+    new_data = response.json()
+    return (new_data, response.status_code)
\ No newline at end of file
@@ -0,0 +1,55 @@
+import httpx
+from typing import Dict
+from conf.conf import settings
+
+
+class UpstreamPool:
+    """One long-lived httpx.AsyncClient per upstream origin.
+
+    Clients are shared by every proxied request so connections are kept
+    alive between calls instead of being opened and torn down each time.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    @staticmethod
+    def origin(url: str) -> str:
+        parsed = httpx.URL(url)
+        port = f":{parsed.port}" if parsed.port else ""
+        return f"{parsed.scheme}://{parsed.host}{port}"
+
+    def _build_client(self, origin: str) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(
+            base_url=origin,
+            limits=limits,
+            http2=settings.UPSTREAM_HTTP2,
+            timeout=httpx.Timeout(settings.GATEWAY_TIMEOUT),
+        )
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        key = self.origin(url)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = self._build_client(key)
+            self._clients[key] = client
+        return client
+
+    async def startup(self):
+        for service_url in (settings.AUTH_SERVICE_URL, settings.MLDATASET_SERVICE_URL):
+            for url in settings.replicas()[service_url] or [service_url]:
+                self.client(url)
+
+    async def aclose(self):
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+upstream_pool = UpstreamPool()
@@ -0,0 +1,190 @@
+import time
+from collections import deque
+from typing import Dict, Optional
+import httpx
+from fastapi import status
+from conf.conf import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling an upstream that is known to be unhealthy."""
+
+    def __init__(self, detail: str, retry_after: Optional[float] = None):
+        self.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        self.detail = detail
+        self.retry_after = retry_after
+        super().__init__(detail)
+
+
+class CircuitBreaker:
+    """Failure-rate and slow-call breaker over a rolling window of calls.
+
+    Trips open when enough of the last ``window`` calls failed or took longer
+    than ``slow_call_seconds``. After ``open_seconds`` it lets a limited number
+    of probe calls through (half-open); one failed probe re-opens it, enough
+    successful probes close it again.
+    """
+
+    def __init__(
+        self,
+        window: int = settings.BREAKER_WINDOW,
+        min_calls: int = settings.BREAKER_MIN_CALLS,
+        failure_rate: float = settings.BREAKER_FAILURE_RATE,
+        slow_call_seconds: float = settings.BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate: float = settings.BREAKER_SLOW_CALL_RATE,
+        open_seconds: float = settings.BREAKER_OPEN_SECONDS,
+        half_open_probes: int = settings.BREAKER_HALF_OPEN_PROBES,
+    ):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self._calls: deque = deque(maxlen=window)  # (failed, slow) per call
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def before_call(self):
+        if self.state == OPEN:
+            remaining = self._opened_at + self.open_seconds - time.monotonic()
+            if remaining > 0:
+                raise UpstreamUnavailable("upstream circuit is open", retry_after=remaining)
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                raise UpstreamUnavailable("upstream circuit is half-open", retry_after=self.open_seconds)
+            self._probes_in_flight += 1
+
+    def after_call(self, failed: bool, elapsed: float):
+        slow = elapsed >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            self._probes_in_flight -= 1
+            if failed or slow:
+                self._trip()
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self.state = CLOSED
+                    self._calls.clear()
+            return
+
+        self._calls.append((failed, slow))
+        if len(self._calls) < self.min_calls:
+            return
+        failures = sum(1 for f, _ in self._calls if f)
+        slow_calls = sum(1 for _, s in self._calls if s)
+        if (failures / len(self._calls) >= self.failure_rate
+                or slow_calls / len(self._calls) >= self.slow_call_rate):
+            self._trip()
+
+    def _trip(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+
+
+class Bulkhead:
+    """Caps concurrent calls to one upstream; excess calls are shed at once."""
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+    def acquire(self):
+        if self.in_flight >= self.max_in_flight:
+            raise UpstreamUnavailable("too many requests in flight to upstream")
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+
+
+class UpstreamGuard:
+    """Breaker and bulkhead for a single upstream.
+
+    Wrap each upstream call in ``async with guard.call():``. A call counts as
+    failed when it raises an httpx transport error or is marked failed (the
+    caller does so for 5xx answers); 4xx answers, errors on the client's side
+    of the request and bugs in the gateway say nothing about the upstream and
+    are not held against it.
+    """
+
+    def __init__(self, breaker: Optional[CircuitBreaker], bulkhead: Optional[Bulkhead]):
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+
+    def call(self) -> "_GuardedCall":
+        return _GuardedCall(self)
+
+
+class _GuardedCall:
+    def __init__(self, guard: UpstreamGuard):
+        self.guard = guard
+        self.started = 0.0
+        self.failed = False
+        self.elapsed: Optional[float] = None
+
+    def mark_failed(self):
+        """Count the call as failed, whether or not it goes on to raise."""
+        self.failed = True
+
+    def timed(self, elapsed: float):
+        """Judge slowness by ``elapsed`` (the wait for the upstream's answer)
+        instead of the whole block, which may include a long upload."""
+        self.elapsed = elapsed
+
+    async def __aenter__(self):
+        guard = self.guard
+        if guard.bulkhead is not None:
+            guard.bulkhead.acquire()
+        if guard.breaker is not None:
+            try:
+                guard.breaker.before_call()
+            except UpstreamUnavailable:
+                if guard.bulkhead is not None:
+                    guard.bulkhead.release()
+                raise
+        self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        guard = self.guard
+        if guard.bulkhead is not None:
+            guard.bulkhead.release()
+        if guard.breaker is not None:
+            failed = self.failed or isinstance(exc, httpx.TransportError)
+            elapsed = self.elapsed if self.elapsed is not None else time.monotonic() - self.started
+            guard.breaker.after_call(failed, elapsed)
+        return False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_bulkheads: Dict[tuple, Bulkhead] = {}
+
+
+def get_guard(service_url: str, breaker: bool, max_in_flight: Optional[int]) -> UpstreamGuard:
+    """Breakers are shared per upstream so every route to it sees the same
+    health; bulkheads are shared by the routes declaring the same limit."""
+    breaker_obj = None
+    if breaker:
+        breaker_obj = _breakers.get(service_url)
+        if breaker_obj is None:
+            breaker_obj = _breakers[service_url] = CircuitBreaker()
+    bulkhead_obj = None
+    if max_in_flight:
+        bulkhead_obj = _bulkheads.get((service_url, max_in_flight))
+        if bulkhead_obj is None:
+            bulkhead_obj = _bulkheads[(service_url, max_in_flight)] = Bulkhead(max_in_flight)
+    return UpstreamGuard(breaker_obj, bulkhead_obj)
@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+# the gateway is run from its own directory (see the Dockerfile)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pool import upstream_pool  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def mock_upstream():
+    """Route calls for an origin to a handler instead of the network."""
+    origins = []
+
+    def install(origin: str, handler):
+        upstream_pool._clients[origin] = httpx.AsyncClient(
+            base_url=origin, transport=httpx.MockTransport(handler))
+        origins.append(origin)
+
+    yield install
+    for origin in origins:
+        upstream_pool._clients.pop(origin, None)
@@ -0,0 +1,100 @@
+import pytest
+
+import balancer
+from balancer import EWMA, LEAST_OUTSTANDING, ROUND_ROBIN, UpstreamGroup, get_group
+from conf.conf import settings
+
+URLS = ["http://a:1", "http://b:1", "http://c:1"]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(balancer.time, "monotonic", lambda: now[0])
+    return now
+
+
+def picks(group, n):
+    urls = []
+    for _ in range(n):
+        endpoint = group.acquire()
+        urls.append(endpoint.url)
+        group.release(endpoint, 0.01, False)
+    return urls
+
+
+def test_round_robin_cycles_through_the_replicas():
+    assert picks(UpstreamGroup(URLS, strategy=ROUND_ROBIN), 6) == URLS * 2
+
+
+def test_least_outstanding_prefers_the_idlest_replica():
+    group = UpstreamGroup(URLS, strategy=LEAST_OUTSTANDING)
+    held = [group.acquire() for _ in range(3)]
+    assert sorted(e.url for e in held) == URLS
+    group.release(held[1], 0.01, False)
+    assert group.acquire().url == held[1].url
+
+
+def test_least_outstanding_spreads_ties():
+    group = UpstreamGroup(URLS, strategy=LEAST_OUTSTANDING)
+    assert sorted(picks(group, 3)) == URLS
+
+
+def test_ewma_prefers_the_fastest_replica_and_tries_unmeasured_ones_first():
+    group = UpstreamGroup(URLS, strategy=EWMA, ewma_decay=0.5)
+    for endpoint, elapsed in zip(group.endpoints, (0.3, 0.1, 0.2)):
+        endpoint.outstanding += 1
+        group.release(endpoint, elapsed, False)
+    assert group.acquire().url == "http://b:1"
+    group.endpoints.append(balancer.Endpoint("http://d:1"))
+    assert group.acquire().url == "http://d:1"
+
+
+def test_ewma_decays_towards_recent_latency():
+    group = UpstreamGroup(URLS[:1], strategy=EWMA, ewma_decay=0.5)
+    for elapsed in (1.0, 0.0):
+        group.release(group.acquire(), elapsed, False)
+    assert group.endpoints[0].ewma == pytest.approx(0.5)
+
+
+def test_failing_replica_is_ejected_and_returns_after_the_cooldown(clock):
+    group = UpstreamGroup(URLS, strategy=ROUND_ROBIN, eject_failures=2, eject_seconds=30)
+    a = group.endpoints[0]
+    for _ in range(2):
+        a.outstanding += 1
+        group.release(a, None, True)
+    assert "http://a:1" not in picks(group, 6)
+
+    clock[0] += 30
+    assert "http://a:1" in picks(group, 3)
+
+
+def test_a_success_resets_the_failure_count(clock):
+    group = UpstreamGroup(URLS, eject_failures=2)
+    a = group.endpoints[0]
+    for failed in (True, False, True):
+        a.outstanding += 1
+        group.release(a, 0.01, failed)
+    assert a.available(clock[0])
+
+
+def test_all_replicas_ejected_are_used_rather_than_failing(clock):
+    group = UpstreamGroup(URLS[:2], eject_failures=1)
+    for endpoint in group.endpoints:
+        endpoint.outstanding += 1
+        group.release(endpoint, None, True)
+    assert sorted(picks(group, 2)) == URLS[:2]
+
+
+def test_unknown_strategy_is_refused():
+    with pytest.raises(ValueError):
+        UpstreamGroup(URLS, strategy="random")
+
+
+def test_groups_use_the_configured_replicas(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_SERVICE_REPLICAS", ["http://auth-1:8002/", "http://auth-2:8002"])
+    monkeypatch.setattr(balancer, "_groups", {})
+    group = get_group(settings.AUTH_SERVICE_URL)
+    assert [e.url for e in group.endpoints] == ["http://auth-1:8002", "http://auth-2:8002"]
+    assert get_group(settings.AUTH_SERVICE_URL) is group
+    assert [e.url for e in get_group("http://solo:1").endpoints] == ["http://solo:1"]
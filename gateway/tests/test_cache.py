@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response, status
+from fastapi.testclient import TestClient
+
+from cache import CacheEntry, MemoryCache, ResponseCache, cache_lifetime
+from core_1 import APIError, Client, route_rest
+
+UPSTREAM = "http://cache-upstream"
+
+
+def entry(body: bytes = b"x", expires_in: float = 60) -> CacheEntry:
+    return CacheEntry(200, body, "application/json", None, time.monotonic() + expires_in)
+
+
+@pytest.mark.anyio
+async def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2, max_bytes=1024, stale_ttl=0)
+    await cache.set("a", entry(), 60)
+    await cache.set("b", entry(), 60)
+    assert await cache.get("a") is not None
+    await cache.set("c", entry(), 60)
+    assert await cache.get("b") is None
+    assert await cache.get("a") is not None
+    assert await cache.get("c") is not None
+
+
+@pytest.mark.anyio
+async def test_memory_cache_is_bounded_by_bytes():
+    cache = MemoryCache(max_entries=10, max_bytes=10, stale_ttl=0)
+    await cache.set("big", entry(b"x" * 11), 60)
+    assert await cache.get("big") is None
+    await cache.set("a", entry(b"x" * 6), 60)
+    await cache.set("b", entry(b"x" * 6), 60)
+    assert await cache.get("a") is None
+    assert await cache.get("b") is not None
+
+
+@pytest.mark.parametrize("header, lifetime", [
+    ("", 30),
+    ("max-age=5", 5),
+    ("public, s-maxage=3, max-age=5", 3),
+    ("max-age=600", 30),
+    ("no-store", 0),
+    ("private, max-age=10", 0),
+    ("max-age=soon", 0),
+])
+def test_cache_lifetime_follows_cache_control(header, lifetime):
+    response = httpx.Response(200, headers={"cache-control": header} if header else {})
+    assert cache_lifetime(response, 30) == lifetime
+
+
+@pytest.mark.anyio
+async def test_concurrent_misses_share_one_upstream_call():
+    cache = ResponseCache(MemoryCache(10, 1024, 60))
+    calls = []
+
+    async def load(etag):
+        calls.append(etag)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, content=b"shared")
+
+    results = await asyncio.gather(*(cache.get_or_fetch("k", 30, load) for _ in range(10)))
+    assert calls == [None]
+    assert {result.body for result in results} == {b"shared"}
+
+
+@pytest.mark.anyio
+async def test_errors_are_not_cached():
+    cache = ResponseCache(MemoryCache(10, 1024, 60))
+
+    async def load(etag):
+        return httpx.Response(500, content=b"boom")
+
+    assert (await cache.get_or_fetch("k", 30, load)).status_code == 500
+    assert await cache.backend.get("k") is None
+
+
+@pytest.mark.anyio
+async def test_conditional_fetch_returns_304(mock_upstream):
+    mock_upstream(UPSTREAM, lambda request: httpx.Response(304))
+    client = Client()
+    response = await client.fetch(f"{UPSTREAM}/x", "get", headers={"If-None-Match": '"v1"'})
+    assert response.status_code == 304
+    # an unconditional request has no business getting a 304
+    with pytest.raises(APIError):
+        await client.fetch(f"{UPSTREAM}/x", "get")
+
+
+def test_stale_entry_is_revalidated_with_its_etag(mock_upstream):
+    seen = []
+
+    def handler(request: httpx.Request):
+        seen.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"etag": '"v1"'})
+        return httpx.Response(200, json={"items": [1, 2]}, headers={"etag": '"v1"'})
+
+    mock_upstream(UPSTREAM, handler)
+    app = FastAPI()
+
+    @app.exception_handler(APIError)
+    async def api_error(request: Request, exc: APIError):
+        return Response(status_code=exc.status_code, content=exc.detail)
+
+    @route_rest(
+        request_method=app.get,
+        path="/revalidated",
+        status_code=status.HTTP_200_OK,
+        service_url=UPSTREAM,
+        cache_ttl=0.05,
+    )
+    async def revalidated(request: Request, response: Response):
+        pass
+
+    client = TestClient(app)
+    first = client.get("/revalidated")
+    assert first.status_code == 200 and first.json() == {"items": [1, 2]}
+    assert client.get("/revalidated").json() == {"items": [1, 2]}
+    assert seen == [None]
+
+    time.sleep(0.1)
+    stale = client.get("/revalidated")
+    assert stale.status_code == 200
+    assert stale.json() == {"items": [1, 2]}
+    assert stale.headers["etag"] == '"v1"'
+    assert seen == [None, '"v1"']
+
+    # the 304 refreshed the entry, so the next read is a hit again
+    assert client.get("/revalidated").json() == {"items": [1, 2]}
+    assert seen == [None, '"v1"']
+
+    # and the gateway answers the client's own conditional request
+    assert client.get("/revalidated", headers={"If-None-Match": '"v1"'}).status_code == 304
@@ -0,0 +1,41 @@
+import warnings
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.responses import JSONResponse as StarletteJSONResponse
+
+import fastjson
+from fastjson import JSONResponse
+
+CONTENTS = [
+    {"message": "ok", "count": 3, "ratio": 0.25, "done": True, "missing": None},
+    {"name": "Zoë ✓ 数据", "tags": ["a", "b"], "nested": {"x": [1, 2.5, {"y": None}]}},
+    {1: "int keys", 2: ["as", "strings"]},
+    [],
+    "plain",
+]
+
+
+@pytest.mark.parametrize("content", CONTENTS)
+def test_body_and_headers_match_starlette(content):
+    ours, theirs = JSONResponse(content, status_code=201), StarletteJSONResponse(content, status_code=201)
+    assert ours.body == theirs.body
+    assert ours.raw_headers == theirs.raw_headers
+    assert fastjson.loads(ours.body) == fastjson.loads(theirs.body)
+
+
+def test_default_response_class_serves_the_same_bytes_without_warnings():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        app = FastAPI(default_response_class=JSONResponse)
+
+        @app.get("/item")
+        async def item():
+            return CONTENTS[1]
+
+        response = TestClient(app).get("/item")
+    expected = StarletteJSONResponse(CONTENTS[1])
+    assert response.content == expected.body
+    assert response.headers["content-type"] == expected.media_type
+    assert response.headers["content-length"] == str(len(expected.body))
@@ -0,0 +1,88 @@
+import json
+from typing import Annotated, List, Optional
+
+import httpx
+import pytest
+from fastapi import FastAPI, File, Form, Request, Response, UploadFile
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from core_1 import route_rest
+
+UPSTREAM = "http://forwarder-upstream"
+
+
+class Item(BaseModel):
+    name: str
+    size: int
+
+
+app = FastAPI()
+
+
+@route_rest(request_method=app.get, path="/ping", service_url=UPSTREAM)
+async def ping(request: Request, response: Response):
+    pass
+
+
+@route_rest(request_method=app.get, path="/items/{item_id}", service_url=UPSTREAM)
+async def get_item(request: Request, response: Response, item_id: int, q: Optional[str] = None):
+    pass
+
+
+@route_rest(request_method=app.post, path="/items/{item_id}", service_url=UPSTREAM, payload_key="item")
+async def put_item(request: Request, response: Response, item_id: int, item: Optional[Item] = None):
+    pass
+
+
+@route_rest(request_method=app.post, path="/items", service_url=UPSTREAM, payload_key="item")
+async def add_item(request: Request, response: Response, item: Item):
+    pass
+
+
+@route_rest(request_method=app.post, path="/forms", service_url=UPSTREAM, payload_key="form_data", form_data=True)
+async def post_form(request: Request, response: Response,
+                    file_name: Annotated[str, Form()],
+                    files: Annotated[List[UploadFile], File()] = []):
+    pass
+
+
+@pytest.fixture
+def sent(mock_upstream):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append({
+            "url": str(request.url),
+            "params": dict(request.url.params),
+            "body": json.loads(request.content) if request.content else None,
+        })
+        return httpx.Response(200, json={"ok": True})
+
+    mock_upstream(UPSTREAM, handler)
+    return calls
+
+
+# what the uncompiled route_rest sent: process_payload's result as the JSON
+# body, the query string as params and the request path on the service url
+@pytest.mark.parametrize("method, url, options, body", [
+    ("get", "/ping", {}, None),
+    ("get", "/items/3?q=x", {}, {"item_id": 3, "q": "x"}),
+    ("get", "/items/3", {}, {"item_id": 3, "q": None}),
+    ("post", "/items/3?q=x", {"json": {"name": "a", "size": 1}}, {"name": "a", "size": 1}),
+    ("post", "/items/3", {}, {"item_id": 3, "item": None}),
+    ("post", "/items", {"json": {"name": "b", "size": 2}}, {"name": "b", "size": 2}),
+    ("post", "/forms", {"data": {"file_name": "f"}, "files": [("files", ("a.txt", b"hi", "text/plain"))]},
+     {"file_name": "f", "files": [{"filename": "a.txt", "content": "aGk=", "content_type": "text/plain"}]}),
+])
+def test_forwarded_request_matches_the_uncompiled_route(sent, method, url, options, body):
+    response = TestClient(app).request(method, url, **options)
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+
+    query = httpx.URL(url).params
+    assert sent == [{
+        "url": str(httpx.URL(UPSTREAM + httpx.URL(url).path, params=query)),
+        "params": dict(query),
+        "body": body,
+    }]
@@ -0,0 +1,105 @@
+from typing import Annotated, List
+
+import pytest
+from fastapi import FastAPI, File, Request, UploadFile
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.formparsers import MultiPartParser
+
+from limits import BodyLimitMiddleware, body_limit_for, limits_for, register_body_limit
+from spooling import SpoolingMultiPartParser, spool_uploads
+
+
+def make_app(spool_max_size: int = 1024) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(BodyLimitMiddleware, spool_max_size=spool_max_size)
+
+    @app.post("/limits/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    @app.post("/limits/upload/{name}")
+    async def upload(name: str, files: Annotated[List[UploadFile], File()]):
+        return {"rolled": [file.file._rolled for file in files]}
+
+    return app
+
+
+register_body_limit("/limits/upload/{name}", 64 * 1024, 8 * 1024)
+
+
+@pytest.fixture
+def client():
+    return TestClient(make_app())
+
+
+def test_route_limits_match_templated_paths():
+    assert limits_for("/limits/upload/abc") == (64 * 1024, 8 * 1024)
+    assert body_limit_for("/limits/echo") > 64 * 1024
+    assert limits_for("/limits/echo")[1] is None
+
+
+def test_declared_length_over_the_limit_is_refused(client):
+    response = client.post("/limits/upload/a", content=b"x" * (64 * 1024 + 1),
+                           headers={"content-type": "application/octet-stream"})
+    assert response.status_code == 413
+    assert response.json() == {"detail": f"Request body exceeds {64 * 1024} bytes"}
+
+
+def test_streamed_body_is_cut_off_at_the_limit(client):
+    def chunks():
+        for _ in range(100):
+            yield b"x" * 1024
+
+    response = client.post("/limits/upload/a", content=chunks(),
+                           headers={"content-type": "multipart/form-data; boundary=x"})
+    assert response.status_code == 413
+
+
+def test_bodies_under_the_limit_pass(client):
+    assert client.post("/limits/echo", content=b"x" * 2048).json() == {"size": 2048}
+
+
+def test_uploads_spool_to_disk_past_the_app_threshold(client):
+    files = [("files", ("small.bin", b"x" * 512)), ("files", ("large.bin", b"x" * 4096))]
+    assert client.post("/limits/upload/a", files=files).json() == {"rolled": [False, True]}
+
+
+def test_spool_threshold_does_not_leak_to_other_apps():
+    other = FastAPI()
+
+    @other.post("/upload")
+    async def upload(files: Annotated[List[UploadFile], File()]):
+        return {"rolled": [file.file._rolled for file in files]}
+
+    # well under Starlette's default threshold, well over the limited app's
+    files = [("files", ("a.bin", b"x" * 4096))]
+    assert TestClient(other).post("/upload", files=files).json() == {"rolled": [False]}
+    assert MultiPartParser.spool_max_size == 1024 * 1024
+
+
+def test_oversized_file_is_refused_while_it_is_parsed(client):
+    files = [("files", ("small.bin", b"x" * 1024)), ("files", ("large.bin", b"x" * (8 * 1024 + 1)))]
+    response = client.post("/limits/upload/a", files=files)
+    assert response.status_code == 413
+    assert response.json() == {"detail": f"File large.bin exceeds {8 * 1024} bytes"}
+    assert client.post("/limits/upload/a", files=files[:1]).status_code == 200
+
+
+@pytest.mark.anyio
+async def test_parsing_stops_at_the_first_chunk_past_the_file_limit():
+    pulled = []
+
+    async def body():
+        yield b'--x\r\nContent-Disposition: form-data; name="f"; filename="big.bin"\r\n\r\n'
+        for n in range(64):
+            pulled.append(n)
+            yield b"x" * 1024
+        yield b"\r\n--x--\r\n"
+
+    parser = SpoolingMultiPartParser(Headers({"content-type": "multipart/form-data; boundary=x"}), body())
+    with spool_uploads(1024, 4 * 1024), pytest.raises(HTTPException) as error:
+        await parser.parse()
+    assert error.value.status_code == 413
+    assert len(pulled) == 5
@@ -0,0 +1,33 @@
+import atexit
+import logging
+
+import pytest
+
+from log import QUIET_LOGGERS, setup_logging
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    levels = {name: logging.getLogger(name).level for name in QUIET_LOGGERS}
+    yield
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    for name, value in levels.items():
+        logging.getLogger(name).setLevel(value)
+
+
+@pytest.mark.parametrize("level, quiet", [("INFO", logging.WARNING), ("DEBUG", logging.WARNING),
+                                          ("ERROR", logging.ERROR)])
+def test_upstream_client_loggers_stay_quiet(monkeypatch, restore_logging, level, quiet):
+    monkeypatch.setenv("LOG_LEVEL", level)
+    listener = setup_logging("test")
+    try:
+        assert logging.getLogger().level == logging.getLevelName(level)
+        for name in QUIET_LOGGERS:
+            assert logging.getLogger(name).level == quiet
+        assert not logging.getLogger("httpx").isEnabledFor(logging.INFO)
+    finally:
+        atexit.unregister(listener.stop)
+        listener.stop()
@@ -0,0 +1,90 @@
+import hashlib
+import io
+from typing import Annotated, List
+
+import httpx
+import pytest
+from fastapi import FastAPI, File, Form, Request, Response, UploadFile, status
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from starlette.datastructures import Headers
+
+from core_1 import route_rest, process_multipart
+from pool import upstream_pool
+
+UPSTREAM = "http://multipart-upstream"
+BIG = bytes(range(256)) * 4096
+
+upstream = FastAPI()
+
+
+@upstream.post("/form_files")
+async def form_files(request: Request):
+    form = await request.form()
+    fields = {key: form.getlist(key) for key in form if not hasattr(form[key], "filename")}
+    files = [
+        {"field": key, "name": item.filename, "type": item.content_type,
+         "sha256": hashlib.sha256(await item.read()).hexdigest()}
+        for key, item in form.multi_items() if hasattr(item, "filename")
+    ]
+    return {"fields": fields, "files": files}
+
+
+@pytest.fixture
+def client():
+    upstream_pool._clients[UPSTREAM] = httpx.AsyncClient(base_url=UPSTREAM, transport=httpx.ASGITransport(upstream))
+    app = FastAPI()
+
+    @route_rest(
+        request_method=app.post,
+        path="/form_files",
+        status_code=status.HTTP_201_CREATED,
+        service_url=UPSTREAM,
+        payload_key="form_data",
+        form_data=True,
+        multipart=True,
+    )
+    async def upload(request: Request, response: Response,
+                     file_name: Annotated[str, Form()],
+                     files: Annotated[List[UploadFile], File()] = []):
+        pass
+
+    yield TestClient(app)
+    upstream_pool._clients.pop(UPSTREAM, None)
+
+
+def test_fields_and_files_are_forwarded_as_multipart(client):
+    response = client.post("/form_files", data={"file_name": "batch"}, files=[
+        ("files", ("a.png", BIG, "image/png")),
+        ("files", ("b.txt", b"hello", "text/plain")),
+    ])
+    assert response.status_code == 200
+    assert response.json() == {
+        "fields": {"file_name": ["batch"]},
+        "files": [
+            {"field": "files", "name": "a.png", "type": "image/png", "sha256": hashlib.sha256(BIG).hexdigest()},
+            {"field": "files", "name": "b.txt", "type": "text/plain", "sha256": hashlib.sha256(b"hello").hexdigest()},
+        ],
+    }
+
+
+def test_form_without_files_still_goes_out(client):
+    response = client.post("/form_files", data={"file_name": "empty"})
+    assert response.json() == {"fields": {"file_name": ["empty"]}, "files": []}
+
+
+class Meta(BaseModel):
+    tag: str
+
+
+def test_uploads_are_passed_as_their_spooled_files():
+    spooled = io.BytesIO(b"data")
+    spooled.seek(4)
+    upload = UploadFile(spooled, filename="f.bin", headers=Headers({"content-type": "application/x-test"}))
+    fields, files = process_multipart("form_data", {
+        "name": "n", "count": 3, "meta": Meta(tag="t"), "skipped": None, "files": [upload],
+    })
+    assert fields == {"name": ["n"], "count": ["3"], "meta": ['{"tag":"t"}']}
+    assert files == [("files", ("f.bin", spooled, "application/x-test"))]
+    # rewound so httpx sends it from the start
+    assert spooled.tell() == 0
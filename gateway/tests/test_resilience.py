@@ -0,0 +1,216 @@
+import httpx
+import pytest
+
+import resilience
+from core_1 import APIError, Client
+from resilience import CLOSED, HALF_OPEN, OPEN, Bulkhead, CircuitBreaker, UpstreamGuard, UpstreamUnavailable
+
+UPSTREAM = "http://guarded-upstream"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def breaker(**options) -> CircuitBreaker:
+    defaults = dict(window=10, min_calls=4, failure_rate=0.5, slow_call_seconds=1.0,
+                    slow_call_rate=0.75, open_seconds=10.0, half_open_probes=2)
+    return CircuitBreaker(**{**defaults, **options})
+
+
+def record(cb: CircuitBreaker, failed=False, elapsed=0.01):
+    cb.before_call()
+    cb.after_call(failed, elapsed)
+
+
+def test_breaker_waits_for_min_calls_before_judging(clock):
+    cb = breaker()
+    for _ in range(3):
+        record(cb, failed=True)
+    assert cb.state == CLOSED
+    record(cb, failed=True)
+    assert cb.state == OPEN
+
+
+def test_breaker_trips_at_the_failure_rate(clock):
+    cb = breaker()
+    for failed in (False, True, False, False, True):
+        record(cb, failed=failed)
+    assert cb.state == CLOSED
+    record(cb, failed=True)  # 3 of 6
+    assert cb.state == OPEN
+
+
+def test_breaker_trips_on_the_slow_call_rate(clock):
+    cb = breaker()
+    for elapsed in (2.0, 2.0, 0.1, 2.0):
+        record(cb, elapsed=elapsed)
+    assert cb.state == OPEN
+
+
+def test_open_breaker_rejects_until_the_cooldown_ends(clock):
+    cb = breaker()
+    for _ in range(4):
+        record(cb, failed=True)
+    clock.now += 4
+    with pytest.raises(UpstreamUnavailable) as error:
+        cb.before_call()
+    assert error.value.status_code == 503
+    assert error.value.retry_after == pytest.approx(6)
+
+    clock.now += 6
+    cb.before_call()
+    assert cb.state == HALF_OPEN
+
+
+def test_half_open_lets_a_few_probes_through_and_closes_on_success(clock):
+    cb = breaker()
+    for _ in range(4):
+        record(cb, failed=True)
+    clock.now += 10
+    cb.before_call()
+    cb.before_call()
+    with pytest.raises(UpstreamUnavailable):
+        cb.before_call()
+    cb.after_call(False, 0.01)
+    assert cb.state == HALF_OPEN
+    cb.after_call(False, 0.01)
+    assert cb.state == CLOSED
+    # the window starts over once closed
+    for _ in range(3):
+        record(cb, failed=True)
+    assert cb.state == CLOSED
+
+
+@pytest.mark.parametrize("failed, elapsed", [(True, 0.01), (False, 2.0)])
+def test_a_bad_probe_opens_the_breaker_again(clock, failed, elapsed):
+    cb = breaker()
+    for _ in range(4):
+        record(cb, failed=True)
+    clock.now += 10
+    cb.before_call()
+    cb.after_call(failed, elapsed)
+    assert cb.state == OPEN
+    with pytest.raises(UpstreamUnavailable):
+        cb.before_call()
+
+
+def test_bulkhead_sheds_calls_past_its_limit():
+    bulkhead = Bulkhead(2)
+    bulkhead.acquire()
+    bulkhead.acquire()
+    with pytest.raises(UpstreamUnavailable) as error:
+        bulkhead.acquire()
+    assert error.value.detail == "too many requests in flight to upstream"
+    bulkhead.release()
+    bulkhead.acquire()
+    assert bulkhead.in_flight == 2
+
+
+@pytest.mark.anyio
+async def test_guard_releases_the_bulkhead_when_the_breaker_refuses(clock):
+    cb, bulkhead = breaker(), Bulkhead(1)
+    for _ in range(4):
+        record(cb, failed=True)
+    guard = UpstreamGuard(cb, bulkhead)
+    with pytest.raises(UpstreamUnavailable):
+        async with guard.call():
+            pass
+    assert bulkhead.in_flight == 0
+
+
+async def guarded(guard, exc=None, mark=False, elapsed=None):
+    try:
+        async with guard.call() as call:
+            if mark:
+                call.mark_failed()
+            if elapsed is not None:
+                call.timed(elapsed)
+            if exc is not None:
+                raise exc
+    except BaseException:
+        pass
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("outcome, counted", [
+    (dict(exc=httpx.ConnectError("refused")), True),
+    (dict(exc=httpx.ReadTimeout("slow")), True),
+    (dict(mark=True), True),
+    (dict(mark=True, exc=APIError(502, "bad gateway")), True),
+    (dict(exc=RuntimeError("gateway bug")), False),
+    (dict(exc=APIError(500, "converted elsewhere")), False),
+    (dict(exc=APIError(404, "not found")), False),
+    (dict(), False),
+])
+async def test_only_transport_errors_and_marked_calls_count_as_failures(clock, outcome, counted):
+    cb = breaker(min_calls=1, failure_rate=1.0)
+    await guarded(UpstreamGuard(cb, None), **outcome)
+    assert (cb.state == OPEN) is counted
+
+
+@pytest.mark.anyio
+async def test_slowness_is_judged_by_the_timed_wait(clock):
+    cb = breaker(min_calls=1, slow_call_rate=1.0)
+    guard = UpstreamGuard(cb, None)
+
+    async with guard.call() as call:
+        clock.now += 30  # a long upload
+        call.timed(0.2)
+    assert cb.state == CLOSED
+
+    cb = breaker(min_calls=1, slow_call_rate=1.0)
+    async with UpstreamGuard(cb, None).call():
+        clock.now += 30
+    assert cb.state == OPEN
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("response, counted", [
+    (httpx.Response(503), True),
+    (httpx.Response(404), False),
+])
+async def test_client_counts_upstream_5xx_only(mock_upstream, response, counted):
+    cb = breaker(min_calls=1, failure_rate=1.0)
+    mock_upstream(UPSTREAM, lambda request: response)
+    with pytest.raises(APIError):
+        await Client(guard=UpstreamGuard(cb, None)).fetch(f"{UPSTREAM}/x", "get")
+    assert (cb.state == OPEN) is counted
+
+
+@pytest.mark.anyio
+async def test_client_counts_transport_errors(mock_upstream):
+    cb = breaker(min_calls=1, failure_rate=1.0)
+
+    def refuse(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    mock_upstream(UPSTREAM, refuse)
+    with pytest.raises(APIError) as error:
+        await Client(guard=UpstreamGuard(cb, None)).fetch(f"{UPSTREAM}/x", "get")
+    assert error.value.status_code == 500
+    assert cb.state == OPEN
+
+
+@pytest.mark.anyio
+async def test_response_wait_starts_once_the_body_is_sent(monkeypatch):
+    import core_1
+    now = [0.0]
+    monkeypatch.setattr(core_1.time, "perf_counter", lambda: now[0])
+    timer = core_1.UpstreamTimer("http://x")
+    now[0] = 40.0
+    await timer.trace("http11.send_request_body.complete", {})
+    now[0] = 40.5
+    timer.headers_received()
+    assert timer.response_wait == pytest.approx(0.5)
@@ -0,0 +1,76 @@
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response, status
+from fastapi.testclient import TestClient
+
+from core_1 import APIError, route_rest
+
+UPSTREAM = "http://stream-upstream"
+
+
+@pytest.fixture
+def upstream(mock_upstream):
+    seen = []
+
+    async def handler(request: httpx.Request):
+        body = await request.aread()
+        seen.append((request, body))
+
+        async def chunks():
+            for n in range(3):
+                yield f"part{n};".encode()
+
+        return httpx.Response(
+            status.HTTP_201_CREATED, content=chunks(),
+            headers={"content-type": "text/plain", "x-upstream": "yes", "connection": "close"},
+        )
+
+    mock_upstream(UPSTREAM, handler)
+    return seen
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.exception_handler(APIError)
+    async def api_error(request: Request, exc: APIError):
+        return Response(status_code=exc.status_code, content=exc.detail)
+
+    @route_rest(
+        request_method=app.put,
+        path="/streamed/{item_id}",
+        status_code=status.HTTP_200_OK,
+        service_url=UPSTREAM,
+        stream=True,
+    )
+    async def streamed(request: Request, response: Response, item_id: str):
+        pass
+
+    return TestClient(app)
+
+
+def test_chunked_request_body_reaches_the_upstream_untouched(client, upstream):
+    def body():
+        for n in range(5):
+            yield b"x" * 1000 + str(n).encode()
+
+    response = client.put("/streamed/7?tag=a&tag=b", content=body(), headers={"x-client": "c1"})
+    [(request, received)] = upstream
+    assert request.method == "PUT"
+    assert request.url.path == "/streamed/7"
+    assert request.url.params.get_list("tag") == ["a", "b"]
+    assert request.headers["x-client"] == "c1"
+    assert received == b"".join(b"x" * 1000 + str(n).encode() for n in range(5))
+    assert response.status_code == 201
+
+
+def test_upstream_response_is_relayed_as_it_streams(client, upstream):
+    with client.stream("PUT", "/streamed/1", content=b"{}") as response:
+        chunks = list(response.iter_raw())
+    assert b"".join(chunks) == b"part0;part1;part2;"
+    assert response.status_code == 201
+    assert response.headers["x-upstream"] == "yes"
+    assert response.headers["content-type"] == "text/plain"
+    # hop-by-hop headers describe the upstream connection, not this one
+    assert response.headers.get("connection") != "close"
@@ -0,0 +1,90 @@
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response, status
+from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
+
+import resilience
+from balancer import UpstreamGroup
+from conf.conf import settings
+from core_1 import HTTP_499_CLIENT_CLOSED_REQUEST, APIError, Client, route_rest
+from limits import BodyLimitMiddleware
+from resilience import CLOSED, CircuitBreaker, UpstreamGuard
+
+UPSTREAM = "http://upload-upstream"
+
+
+def answer(status_code: int):
+    async def handler(request: httpx.Request):
+        await request.aread()
+
+        async def body():
+            yield b"{}"
+
+        # a streamed body, as a real upstream connection gives
+        return httpx.Response(status_code, content=body())
+    return handler
+
+
+read_body = answer(200)
+
+
+@pytest.mark.anyio
+async def test_aborted_uploads_trip_neither_breaker_nor_balancer(mock_upstream):
+    mock_upstream(UPSTREAM, read_body)
+    breaker = CircuitBreaker(window=10, min_calls=2, failure_rate=0.5)
+    group = UpstreamGroup([UPSTREAM], eject_failures=1)
+    client = Client(guard=UpstreamGuard(breaker, None), group=group)
+
+    async def aborted():
+        yield b"x" * 1024
+        raise ClientDisconnect()
+
+    for _ in range(10):
+        with pytest.raises(APIError) as error:
+            await client.stream_request("/uploads/a", "put", content=aborted())
+        assert error.value.status_code == HTTP_499_CLIENT_CLOSED_REQUEST
+    assert breaker.state == CLOSED
+    assert group.endpoints[0].available(0) and group.endpoints[0].ejected_until == 0
+
+
+def test_oversized_streamed_bodies_do_not_open_the_breaker(mock_upstream):
+    mock_upstream(UPSTREAM, read_body)
+    app = FastAPI()
+    app.add_middleware(BodyLimitMiddleware)
+
+    @app.exception_handler(APIError)
+    async def api_error(request: Request, exc: APIError):
+        return Response(status_code=exc.status_code, content=exc.detail)
+
+    @route_rest(request_method=app.put, path="/guarded/{name}", status_code=status.HTTP_200_OK,
+                service_url=UPSTREAM, stream=True, max_body_size=1024)
+    async def chunk(request: Request, response: Response, name: str):
+        pass
+
+    @route_rest(request_method=app.get, path="/guarded-health", status_code=status.HTTP_200_OK,
+                service_url=UPSTREAM, stream=True)
+    async def health(request: Request, response: Response):
+        pass
+
+    def body():
+        for _ in range(4):
+            yield b"x" * 1024
+
+    client = TestClient(app)
+    for _ in range(settings.BREAKER_MIN_CALLS * 2):
+        assert client.put("/guarded/a", content=body()).status_code == 413
+    assert resilience._breakers[UPSTREAM].state == CLOSED
+    assert client.get("/guarded-health").status_code == 200
+
+
+def test_upload_routes_stay_off_the_mldataset_breaker(mock_upstream):
+    from main import app
+    from pool import upstream_pool
+
+    mock_upstream(upstream_pool.origin(settings.MLDATASET_SERVICE_URL), answer(503))
+    client = TestClient(app)
+    for _ in range(settings.BREAKER_MIN_CALLS * 2):
+        assert client.put("/uploads/abc?offset=0", content=b"x").status_code == 503
+    breaker = resilience._breakers.get(settings.MLDATASET_SERVICE_URL)
+    assert breaker is None or breaker.state == CLOSED
@@ -0,0 +1,122 @@
+import asyncio
+import struct
+
+import httpx
+import pytest
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from httpx_ws import WebSocketDisconnect as WSUpstreamDisconnect
+from httpx_ws.transport import ASGIWebSocketTransport
+
+from ws_mux import (
+    CLOSE_TRY_AGAIN_LATER, OP_BYTES, OP_CLOSE, OP_OPEN, OP_TEXT, MuxPool, decode_frame, encode_frame,
+)
+
+pytestmark = pytest.mark.anyio
+
+upstream = FastAPI()
+# channel id -> frames to send back when it sends "burst"
+BURST = 20
+
+
+@upstream.websocket("/mux")
+async def mux_echo(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        while True:
+            channel, op, payload = decode_frame(await websocket.receive_bytes())
+            if op == OP_OPEN:
+                await websocket.send_bytes(encode_frame(channel, OP_TEXT, f"hello {channel}".encode()))
+            elif op == OP_TEXT and payload == b"burst":
+                for n in range(BURST):
+                    await websocket.send_bytes(encode_frame(channel, OP_TEXT, str(n).encode()))
+            elif op == OP_TEXT:
+                await websocket.send_bytes(encode_frame(channel, OP_TEXT, payload.upper()))
+            elif op == OP_BYTES:
+                await websocket.send_bytes(encode_frame(channel, OP_BYTES, payload[::-1]))
+            elif op == OP_CLOSE:
+                upstream.state.closed.append((channel, struct.unpack("!H", payload)[0]))
+    except WebSocketDisconnect:
+        pass
+
+
+@upstream.websocket("/refuse")
+async def refuse(websocket: WebSocket):
+    await websocket.close(code=1008)
+
+
+@pytest.fixture
+def clients():
+    upstream.state.closed = []
+    made = []
+
+    def factory():
+        client = httpx.AsyncClient(transport=ASGIWebSocketTransport(upstream))
+        made.append(client)
+        return client
+    factory.made = made
+    return factory
+
+
+async def receive_text(channel) -> str:
+    return (await asyncio.wait_for(channel.receive(), 2)).data
+
+
+async def test_channels_share_one_socket_and_get_their_own_frames(clients):
+    pool = MuxPool("http://upstream/mux", size=1, queue_size=8, client_factory=clients)
+    try:
+        first = await pool.open_channel()
+        second = await pool.open_channel()
+        assert len(pool.connections) == 1
+        assert await receive_text(first) == f"hello {first.id}"
+        assert await receive_text(second) == f"hello {second.id}"
+
+        await second.send_text("two")
+        await first.send_text("one")
+        await first.send_bytes(b"abc")
+        assert await receive_text(second) == "TWO"
+        assert await receive_text(first) == "ONE"
+        assert bytes((await first.receive()).data) == b"cba"
+    finally:
+        await pool.aclose()
+
+
+async def test_lagging_channel_is_dropped_without_stalling_the_others(clients):
+    pool = MuxPool("http://upstream/mux", size=1, queue_size=4, client_factory=clients)
+    try:
+        slow = await pool.open_channel()
+        fast = await pool.open_channel()
+        assert await receive_text(fast) == f"hello {fast.id}"
+
+        # the slow client never reads, so its queue overflows
+        await slow.send_text("burst")
+        await fast.send_text("still here")
+        assert await receive_text(fast) == "STILL HERE"
+
+        received = []
+        with pytest.raises(WSUpstreamDisconnect) as closed:
+            while True:
+                received.append(await asyncio.wait_for(slow.receive(), 2))
+        assert closed.value.code == CLOSE_TRY_AGAIN_LATER
+        assert len(received) < BURST
+        assert slow.id not in pool.connections[0].channels
+        await asyncio.sleep(0.05)
+        assert (slow.id, CLOSE_TRY_AGAIN_LATER) in upstream.state.closed
+    finally:
+        await pool.aclose()
+
+
+async def test_failed_handshake_closes_its_client(clients):
+    pool = MuxPool("http://upstream/refuse", size=1, queue_size=4, client_factory=clients)
+    with pytest.raises(Exception):
+        await pool.open_channel()
+    assert pool.connections == []
+    assert clients.made and all(client.is_closed for client in clients.made)
+
+
+async def test_upstream_loss_disconnects_every_channel(clients):
+    pool = MuxPool("http://upstream/mux", size=1, queue_size=4, client_factory=clients)
+    channel = await pool.open_channel()
+    assert await receive_text(channel) == f"hello {channel.id}"
+    await pool.aclose()
+    with pytest.raises(WSUpstreamDisconnect):
+        await asyncio.wait_for(channel.receive(), 2)
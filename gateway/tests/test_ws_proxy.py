@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+from httpx_ws import WebSocketDisconnect as WSUpstreamDisconnect
+from wsproto.events import BytesMessage, TextMessage
+
+from core_1 import SimpleWebSocketProxy
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeClient:
+    """The client side of the proxy: ASGI receive messages in, frames out."""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+        self.closed = None
+        self.writable = asyncio.Event()
+        self.writable.set()
+
+    def say(self, text=None, data=None):
+        self.incoming.put_nowait({"type": "websocket.receive", "text": text, "bytes": data})
+
+    def leave(self, code=1000):
+        self.incoming.put_nowait({"type": "websocket.disconnect", "code": code})
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_text(self, text):
+        await self.writable.wait()
+        self.sent.append(text)
+
+    async def send_bytes(self, data):
+        await self.writable.wait()
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.closed = code
+
+
+class FakeUpstream:
+    """The upstream side: wsproto events in, frames out."""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.received = 0
+        self.sent = []
+        self.closed = None
+
+    async def receive(self):
+        event = await self.incoming.get()
+        self.received += 1
+        if isinstance(event, Exception):
+            raise event
+        return event
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.closed = code
+
+
+async def run(proxy, client, upstream):
+    return await asyncio.wait_for(proxy.pump(client, upstream), 2)
+
+
+async def test_frames_flow_both_ways_until_the_client_leaves():
+    client, upstream = FakeClient(), FakeUpstream()
+    client.say(text="hi")
+    client.say(data=b"\x00\x01")
+    upstream.incoming.put_nowait(TextMessage(data="hello"))
+    upstream.incoming.put_nowait(BytesMessage(data=b"\x02"))
+
+    task = asyncio.ensure_future(run(SimpleWebSocketProxy("ws://upstream"), client, upstream))
+    while len(client.sent) < 2 or len(upstream.sent) < 2:
+        await asyncio.sleep(0.01)
+    client.leave(1001)
+    await task
+
+    assert upstream.sent == ["hi", b"\x00\x01"]
+    assert client.sent == ["hello", b"\x02"]
+    assert upstream.closed == 1001
+    assert client.closed is None
+
+
+@pytest.mark.parametrize("code, forwarded", [(1011, 1011), (1006, 1000)])
+async def test_upstream_close_is_passed_to_the_client(code, forwarded):
+    client, upstream = FakeClient(), FakeUpstream()
+    upstream.incoming.put_nowait(TextMessage(data="last"))
+    upstream.incoming.put_nowait(WSUpstreamDisconnect(code))
+
+    await run(SimpleWebSocketProxy("ws://upstream"), client, upstream)
+    assert client.sent == ["last"]
+    # codes only ever observed locally are sent as a normal closure
+    assert client.closed == forwarded
+    assert upstream.closed is None
+
+
+async def test_slow_client_stops_the_upstream_reader():
+    client, upstream = FakeClient(), FakeUpstream()
+    client.writable.clear()
+    for n in range(50):
+        upstream.incoming.put_nowait(TextMessage(data=str(n)))
+    upstream.incoming.put_nowait(WSUpstreamDisconnect(1000))
+
+    task = asyncio.ensure_future(run(SimpleWebSocketProxy("ws://upstream", queue_size=2), client, upstream))
+    await asyncio.sleep(0.05)
+    # two queued, one held by the blocked writer, one waiting on the queue
+    assert upstream.received <= 4
+
+    client.writable.set()
+    await task
+    assert client.sent == [str(n) for n in range(50)]
+    assert client.closed == 1000
+
+
+async def test_a_failing_side_tears_the_session_down():
+    client, upstream = FakeClient(), FakeUpstream()
+
+    async def broken(text):
+        raise ConnectionError("upstream went away")
+
+    upstream.send_text = broken
+    client.say(text="hi")
+
+    with pytest.raises(ConnectionError):
+        await run(SimpleWebSocketProxy("ws://upstream"), client, upstream)
@@ -0,0 +1,227 @@
+import asyncio
+import itertools
+import struct
+import httpx
+from typing import Callable, Dict, List, Optional, Set
+from httpx_ws import aconnect_ws, WebSocketDisconnect as WSUpstreamDisconnect
+from wsproto.events import BytesMessage, TextMessage
+
+# Every frame on a shared upstream socket is binary:
+#   4-byte channel id | 1-byte opcode | payload
+# CLOSE carries the 2-byte close code as its payload.
+FRAME_HEADER = struct.Struct("!IB")
+OP_OPEN = 1
+OP_TEXT = 2
+OP_BYTES = 3
+OP_CLOSE = 4
+
+# close code for a channel dropped because its client stopped reading
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+def encode_frame(channel: int, op: int, payload: bytes = b"") -> bytes:
+    return FRAME_HEADER.pack(channel, op) + payload
+
+
+def decode_frame(frame: bytes) -> tuple[int, int, bytes]:
+    channel, op = FRAME_HEADER.unpack_from(frame)
+    return channel, op, frame[FRAME_HEADER.size:]
+
+
+class MuxChannel:
+    """One client's view of a shared upstream socket.
+
+    Exposes the same receive/send/close calls as an httpx_ws session so the
+    regular proxy pumps can drive it unchanged.
+    """
+
+    def __init__(self, connection: "MuxConnection", channel_id: int, queue_size: int):
+        self.connection = connection
+        self.id = channel_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+    async def receive(self):
+        event = await self.queue.get()
+        if isinstance(event, WSUpstreamDisconnect):
+            raise event
+        return event
+
+    async def send_text(self, data: str):
+        await self.connection.send(self.id, OP_TEXT, data.encode("utf-8"))
+
+    async def send_bytes(self, data: bytes):
+        await self.connection.send(self.id, OP_BYTES, data)
+
+    async def close(self, code: int = 1000):
+        if self.closed:
+            return
+        self.closed = True
+        self.connection.channels.pop(self.id, None)
+        if self.connection.alive:
+            await self.connection.send(self.id, OP_CLOSE, struct.pack("!H", code))
+
+    def deliver(self, event) -> bool:
+        """Queue ``event`` for the client; False when it has fallen behind."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def disconnect(self, code: int):
+        """Deliver a close without blocking the shared reader on a full queue."""
+        self.closed = True
+        while self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(WSUpstreamDisconnect(code))
+
+
+class MuxConnection:
+    """A long-lived upstream socket carrying many client channels.
+
+    The socket is opened, read and closed by one task of its own, since the
+    httpx_ws session has to be left from the task that entered it.
+    """
+
+    def __init__(self, url: str, queue_size: int,
+                 client_factory: Callable[[], httpx.AsyncClient] = httpx.AsyncClient):
+        self.url = url
+        self.queue_size = queue_size
+        self.client_factory = client_factory
+        self.channels: Dict[int, MuxChannel] = {}
+        self._ids = itertools.count(1)
+        self._ws = None
+        self._reader: Optional[asyncio.Task] = None
+        self._send_lock = asyncio.Lock()
+        self._closing: Set[asyncio.Task] = set()
+
+    @property
+    def alive(self) -> bool:
+        return self._reader is not None and not self._reader.done()
+
+    async def connect(self):
+        """Open the upstream socket; raises if the handshake fails."""
+        ready = asyncio.get_running_loop().create_future()
+        self._reader = asyncio.create_task(self._run(ready))
+        await ready
+
+    async def _run(self, ready: asyncio.Future):
+        try:
+            async with self.client_factory() as client, aconnect_ws(self.url, client) as ws:
+                self._ws = ws
+                ready.set_result(None)
+                await self._read_loop()
+        except Exception as e:
+            if ready.done():
+                raise
+            # the client is closed by now; connect() reports the failure
+            ready.set_exception(e)
+
+    async def open_channel(self) -> MuxChannel:
+        channel = MuxChannel(self, next(self._ids), self.queue_size)
+        self.channels[channel.id] = channel
+        await self.send(channel.id, OP_OPEN)
+        return channel
+
+    async def send(self, channel_id: int, op: int, payload: bytes = b""):
+        async with self._send_lock:
+            await self._ws.send_bytes(encode_frame(channel_id, op, payload))
+
+    async def _read_loop(self):
+        code = 1011
+        try:
+            while True:
+                event = await self._ws.receive()
+                if not isinstance(event, BytesMessage):
+                    continue
+                channel_id, op, payload = decode_frame(bytes(event.data))
+                channel = self.channels.get(channel_id)
+                if channel is None:
+                    continue
+                if op == OP_TEXT:
+                    delivered = channel.deliver(TextMessage(data=payload.decode("utf-8")))
+                elif op == OP_BYTES:
+                    delivered = channel.deliver(BytesMessage(data=payload))
+                elif op == OP_CLOSE:
+                    self.channels.pop(channel_id, None)
+                    channel.disconnect(struct.unpack("!H", payload)[0] if payload else 1000)
+                    continue
+                else:
+                    continue
+                if not delivered:
+                    # never wait on one client: the others share this socket
+                    self._evict(channel)
+        except WSUpstreamDisconnect as e:
+            code = e.code or 1011
+        finally:
+            for channel in list(self.channels.values()):
+                channel.disconnect(code)
+            self.channels.clear()
+
+    def _evict(self, channel: MuxChannel):
+        """Drop a channel whose client has fallen a full queue behind."""
+        self.channels.pop(channel.id, None)
+        channel.disconnect(CLOSE_TRY_AGAIN_LATER)
+        task = asyncio.create_task(self._close_upstream(channel.id, CLOSE_TRY_AGAIN_LATER))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close_upstream(self, channel_id: int, code: int):
+        try:
+            await self.send(channel_id, OP_CLOSE, struct.pack("!H", code))
+        except Exception:
+            # the socket is going away; the reader disconnects everyone
+            pass
+
+    async def aclose(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+
+class MuxPool:
+    """A small set of shared upstream sockets; new channels go to the least busy."""
+
+    def __init__(self, url: str, size: int, queue_size: int,
+                 client_factory: Callable[[], httpx.AsyncClient] = httpx.AsyncClient):
+        self.url = url
+        self.size = size
+        self.queue_size = queue_size
+        self.client_factory = client_factory
+        self.connections: List[MuxConnection] = []
+        self._lock = asyncio.Lock()
+
+    async def open_channel(self) -> MuxChannel:
+        async with self._lock:
+            for connection in [c for c in self.connections if not c.alive]:
+                self.connections.remove(connection)
+                await connection.aclose()
+            if len(self.connections) < self.size:
+                connection = MuxConnection(self.url, self.queue_size, self.client_factory)
+                await connection.connect()
+                self.connections.append(connection)
+            else:
+                connection = min(self.connections, key=lambda c: len(c.channels))
+        return await connection.open_channel()
+
+    async def aclose(self):
+        connections, self.connections = self.connections, []
+        for connection in connections:
+            await connection.aclose()
+
+
+mux_pools: Dict[str, MuxPool] = {}
+
+
+def get_mux_pool(url: str, size: int, queue_size: int) -> MuxPool:
+    pool = mux_pools.get(url)
+    if pool is None:
+        pool = mux_pools[url] = MuxPool(url, size, queue_size)
+    return pool
+
+
+async def close_mux_pools():
+    for pool in list(mux_pools.values()):
+        await pool.aclose()
+    mux_pools.clear()
@@ -1,26 +1,49 @@
+from contextlib import asynccontextmanager, contextmanager
 from typing import Annotated
 
 from fastapi import Depends
-from session import SessionLocal
+from session import SessionLocal, AsyncSessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Annotated
-from fastapi import Depends
 
-from sqlalchemy.orm import Session
+
+# Every request (or background task) gets its own session, rolled back on
+# error and closed at the end, so a failed transaction never leaks into the
+# next caller and connections go back to the pool promptly.
+
+@contextmanager
+def session_scope():
+    session = SessionLocal()
+    try:
+        yield session
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def get_db():
+    with session_scope() as session:
+        yield session
+
+pg_session_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = pg_session_dependency
 
 
-class PostgresDb():
-    _instances = {}
+@asynccontextmanager
+async def async_session_scope():
+    # needs DB_ASYNC=true
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
 
-    def __new__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super(
-                PostgresDb, cls).__new__(cls, *args, **kwargs)
-            cls._instances[cls]._session = SessionLocal()
-        return cls._instances[cls]
 
-    def session(self) -> Session:
-        return self._session
+async def get_async_session():
+    async with async_session_scope() as session:
+        yield session
 
-pg_session_dependency = Annotated[Session, Depends(PostgresDb().session)]
-db_dependency = pg_session_dependency
\ No newline at end of file
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_session)]
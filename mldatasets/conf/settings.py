@@ -36,9 +36,20 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
-    POSTGRES_POOL_SIZE: int = 1
-    POSTGRES_MAX_POOL: int = 2
+    # 0 derives pool_size / max_overflow from POSTGRES_MAX_CONNECTIONS split
+    # across WEB_CONCURRENCY workers (and both engines when DB_ASYNC is on)
+    POSTGRES_POOL_SIZE: int = 0
+    POSTGRES_MAX_POOL: int = 0
+    POSTGRES_MAX_CONNECTIONS: int = 90
+    WEB_CONCURRENCY: int = 1
+    POSTGRES_POOL_TIMEOUT: float = 10.0
+    POSTGRES_STATEMENT_TIMEOUT_MS: int = 30000
     POSTGRES_ENGINE_ECHO: bool = False
+    # also build an asyncpg / aiosqlite engine for the async crud and service
+    DB_ASYNC: bool = False
+    # rows removed per DELETE (and commit) by the background dataset purge
+    DATASET_DELETE_BATCH_SIZE: int = 5000
+    DATASET_DELETE_WORKERS: int = 1
     SQLALCHEMY_DATABASE_URL_LOCAL: AnyHttpUrl = Field((
         "sqlite:///sql.db"),  validate_default=False)  # if DEV is local
 
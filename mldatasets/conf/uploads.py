@@ -0,0 +1,24 @@
+from pydantic_settings import BaseSettings
+
+
+class UploadSettings(BaseSettings):
+    # kept apart from conf.settings so the upload endpoints do not need the
+    # database and celery environment
+    MAX_UPLOAD_BODY_SIZE: int = 512 * 1024 * 1024
+    MAX_UPLOAD_FILE_SIZE: int = 256 * 1024 * 1024
+    UPLOAD_SPOOL_THRESHOLD: int = 1024 * 1024
+    # threads writing uploaded files to disk
+    FILE_WRITE_WORKERS: int = 8
+    # content-addressed store behind the dataset files (see service.blob_store)
+    BLOB_DIR: str = "static/blobs"
+    # tried in order when placing a blob at its dataset path
+    BLOB_LINK_MODES: str = "reflink,hardlink,copy"
+    # resumable chunked uploads (see service.chunked_upload)
+    UPLOAD_SESSION_DIR: str = "static/uploads"
+    UPLOAD_CHUNK_SIZE: int = 16 * 1024 * 1024  # suggested to clients
+    MAX_UPLOAD_CHUNK_SIZE: int = 64 * 1024 * 1024
+    MAX_CHUNKED_UPLOAD_SIZE: int = 64 * 1024 * 1024 * 1024
+    UPLOAD_SESSION_TTL: int = 24 * 60 * 60
+
+
+upload_settings = UploadSettings()
@@ -0,0 +1,133 @@
+from fastapi import HTTPException
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.crud.base import BaseCrud
+from database.models.search import encode_search_cursor, ranked, search_statement
+
+
+class AsyncBaseCrud:
+    """BaseCrud for an AsyncSession; every query method is a coroutine."""
+
+    encode_cursor = staticmethod(BaseCrud.encode_cursor)
+    decode_cursor = staticmethod(BaseCrud.decode_cursor)
+
+    def __init__(self, db: AsyncSession, Model=None):
+        self.db = db
+        self.obj = None
+        self.Model = Model
+
+    def missing_obj(self, obj, _id=0):
+        if obj is None:
+            raise HTTPException(
+                status_code=404, detail=f"Object with id {_id} not found.")
+
+    def ordered(self, query):
+        return query.order_by(sa.desc(self.Model.modified_at), sa.desc(self.Model.id))
+
+    async def pagination(self, query, page=1, page_size=10):
+        if page_size:
+            query = query.limit(page_size)
+        if page - 1:
+            query = query.offset((page-1)*page_size)
+        return (await self.db.scalars(query)).all()
+
+    async def keyset(self, query, cursor: str = None, page_size: int = 10):
+        if cursor:
+            modified_at, _id = self.decode_cursor(cursor)
+            query = query.where(
+                sa.tuple_(self.Model.modified_at, self.Model.id) < sa.tuple_(modified_at, _id)
+            )
+        return (await self.db.scalars(query.limit(page_size))).all()
+
+    def next_cursor(self, items: list, page_size: int = 10):
+        if page_size and len(items) == page_size:
+            return self.encode_cursor(items[-1])
+        return None
+
+    async def get(self, id: int):
+        self.obj = await self.db.get(self.Model, id)
+        self.missing_obj(self.obj, id)
+        return self.obj
+
+    async def get_all(self, page=1, page_size=10, cursor: str = None):
+        query = self.ordered(sa.select(self.Model))
+        if cursor:
+            return await self.keyset(query, cursor, page_size)
+        return await self.pagination(query, page, page_size)
+
+    async def search(self, query: str, page: int = 1, page_size: int = 20, cursor: str = None):
+        statement = search_statement(
+            self.Model, query, self.db.get_bind().dialect.name, page, page_size, cursor
+        )
+        if statement is None:
+            return []
+        return ranked((await self.db.execute(statement)).all())
+
+    def search_cursor(self, items: list, page_size: int = 20):
+        if page_size and len(items) == page_size:
+            return encode_search_cursor(items[-1])
+        return None
+
+    async def commit(self, obj):
+        await self.db.commit()
+        await self.db.refresh(obj)
+        return obj
+
+    async def create(self, data: dict):
+        obj = self.Model(**data)
+        self.db.add(obj)
+        return await self.commit(obj)
+
+    async def create_many(self, data_list):
+        return await self.bulk_create(data_list)
+
+    async def bulk_create(self, data_list: list, returning: bool = True):
+        if not data_list:
+            return [] if returning else 0
+        table = self.Model.__table__
+        if returning:
+            result = (await self.db.execute(sa.insert(table).returning(*table.c), data_list)).all()
+        else:
+            result = (await self.db.execute(sa.insert(table), data_list)).rowcount
+        await self.db.commit()
+        return result
+
+    async def bulk_update(self, data_list: list):
+        if not data_list:
+            return
+        await self.db.execute(sa.update(self.Model), data_list)
+        await self.db.commit()
+
+    async def bulk_delete(self, ids: list):
+        if not ids:
+            return 0
+        result = await self.db.execute(
+            sa.delete(self.Model)
+            .where(self.Model.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        return result.rowcount
+
+    async def update(self, data: dict):
+        obj = await self.get(data['id'])
+        return await self.update_obj(obj, data)
+
+    async def update_obj(self, obj, data: dict):
+        self.missing_obj(obj, data.get('id', 0))
+        if 'id' in data: data.pop('id')
+        for key, value in data.items():
+            setattr(obj, key, value)
+        await self.commit(obj)
+        return obj
+
+    async def delete(self, id: int):
+        obj = await self.get(id)
+        return await self.delete_obj(obj)
+
+    async def delete_obj(self, obj):
+        self.missing_obj(obj)
+        if obj:
+            await self.db.delete(obj)
+            await self.db.commit()
@@ -0,0 +1,89 @@
+from database.crud.async_base import AsyncBaseCrud
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.models.model import DATASET_DELETING, DATASET_READY, MLDataset, MLDatasetFiles, MLDatasetFolder
+from database.crud.tree import (
+    ancestor_ids, build_tree, child_tree_path, content_hashes_statement, dataset_status_statement,
+    refcounts_statement, subtree_statements, tree_paths_statement,
+)
+
+
+class AsyncMLDatasetCrud(AsyncBaseCrud):
+    def __init__(self, db_session: AsyncSession):
+        super().__init__(db_session,MLDataset)
+
+    async def create_folder(self,payload:dict):
+        return await self.create(payload)
+
+    async def get_all_dataset(self, page=1, page_size=10, cursor=None):
+        query = self.ordered(select(self.Model).where(self.Model.status == DATASET_READY))
+        if cursor:
+            return await self.keyset(query, cursor, page_size)
+        return await self.pagination(query, page, page_size)
+
+    async def get_dataset(self,id):
+        return await self.get(id)
+
+    async def delete_dataset(self,id):
+        return await self.delete(id)
+
+    async def mark_deleting(self, id: int):
+        obj = await self.get(id)
+        obj.status = DATASET_DELETING
+        return await self.commit(obj)
+
+class AsyncMLDatasetFolderCrud(AsyncBaseCrud):
+    def __init__(self, db_session: AsyncSession):
+        super().__init__(db_session,MLDatasetFolder)
+
+    async def create_folder(self,payload:dict):
+        obj = self.Model(**payload)
+        self.db.add(obj)
+        await self.db.flush()
+        parent_path = None
+        if obj.parent_folder_id:
+            parent_path = await self.db.scalar(
+                select(self.Model.tree_path).where(self.Model.id == obj.parent_folder_id))
+        obj.tree_path = child_tree_path(parent_path, obj.id)
+        return await self.commit(obj)
+
+    async def get_tree(self, folder_id: int = None, dataset_id: int = None):
+        folders, files = subtree_statements(folder_id, dataset_id)
+        return build_tree((await self.db.execute(folders)).all(), (await self.db.execute(files)).all())
+
+    async def get_ancestors(self, id: int):
+        obj = await self.get(id)
+        ids = ancestor_ids(obj.tree_path)[:-1]
+        if not ids:
+            return []
+        by_id = {folder.id: folder for folder in
+                 await self.db.scalars(select(self.Model).where(self.Model.id.in_(ids)))}
+        return [by_id[i] for i in ids if i in by_id]
+
+    async def dataset_status(self, folder: MLDatasetFolder):
+        return await self.db.scalar(dataset_status_statement(folder))
+
+    async def rebuild_tree_paths(self):
+        rows = (await self.db.execute(tree_paths_statement())).all()
+        await self.bulk_update([{"id": row.id, "tree_path": row.tree_path} for row in rows])
+        return len(rows)
+
+class AsyncMLDatasetFilesCrud(AsyncBaseCrud):
+    def __init__(self, db_session: AsyncSession):
+        super().__init__(db_session,MLDatasetFiles)
+
+    async def upload_file(self,payload:dict):
+        return await self.create(payload)
+
+    async def upload_files(self,payloads:list):
+        return await self.bulk_create(payloads, returning=False)
+
+    async def content_hashes(self, folder_id: int = None, dataset_id: int = None):
+        rows = await self.db.scalars(content_hashes_statement(folder_id, dataset_id))
+        return [digest for digest in rows if digest]
+
+    async def refcounts(self, digests) -> dict:
+        if not digests:
+            return {}
+        return dict((await self.db.execute(refcounts_statement(digests))).all())
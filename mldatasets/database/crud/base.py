@@ -1,9 +1,11 @@
+import base64
+import datetime
+import json
 from fastapi import HTTPException
 import sqlalchemy as sa
 from sqlalchemy.orm import Session
 
-from app.api.helpers.custom_http_exception import CustomHTTPException
-from app.database.config.session import SessionLocal
+from database.models.search import encode_search_cursor, ranked, search_statement
 
 
 class BaseCrud:
@@ -32,6 +34,41 @@ class BaseCrud:
             query = query.offset((page-1)*page_size)
         return query
 
+    # Keyset pagination: listings are ordered newest first on
+    # (modified_at, id) and a cursor holds the last row's pair, so each page
+    # is an index range scan from that point instead of an OFFSET skip.
+
+    def ordered(self, query):
+        return query.order_by(sa.desc(self.Model.modified_at), sa.desc(self.Model.id))
+
+    @staticmethod
+    def encode_cursor(obj) -> str:
+        raw = json.dumps([obj.modified_at.isoformat(), obj.id]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            modified_at, _id = json.loads(raw)
+            return datetime.datetime.fromisoformat(modified_at), int(_id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    def keyset(self, query, cursor: str = None, page_size: int = 10):
+        if cursor:
+            modified_at, _id = self.decode_cursor(cursor)
+            query = query.filter(
+                sa.tuple_(self.Model.modified_at, self.Model.id) < sa.tuple_(modified_at, _id)
+            )
+        return query.limit(page_size).all()
+
+    def next_cursor(self, items: list, page_size: int = 10):
+        """Cursor for the page after ``items``, or None on the last page."""
+        if page_size and len(items) == page_size:
+            return self.encode_cursor(items[-1])
+        return None
+
     def get(self, id: int):
         self.obj = self.db.query(self.Model).filter(
             self.Model.id == id).first()
@@ -39,29 +76,69 @@ class BaseCrud:
         return self.obj
 
     def create_many(self, data_list):
-        obj_list = [self.Model(**data) for data in data_list]
-        obj = self.db.add_all(obj_list)
+        return self.bulk_create(data_list)
+
+    # The bulk_* methods go straight to the table in one round trip (an
+    # executemany batch) and a single commit. They bypass the identity map,
+    # so ORM cascades and relationship bookkeeping do not run.
+
+    def bulk_create(self, data_list: list, returning: bool = True):
+        """Insert all rows at once.
+
+        Returns the inserted rows (plain ``Row`` tuples with every column,
+        ids included) or, with ``returning=False``, just the row count.
+        """
+        if not data_list:
+            return [] if returning else 0
+        table = self.Model.__table__
+        if returning:
+            result = self.db.execute(sa.insert(table).returning(*table.c), data_list).all()
+        else:
+            result = self.db.execute(sa.insert(table), data_list).rowcount
+        self.db.commit()
+        return result
+
+    def bulk_update(self, data_list: list):
+        """Update rows by primary key; every dict must carry its ``id``."""
+        if not data_list:
+            return
+        self.db.execute(sa.update(self.Model), data_list)
         self.db.commit()
-        return obj
+
+    def bulk_delete(self, ids: list):
+        if not ids:
+            return 0
+        result = self.db.execute(
+            sa.delete(self.Model)
+            .where(self.Model.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount
 
     # def search(self, query: str, page: int = 1, page_size: int = 10):
     #     query = sa.select(self.Model.c.title.match(query))
     #     query = self.pagination_query(query, page, page_size)
     #     return self.db.execute(query).scalars().all()
 
-    def search(self, query: str, page: int = 1, page_size: int = 20):
-        searchects = self.db.query(
-            self.Model
-        ).filter(
-            self.Model.name.match(query)
-        ).order_by(
-            sa.desc(self.Model.modified_at)
+    def search(self, query: str, page: int = 1, page_size: int = 20, cursor: str = None):
+        """Ranked name search (see database.models.search); best match first."""
+        statement = search_statement(
+            self.Model, query, self.db.get_bind().dialect.name, page, page_size, cursor
         )
-        return self.pagination(searchects, page, page_size)
-
-    def get_all(self, page=0, page_size=10):
-        query = self.db.query(self.Model).filter().order_by(
-            sa.desc(self.Model.modified_at))
+        if statement is None:
+            return []
+        return ranked(self.db.execute(statement).all())
+
+    def search_cursor(self, items: list, page_size: int = 20):
+        if page_size and len(items) == page_size:
+            return encode_search_cursor(items[-1])
+        return None
+
+    def get_all(self, page=1, page_size=10, cursor: str = None):
+        query = self.ordered(self.db.query(self.Model).filter())
+        if cursor:
+            return self.keyset(query, cursor, page_size)
         return self.pagination(query, page, page_size)
 
     def commit(self, obj):
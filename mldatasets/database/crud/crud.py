@@ -1,9 +1,13 @@
-from api_gateway.mldatasets.database.crud.base import BaseCrud
+from database.crud.base import BaseCrud
 
 from sqlalchemy.orm import Session
 import sqlalchemy as sa 
 from sqlalchemy import select
-from mldatasets.database.models.model import MLDataset,MLDatasetFiles,MLDatasetFolder
+from database.models.model import DATASET_DELETING, DATASET_READY, MLDataset, MLDatasetFiles, MLDatasetFolder
+from database.crud.tree import (
+    ancestor_ids, build_tree, child_tree_path, content_hashes_statement, dataset_files_batch,
+    dataset_folders_batch, dataset_status_statement, refcounts_statement, subtree_statements, tree_paths_statement,
+)
 from sqlalchemy.orm import Session
 
 
@@ -18,21 +22,84 @@ class MLDatasetCrud(BaseCrud):
     #     columns_to_select = [getattr(self.Model, column) for column in self.Model.__table__.columns.keys() if column !='path']
     #     query = self.db.query(*columns_to_select).filter().order_by(sa.desc(self.Model.modified_at))
     #     return self.pagination(query, page, page_size)
-    def get_all_dataset(self, page=0, page_size=10):
-        return super().get_all(page, page_size)
+    def get_all_dataset(self, page=1, page_size=10, cursor=None):
+        # datasets being deleted are already gone as far as callers care
+        query = self.ordered(self.db.query(self.Model).filter(self.Model.status == DATASET_READY))
+        if cursor:
+            return self.keyset(query, cursor, page_size)
+        return self.pagination(query, page, page_size)
     
     def get_dataset(self,id):
         return  self.get(id)
     
     def delete_dataset(self,id):
         return self.delete(id)
+
+    # Set-based purge used by service.deletion: each call deletes one batch
+    # through bulk_delete (one DELETE ... WHERE id IN and a commit), so no ORM
+    # cascade loads the children and an interrupted purge just carries on.
+
+    def mark_deleting(self, id: int):
+        obj = self.get(id)
+        obj.status = DATASET_DELETING
+        return self.commit(obj)
+
+    def pending_deletions(self) -> list:
+        return self.db.scalars(select(self.Model.id).where(self.Model.status == DATASET_DELETING)).all()
+
+    def purge_files(self, dataset_id: int, batch_size: int):
+        """Delete one batch of the dataset's files; returns their content hashes."""
+        rows = self.db.execute(dataset_files_batch(dataset_id, batch_size)).all()
+        MLDatasetFilesCrud(self.db).bulk_delete([row.id for row in rows])
+        return [row.content_hash for row in rows]
+
+    def purge_folders(self, dataset_id: int, batch_size: int) -> int:
+        ids = self.db.scalars(dataset_folders_batch(dataset_id, batch_size)).all()
+        MLDatasetFolderCrud(self.db).bulk_delete(ids)
+        return len(ids)
+
+    def purge(self, id: int) -> int:
+        return self.bulk_delete([id])
     
 class MLDatasetFolderCrud(BaseCrud):
     def __init__(self, db_session: Session):
         super().__init__(db_session,MLDatasetFolder)
     
     def create_folder(self,payload:dict):
-        return self.create(payload)
+        obj = self.Model(**payload)
+        self.db.add(obj)
+        self.db.flush()
+        parent_path = None
+        if obj.parent_folder_id:
+            parent_path = self.db.scalar(
+                select(self.Model.tree_path).where(self.Model.id == obj.parent_folder_id))
+        obj.tree_path = child_tree_path(parent_path, obj.id)
+        return self.commit(obj)
+
+    def get_tree(self, folder_id: int = None, dataset_id: int = None):
+        """Nested folders and files under ``folder_id`` (or the top folders
+        of ``dataset_id``) in two queries."""
+        folders, files = subtree_statements(folder_id, dataset_id)
+        return build_tree(self.db.execute(folders).all(), self.db.execute(files).all())
+
+    def get_ancestors(self, id: int):
+        """Folders from the top of the tree down to the parent of ``id``."""
+        obj = self.get(id)
+        ids = ancestor_ids(obj.tree_path)[:-1]
+        if not ids:
+            return []
+        by_id = {folder.id: folder for folder in
+                 self.db.scalars(select(self.Model).where(self.Model.id.in_(ids)))}
+        return [by_id[i] for i in ids if i in by_id]
+
+    def dataset_status(self, folder: MLDatasetFolder):
+        """Status of the dataset ``folder`` belongs to, however deep it is."""
+        return self.db.scalar(dataset_status_statement(folder))
+
+    def rebuild_tree_paths(self):
+        rows = self.db.execute(tree_paths_statement()).all()
+        self.bulk_update([{"id": row.id, "tree_path": row.tree_path} for row in rows])
+        return len(rows)
 
 class MLDatasetFilesCrud(BaseCrud):
     def __init__(self, db_session: Session):
@@ -40,3 +107,16 @@ class MLDatasetFilesCrud(BaseCrud):
     
     def upload_file(self,payload:dict):
         return self.create(payload)
+
+    def upload_files(self,payloads:list):
+        return self.bulk_create(payloads, returning=False)
+
+    def content_hashes(self, folder_id: int = None, dataset_id: int = None):
+        rows = self.db.scalars(content_hashes_statement(folder_id, dataset_id))
+        return [digest for digest in rows if digest]
+
+    def refcounts(self, digests) -> dict:
+        """How many file rows still point at each blob digest."""
+        if not digests:
+            return {}
+        return dict(self.db.execute(refcounts_statement(digests)).all())
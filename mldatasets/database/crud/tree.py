@@ -0,0 +1,132 @@
+import sqlalchemy as sa
+from sqlalchemy.orm import aliased
+
+from database.models.model import MLDataset, MLDatasetFiles, MLDatasetFolder
+
+# Folder trees are read with a recursive CTE so a whole subtree (folders and
+# their files) costs two queries whatever its depth or width. Each folder
+# also stores its materialized path of ids ("/3/17/42/") in tree_path, which
+# turns ancestor lookups into a single primary key IN query.
+
+FOLDER_COLUMNS = (MLDatasetFolder.id, MLDatasetFolder.name, MLDatasetFolder.parent_folder_id)
+FILE_COLUMNS = (
+    MLDatasetFiles.id, MLDatasetFiles.file_name, MLDatasetFiles.content_type,
+    MLDatasetFiles.file_size, MLDatasetFiles.dataset_folder_id,
+)
+
+
+def subtree_cte(folder_id: int = None, dataset_id: int = None):
+    """Ids of ``folder_id`` and everything below it, or of every folder of
+    ``dataset_id``, with their depth from the starting folders."""
+    if folder_id is not None:
+        start = MLDatasetFolder.id == folder_id
+    else:
+        start = sa.and_(MLDatasetFolder.dataset_id == dataset_id, MLDatasetFolder.parent_folder_id.is_(None))
+    tree = sa.select(MLDatasetFolder.id, sa.literal(0).label("depth")).where(start).cte("folder_tree", recursive=True)
+    child = aliased(MLDatasetFolder)
+    return tree.union_all(
+        sa.select(child.id, tree.c.depth + 1).where(child.parent_folder_id == tree.c.id)
+    )
+
+
+def subtree_statements(folder_id: int = None, dataset_id: int = None):
+    tree = subtree_cte(folder_id, dataset_id)
+    folders = (
+        sa.select(*FOLDER_COLUMNS, tree.c.depth)
+        .join(tree, MLDatasetFolder.id == tree.c.id)
+        .order_by(tree.c.depth, MLDatasetFolder.name)
+    )
+    files = (
+        sa.select(*FILE_COLUMNS)
+        .where(MLDatasetFiles.dataset_folder_id.in_(sa.select(tree.c.id)))
+        .order_by(MLDatasetFiles.file_name)
+    )
+    return folders, files
+
+
+def content_hashes_statement(folder_id: int = None, dataset_id: int = None):
+    """Distinct content hashes (NULL included) of the files under
+    ``folder_id``, or of the whole of ``dataset_id``: its own files and
+    every folder's."""
+    hashes = sa.select(MLDatasetFiles.content_hash)
+    in_tree = hashes.where(MLDatasetFiles.dataset_folder_id.in_(sa.select(subtree_cte(folder_id, dataset_id).c.id)))
+    if folder_id is not None:
+        return in_tree.distinct()
+    # a union keeps each branch on its own index
+    return sa.union(hashes.where(MLDatasetFiles.dataset_id == dataset_id), in_tree)
+
+
+def dataset_files_batch(dataset_id: int, limit: int):
+    """(id, content_hash) of up to ``limit`` files of ``dataset_id``."""
+    files = sa.select(MLDatasetFiles.id, MLDatasetFiles.content_hash)
+    in_tree = files.where(MLDatasetFiles.dataset_folder_id.in_(sa.select(subtree_cte(dataset_id=dataset_id).c.id)))
+    return sa.union(files.where(MLDatasetFiles.dataset_id == dataset_id), in_tree).limit(limit)
+
+
+def dataset_folders_batch(dataset_id: int, limit: int):
+    """Ids of up to ``limit`` folders of ``dataset_id``, deepest first so a
+    batch never holds a folder whose children are still there."""
+    tree = subtree_cte(dataset_id=dataset_id)
+    return sa.select(tree.c.id).order_by(tree.c.depth.desc()).limit(limit)
+
+
+def refcounts_statement(digests):
+    return (
+        sa.select(MLDatasetFiles.content_hash, sa.func.count())
+        .where(MLDatasetFiles.content_hash.in_(list(digests)))
+        .group_by(MLDatasetFiles.content_hash)
+    )
+
+
+def build_tree(folder_rows, file_rows) -> list:
+    """Nest flat folder and file rows; returns the top-level folders."""
+    nodes = {}
+    roots = []
+    for row in folder_rows:
+        nodes[row.id] = {"id": row.id, "name": row.name, "folders": [], "files": []}
+    for row in folder_rows:
+        parent = nodes.get(row.parent_folder_id) if row.depth else None
+        (parent["folders"] if parent else roots).append(nodes[row.id])
+    for row in file_rows:
+        nodes[row.dataset_folder_id]["files"].append({
+            "id": row.id,
+            "file_name": row.file_name,
+            "content_type": row.content_type,
+            "file_size": row.file_size,
+        })
+    return roots
+
+
+def ancestor_ids(tree_path: str) -> list:
+    return [int(part) for part in (tree_path or "").strip("/").split("/") if part]
+
+
+def child_tree_path(parent_path: str, folder_id: int) -> str:
+    return f"{parent_path or '/'}{folder_id}/"
+
+
+def dataset_status_statement(folder):
+    """Status of the dataset owning ``folder``. Only top folders carry a
+    dataset_id, so it is looked up through the first id of its tree_path."""
+    top_id = (ancestor_ids(folder.tree_path) or [folder.id])[0]
+    return (
+        sa.select(MLDataset.status)
+        .join(MLDatasetFolder, MLDatasetFolder.dataset_id == MLDataset.id)
+        .where(MLDatasetFolder.id == top_id)
+    )
+
+
+def tree_paths_statement():
+    """(id, tree_path) for every folder, computed from parent_folder_id;
+    used to backfill or repair the materialized paths."""
+    tree = (
+        sa.select(MLDatasetFolder.id, ("/" + sa.cast(MLDatasetFolder.id, sa.String) + "/").label("tree_path"))
+        .where(MLDatasetFolder.parent_folder_id.is_(None))
+        .cte("folder_paths", recursive=True)
+    )
+    child = aliased(MLDatasetFolder)
+    tree = tree.union_all(
+        sa.select(child.id, tree.c.tree_path + sa.cast(child.id, sa.String) + "/")
+        .where(child.parent_folder_id == tree.c.id)
+    )
+    return sa.select(tree.c.id, tree.c.tree_path)
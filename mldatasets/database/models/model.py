@@ -4,11 +4,15 @@ from sqlalchemy import ForeignKey
 from sqlalchemy.orm import relationship
 from typing import List,Literal
 import sqlalchemy as sa
-from mldatasets.database.crud.crud import Base
+from database.models.model_base import Base
+from database.models.search import register_search
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship,backref,Mapped
 from sqlalchemy import String, ForeignKey, Integer
 storage_location=Literal['local','cloud']
+dataset_status=Literal['ready','deleting']
+DATASET_READY='ready'
+DATASET_DELETING='deleting'
 
 class MLDataset(Base):
     __tablename__ = 'ml_dataset'
@@ -29,6 +33,8 @@ class MLDataset(Base):
     
     storage: Mapped[storage_location] = mapped_column(String(20))  # local, cloud
     visible: Mapped[str] = mapped_column(String(50),nullable=True)  # public/aws
+    # ready, or deleting while service.deletion purges it in the background
+    status: Mapped[dataset_status] = mapped_column(String(16), default=DATASET_READY, server_default=DATASET_READY)
 
 
 class MLDatasetFolder(Base):
@@ -39,6 +45,8 @@ class MLDatasetFolder(Base):
     path: Mapped[str] = mapped_column(String(255))
     dataset_id: Mapped[int] = mapped_column(ForeignKey("ml_dataset.id"), nullable=True)
     parent_folder_id: Mapped[int] = mapped_column(ForeignKey("ml_dataset_folder.id"), nullable=True)
+    # ids from the top folder down to this one, e.g. "/3/17/42/"
+    tree_path: Mapped[str] = mapped_column(String(255), nullable=True, index=True)
     
     # Relationship with dataset
     ml_dataset: Mapped["MLDataset"] = relationship(
@@ -66,6 +74,8 @@ class MLDatasetFiles(Base):
     file_path: Mapped[str] = mapped_column(String(255))
     file_size: Mapped[str] = mapped_column(String(10))  # in MB
     content_type: Mapped[str] = mapped_column(String(20))  # img, file, audio, etc.
+    # sha256 of the content; rows sharing it share one blob in the store
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True, index=True)
 
     dataset_id: Mapped[int] = mapped_column(ForeignKey("ml_dataset.id"), nullable=True)
     dataset_folder_id: Mapped[int] = mapped_column(ForeignKey("ml_dataset_folder.id"), nullable=True)
@@ -79,9 +89,10 @@ class MLDatasetFiles(Base):
         back_populates="ml_folder_files"
     )
 
+
 class AlgorithmBlogMixin:
     title = sa.Column(sa.String(64), nullable=False)
-    acuracy = sa.Column(JSONB)
+    acuracy = sa.Column(sa.JSON().with_variant(JSONB, "postgresql"))
     visible = sa.Column(sa.String(16), default='public')
     
 
@@ -114,4 +125,20 @@ class Blog(Base):
 
     # TODO: Define reverse relationship
     # algorithm:Mapped["Algorithm"]  = relationship("Algorithm", backref=backref('algorithms_blogs'),passive_deletes=True)
-    # model:Mapped["Models"] = relationship("Models", backref=backref('models_blog'),passive_deletes=True)
\ No newline at end of file
+    # model:Mapped["Models"] = relationship("Models", backref=backref('models_blog'),passive_deletes=True)
+
+
+# indexes for the foreign keys the crud filters and joins on; the
+# (modified_at, id) sort index comes from Base
+sa.Index("ix_ml_dataset_folder_dataset_parent", MLDatasetFolder.dataset_id, MLDatasetFolder.parent_folder_id)
+sa.Index("ix_ml_dataset_folder_parent_folder_id", MLDatasetFolder.parent_folder_id)
+sa.Index("ix_ml_dataset_files_dataset_id", MLDatasetFiles.dataset_id)
+sa.Index("ix_ml_dataset_files_folder_file_name", MLDatasetFiles.dataset_folder_id, MLDatasetFiles.file_name)
+sa.Index("ix_models_algorithm_id", Models.algorithm_id)
+sa.Index("ix_models_ml_dataset_id", Models.ml_dataset_id)
+sa.Index("ix_blogs_algorithm_id", Blog.algorithm_id)
+sa.Index("ix_blogs_model_id", Blog.model_id)
+
+register_search(MLDataset, "name")
+register_search(MLDatasetFolder, "name")
+register_search(MLDatasetFiles, "file_name")
@@ -2,15 +2,15 @@ import datetime
 from uuid import uuid4
 
 import inflect
-from sqlalchemy import Column, DateTime, Integer
+from sqlalchemy import Column, DateTime, Index, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import as_declarative, declared_attr
 
 
 @as_declarative()
 class Base:
-    id = Column(Integer, primary_key=True, unique=True,
-                index=True, autoincrement=True)
+    # the primary key is already unique and indexed
+    id = Column(Integer, primary_key=True, autoincrement=True)
     # uid = Column(UUID(as_uuid=True), index=True, default=uuid4, unique=True)
     created_at = Column(DateTime, default=datetime.datetime.now)
     modified_at = Column(
@@ -36,3 +36,8 @@ class Base:
     @declared_attr
     def __tablename__(cls) -> str:
         return cls._generate_table_name(cls.__name__)
+
+    # backs the (modified_at, id) keyset pagination in BaseCrud
+    @declared_attr
+    def __table_args__(cls):
+        return (Index(f"ix_{cls.__tablename__}_modified_at_id", "modified_at", "id"),)
@@ -0,0 +1,141 @@
+import base64
+import json
+import re
+from fastapi import HTTPException
+import sqlalchemy as sa
+from sqlalchemy import DDL, event
+
+from database.models.model_base import Base
+
+# Name search per model.
+#
+# PostgreSQL: an expression GIN index on to_tsvector('simple', <column>) for
+# word/prefix matches plus a pg_trgm GIN index so substring (ILIKE) matches
+# are index-backed as well; hits are ranked with ts_rank.
+# SQLite (local mode): an external-content FTS5 table kept in sync by
+# triggers, ranked with its built-in bm25 rank.
+# Results are ordered by (rank desc, id desc) and paged with a cursor on that
+# pair. Other databases fall back to a plain LIKE scan.
+
+WORDS = re.compile(r"\w+", re.UNICODE)
+TS_CONFIG = sa.text("'simple'")
+
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
+def fts_table_name(Model) -> str:
+    return f"{Model.__tablename__}_fts"
+
+
+def fts_ddl(table_name: str, column_name: str) -> list:
+    """SQLite FTS5 table and sync triggers for ``table_name.column_name``;
+    also replayed by the search index migration."""
+    fts = f"{table_name}_fts"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column_name}, content='{table_name}', content_rowid='id', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_name}) VALUES (new.id, new.{column_name}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_name}) VALUES ('delete', old.id, old.{column_name}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_name} ON {table_name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_name}) VALUES ('delete', old.id, old.{column_name}); "
+        f"INSERT INTO {fts}(rowid, {column_name}) VALUES (new.id, new.{column_name}); END",
+    ]
+
+
+def register_search(Model, column_name: str):
+    """Index ``Model.<column_name>`` for BaseCrud.search."""
+    table = Model.__table__
+    column = table.c[column_name]
+    Model.__search_column__ = column_name
+
+    sa.Index(
+        f"ix_{table.name}_{column_name}_tsv",
+        sa.func.to_tsvector(TS_CONFIG, column),
+        postgresql_using="gin",
+    ).ddl_if(dialect="postgresql")
+    sa.Index(
+        f"ix_{table.name}_{column_name}_trgm",
+        column,
+        postgresql_using="gin",
+        postgresql_ops={column_name: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
+
+    fts = fts_table_name(Model)
+    for statement in fts_ddl(table.name, column_name):
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    event.listen(table, "before_drop", DDL(f"DROP TABLE IF EXISTS {fts}").execute_if(dialect="sqlite"))
+
+
+def search_statement(Model, query: str, dialect: str, page: int = 1, page_size: int = 20, cursor: str = None):
+    """SELECT (Model, rank) for ``query``, or None when it has no words."""
+    words = WORDS.findall(query or "")
+    if not words:
+        return None
+    column = getattr(Model, Model.__search_column__)
+
+    if dialect == "postgresql":
+        tsquery = sa.func.to_tsquery(TS_CONFIG, " & ".join(f"{word}:*" for word in words))
+        vector = sa.func.to_tsvector(TS_CONFIG, column)
+        rank = sa.func.ts_rank(vector, tsquery)
+        statement = sa.select(Model, rank.label("rank")).where(
+            sa.or_(vector.op("@@")(tsquery), substring(column, query))
+        )
+    elif dialect == "sqlite":
+        fts = sa.table(fts_table_name(Model), sa.column("rowid"), sa.column("rank"))
+        terms = " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+        # bm25 is lower-is-better; negate it so both backends sort descending
+        rank = -fts.c.rank
+        statement = (
+            sa.select(Model, rank.label("rank"))
+            .join(fts, fts.c.rowid == Model.id)
+            .where(sa.literal_column(fts.name).op("MATCH")(terms))
+        )
+    else:
+        rank = sa.literal(0.0)
+        statement = sa.select(Model, rank.label("rank")).where(substring(column, query))
+
+    statement = statement.order_by(rank.desc(), Model.id.desc())
+    if cursor:
+        last_rank, last_id = decode_search_cursor(cursor)
+        if dialect == "postgresql":
+            # ts_rank is a real; against a float8 bound the rank is widened
+            # and the cursor row no longer compares equal to itself
+            last_rank = sa.cast(last_rank, sa.REAL)
+        statement = statement.where(sa.tuple_(rank, Model.id) < sa.tuple_(last_rank, last_id))
+    elif page - 1:
+        statement = statement.offset((page - 1) * page_size)
+    return statement.limit(page_size)
+
+
+def substring(column, query: str):
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{escaped}%", escape="\\")
+
+
+def ranked(rows) -> list:
+    """Model instances from search rows, each carrying its ``search_rank``."""
+    items = []
+    for obj, rank in rows:
+        obj.search_rank = rank
+        items.append(obj)
+    return items
+
+
+def encode_search_cursor(obj) -> str:
+    raw = json.dumps([obj.search_rank, obj.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, _id = json.loads(raw)
+        return float(rank), int(_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
@@ -0,0 +1,35 @@
+"""JSON encode/decode and the JSON response class the apps default to.
+
+Uses orjson when it is installed and falls back to the standard library,
+so callers never import a JSON backend directly. The output matches
+starlette's JSONResponse: compact, UTF-8, non-string keys allowed.
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse as StdJSONResponse
+
+# copied into gateway, auth and mldatasets; tests/test_shared_modules.py keeps the copies identical
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+if orjson is not None:
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(data: bytes) -> Any:
+        return orjson.loads(data)
+else:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(data: bytes) -> Any:
+        return json.loads(data)
+
+
+class JSONResponse(StdJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
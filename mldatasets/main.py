@@ -1,40 +1,107 @@
-from fastapi import FastAPI,status
+from fastapi import FastAPI,status,Request,Response
 from pathlib import Path
 from schema.ml_schema import TextSchema
-from fastapi.responses import JSONResponse
+from fastjson import JSONResponse
 from typing import List
-from pydantic import BaseModel
-from fastapi import File,UploadFile
-from typing import Any
-import base64
-app=FastAPI()
+from fastapi import File,Form,UploadFile,Header
+from typing import Annotated,Optional
+from conf.uploads import upload_settings
+from conf.db_config import pg_session_dependency
+from schema.ml_schema import ChunkedUploadSchema
+from service.chunked_upload import ChunkedUploadService
+from service.service import MLDatasetService
+from service import deletion
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
+from metrics import registry
+from log import setup_logging
+from spooling import spool_uploads
+import logging
+setup_logging("mldataset")
+logger = logging.getLogger(__name__)
 
 
-class FileUploadRequest(BaseModel):
-    file_name: str
-    files: List[dict]
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # pick up purges a previous process left half done (see service.deletion)
+    try:
+        await run_in_threadpool(deletion.resume_pending)
+    except Exception:
+        logger.exception("could not resume pending dataset deletions")
+    yield
+
+
+app=FastAPI(lifespan=lifespan, default_response_class=JSONResponse)
+
+
+@app.middleware("http")
+async def limit_body_size(request: Request, call_next):
+    # refuse oversized uploads before reading them; the gateway also caps
+    # chunked bodies as they stream in
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > upload_settings.MAX_UPLOAD_BODY_SIZE:
+        return JSONResponse(
+            content={"message":f"request body exceeds {upload_settings.MAX_UPLOAD_BODY_SIZE} bytes"},
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE
+        )
+    # uploads roll over from memory to a temp file past this size while
+    # parsing, and a file over MAX_UPLOAD_FILE_SIZE stops the parse with 413
+    with spool_uploads(upload_settings.UPLOAD_SPOOL_THRESHOLD, upload_settings.MAX_UPLOAD_FILE_SIZE):
+        return await call_next(request)
 
-def re_encode(content: str) -> str:  
-    encoded= base64.b64decode(content).decode('utf-8')
-    return encoded
 
-def re_encode_img(content: str) -> str:  
-    encoded= base64.b64decode(content)
-    return encoded
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
 
 
 
 @app.post('/form_files',status_code=status.HTTP_201_CREATED)
-async def image_upload_multiple(data:FileUploadRequest):
+async def image_upload_multiple(file_name: Annotated[str, Form()],
+                                files: Annotated[List[UploadFile], File()] = []):
     try:
-        print(data.file_name)
-        for i in data.files:
-            if i['content_type'].split('/')[0] == 'image':
-                print("image file actins started")
-            elif i['content_type'].split('/')[0] == 'text':
-                print("text file actions started")
-                print(re_encode(i['content']))
+        logger.info("form upload", extra={"file_name": file_name, "files": len(files)})
+        for i in files:
+            if (i.content_type or '').split('/')[0] == 'image':
+                logger.debug("image file", extra={"upload": i.filename})
+            elif (i.content_type or '').split('/')[0] == 'text':
+                logger.debug("text file", extra={"upload": i.filename, "size": i.size})
         return JSONResponse(content={"message":"formdata successful"},status_code=status.HTTP_201_CREATED)
     except Exception as err:
-        print("excepr from ml dataet ",str(err))
+        logger.exception("form upload failed")
         return JSONResponse(content={"message":"form data not success"},status_code=status.HTTP_400_BAD_REQUEST)
+
+
+@app.delete('/datasets/{dataset_id}',status_code=status.HTTP_202_ACCEPTED)
+def dataset_delete(dataset_id: int, db: pg_session_dependency):
+    # the dataset is purged in the background, see service.deletion
+    MLDatasetService.delete_database(dataset_id, db)
+    return {"message": "dataset is being deleted"}
+
+
+# resumable chunked uploads, see service.chunked_upload
+
+@app.post('/uploads',status_code=status.HTTP_201_CREATED)
+def upload_init(payload: ChunkedUploadSchema, db: pg_session_dependency):
+    return ChunkedUploadService.init(payload, db)
+
+
+@app.get('/uploads/{upload_id}')
+def upload_status(upload_id: str):
+    return ChunkedUploadService.get_upload(upload_id)
+
+
+@app.put('/uploads/{upload_id}')
+async def upload_chunk(upload_id: str, request: Request, offset: int,
+                       x_chunk_sha256: Annotated[Optional[str], Header()] = None):
+    return await ChunkedUploadService.write_chunk(upload_id, offset, request.stream(), x_chunk_sha256)
+
+
+@app.post('/uploads/{upload_id}/complete',status_code=status.HTTP_202_ACCEPTED)
+def upload_complete(upload_id: str):
+    return ChunkedUploadService.complete(upload_id)
+
+
+@app.delete('/uploads/{upload_id}',status_code=status.HTTP_204_NO_CONTENT)
+def upload_abort(upload_id: str):
+    ChunkedUploadService.abort(upload_id)
@@ -0,0 +1,19 @@
+from prometheus import Counter, Gauge, Histogram, Registry
+
+registry = Registry()
+
+DB_POOL_SIZE = registry.register(Gauge(
+    "mldataset_db_pool_size", "Connections the pool keeps open.",
+    ("engine",)))
+DB_POOL_CHECKED_OUT = registry.register(Gauge(
+    "mldataset_db_pool_checked_out", "Pooled connections currently in use.",
+    ("engine",)))
+DB_POOL_OVERFLOW = registry.register(Gauge(
+    "mldataset_db_pool_overflow", "Connections open beyond pool_size.",
+    ("engine",)))
+DB_POOL_WAIT = registry.register(Histogram(
+    "mldataset_db_pool_wait_seconds", "Time spent waiting to check a connection out of the pool.",
+    ("engine",)))
+DB_POOL_TIMEOUTS = registry.register(Counter(
+    "mldataset_db_pool_timeouts_total", "Checkouts that gave up after pool_timeout.",
+    ("engine",)))
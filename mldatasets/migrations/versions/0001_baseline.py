@@ -0,0 +1,103 @@
+"""baseline schema
+
+Tables as the models first declared them, including the unique index on
+every inherited ``id`` primary key. Databases that were created from the
+models before migrations existed can be stamped at this revision:
+
+    alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+JSON = sa.JSON().with_variant(JSONB, "postgresql")
+
+
+def base_columns():
+    return [
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("modified_at", sa.DateTime),
+    ]
+
+
+def mixin_columns():
+    return [
+        sa.Column("title", sa.String(64), nullable=False),
+        sa.Column("acuracy", JSON),
+        sa.Column("visible", sa.String(16)),
+    ]
+
+
+def create_id_index(table):
+    op.create_index(f"ix_{table}_id", table, ["id"], unique=True)
+
+
+def upgrade():
+    op.create_table(
+        "ml_dataset",
+        *base_columns(),
+        sa.Column("name", sa.String(50), nullable=False),
+        sa.Column("path", sa.String(255), nullable=False),
+        sa.Column("storage", sa.String(20), nullable=False),
+        sa.Column("visible", sa.String(50)),
+    )
+    create_id_index("ml_dataset")
+
+    op.create_table(
+        "ml_dataset_folder",
+        *base_columns(),
+        sa.Column("name", sa.String(50), nullable=False),
+        sa.Column("path", sa.String(255), nullable=False),
+        sa.Column("dataset_id", sa.Integer, sa.ForeignKey("ml_dataset.id")),
+        sa.Column("parent_folder_id", sa.Integer, sa.ForeignKey("ml_dataset_folder.id")),
+    )
+
+    op.create_table(
+        "ml_dataset_files",
+        *base_columns(),
+        sa.Column("file_name", sa.String(50), nullable=False),
+        sa.Column("file_path", sa.String(255), nullable=False),
+        sa.Column("file_size", sa.String(10), nullable=False),
+        sa.Column("content_type", sa.String(20), nullable=False),
+        sa.Column("dataset_id", sa.Integer, sa.ForeignKey("ml_dataset.id")),
+        sa.Column("dataset_folder_id", sa.Integer, sa.ForeignKey("ml_dataset_folder.id")),
+    )
+    create_id_index("ml_dataset_files")
+
+    op.create_table("algorithms", *base_columns(), *mixin_columns())
+    create_id_index("algorithms")
+
+    op.create_table(
+        "models",
+        *base_columns(),
+        *mixin_columns(),
+        sa.Column("algorithm_id", sa.Integer, sa.ForeignKey("algorithms.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("ml_dataset_id", sa.Integer, sa.ForeignKey("ml_dataset.id", ondelete="CASCADE"), nullable=False),
+    )
+    create_id_index("models")
+
+    op.create_table(
+        "blogs",
+        *base_columns(),
+        sa.Column("title", sa.String(64), nullable=False),
+        sa.Column("description", sa.TEXT),
+        sa.Column("published", sa.Boolean),
+        sa.Column("algorithm_id", sa.Integer, sa.ForeignKey("algorithms.id", ondelete="CASCADE")),
+        sa.Column("model_id", sa.Integer, sa.ForeignKey("models.id", ondelete="CASCADE")),
+    )
+    create_id_index("blogs")
+
+
+def downgrade():
+    for table in ("blogs", "models", "algorithms", "ml_dataset_files", "ml_dataset_folder", "ml_dataset"):
+        op.drop_table(table)
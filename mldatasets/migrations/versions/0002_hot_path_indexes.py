@@ -0,0 +1,52 @@
+"""hot path indexes
+
+Adds the indexes the crud actually filters, joins and sorts on and drops
+the unique ``ix_<table>_id`` indexes that duplicated the primary keys:
+
+* ``(modified_at, id)`` on every table for the ordered / keyset listings
+* ``ml_dataset_folder (dataset_id, parent_folder_id)`` for a dataset's top
+  folders, ``(parent_folder_id)`` for the recursive tree walk
+* ``ml_dataset_files (dataset_folder_id, file_name)`` for a folder's files
+  in name order, ``(dataset_id)`` for a dataset's files
+* the foreign keys of ``models`` and ``blogs``
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+TABLES = ("ml_dataset", "ml_dataset_folder", "ml_dataset_files", "algorithms", "models", "blogs")
+REDUNDANT_ID_INDEXES = ("ml_dataset", "ml_dataset_files", "algorithms", "models", "blogs")
+
+INDEXES = [
+    ("ix_ml_dataset_folder_dataset_parent", "ml_dataset_folder", ["dataset_id", "parent_folder_id"]),
+    ("ix_ml_dataset_folder_parent_folder_id", "ml_dataset_folder", ["parent_folder_id"]),
+    ("ix_ml_dataset_files_dataset_id", "ml_dataset_files", ["dataset_id"]),
+    ("ix_ml_dataset_files_folder_file_name", "ml_dataset_files", ["dataset_folder_id", "file_name"]),
+    ("ix_models_algorithm_id", "models", ["algorithm_id"]),
+    ("ix_models_ml_dataset_id", "models", ["ml_dataset_id"]),
+    ("ix_blogs_algorithm_id", "blogs", ["algorithm_id"]),
+    ("ix_blogs_model_id", "blogs", ["model_id"]),
+] + [(f"ix_{table}_modified_at_id", table, ["modified_at", "id"]) for table in TABLES]
+
+
+def upgrade():
+    for table in REDUNDANT_ID_INDEXES:
+        op.drop_index(f"ix_{table}_id", table_name=table)
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+    # refresh planner statistics so the new indexes are picked up at once
+    op.execute("ANALYZE")
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    for table in REDUNDANT_ID_INDEXES:
+        op.create_index(f"ix_{table}_id", table, ["id"], unique=True)
@@ -0,0 +1,55 @@
+"""name search indexes
+
+PostgreSQL gets the to_tsvector and pg_trgm GIN indexes behind
+BaseCrud.search, SQLite the FTS5 tables and their sync triggers, rebuilt
+from the rows already present.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from database.models.search import fts_ddl
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = (("ml_dataset", "name"), ("ml_dataset_folder", "name"), ("ml_dataset_files", "file_name"))
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table, column in SEARCH_COLUMNS:
+            op.create_index(
+                f"ix_{table}_{column}_tsv", table,
+                [sa.text(f"to_tsvector('simple', {column})")],
+                postgresql_using="gin",
+            )
+            op.create_index(
+                f"ix_{table}_{column}_trgm", table, [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+            )
+    elif dialect == "sqlite":
+        for table, column in SEARCH_COLUMNS:
+            for statement in fts_ddl(table, column):
+                op.execute(statement)
+            op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table, column in SEARCH_COLUMNS:
+        if dialect == "postgresql":
+            op.drop_index(f"ix_{table}_{column}_trgm", table_name=table)
+            op.drop_index(f"ix_{table}_{column}_tsv", table_name=table)
+        elif dialect == "sqlite":
+            for suffix in ("ai", "ad", "au"):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {table}_fts")
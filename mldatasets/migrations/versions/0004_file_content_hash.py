@@ -0,0 +1,30 @@
+"""file content hash
+
+``ml_dataset_files.content_hash`` holds the sha256 of each file's blob in
+the content-addressed store; the index backs the refcount lookups made when
+files are deleted. Rows uploaded before this revision keep a NULL hash and
+are never deduplicated or released.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("ml_dataset_files") as batch:
+        batch.add_column(sa.Column("content_hash", sa.String(64), nullable=True))
+    op.create_index("ix_ml_dataset_files_content_hash", "ml_dataset_files", ["content_hash"])
+
+
+def downgrade():
+    op.drop_index("ix_ml_dataset_files_content_hash", table_name="ml_dataset_files")
+    with op.batch_alter_table("ml_dataset_files") as batch:
+        batch.drop_column("content_hash")
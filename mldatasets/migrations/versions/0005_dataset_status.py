@@ -0,0 +1,26 @@
+"""dataset status
+
+``ml_dataset.status`` is "ready", or "deleting" while the background purge
+(service.deletion) removes the dataset; existing rows become "ready".
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("ml_dataset") as batch:
+        batch.add_column(sa.Column("status", sa.String(16), nullable=False, server_default="ready"))
+
+
+def downgrade():
+    with op.batch_alter_table("ml_dataset") as batch:
+        batch.drop_column("status")
@@ -0,0 +1,37 @@
+"""folder tree path
+
+``ml_dataset_folder.tree_path`` is each folder's materialized path of ids
+("/3/17/42/") and backs ancestor and path lookups. Existing folders are
+backfilled with the same recursive query as
+MLDatasetFolderCrud.rebuild_tree_paths.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from database.crud.tree import tree_paths_statement
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("ml_dataset_folder") as batch:
+        batch.add_column(sa.Column("tree_path", sa.String(255), nullable=True))
+    op.create_index("ix_ml_dataset_folder_tree_path", "ml_dataset_folder", ["tree_path"])
+
+    # one UPDATE ... FROM over the recursive query, so it also runs offline (--sql)
+    folders = sa.table("ml_dataset_folder", sa.column("id", sa.Integer), sa.column("tree_path", sa.String))
+    paths = tree_paths_statement().subquery("paths")
+    op.execute(folders.update().where(folders.c.id == paths.c.id).values(tree_path=paths.c.tree_path))
+
+
+def downgrade():
+    op.drop_index("ix_ml_dataset_folder_tree_path", table_name="ml_dataset_folder")
+    with op.batch_alter_table("ml_dataset_folder") as batch:
+        batch.drop_column("tree_path")
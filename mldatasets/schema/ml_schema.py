@@ -1,4 +1,4 @@
-from typing import Literal,List
+from typing import Literal,List,Optional
 from fastapi import FastAPI, File, Form, UploadFile,HTTPException
 from typing import Annotated
 from pydantic import model_validator,Field
@@ -15,4 +15,30 @@ class TextSchema(BaseModel):
         pass
 
 
+class MLDatasetSchema(BaseModel):
+    name: str
+    storage: Literal['local','cloud'] = 'local'
+    visible: str = 'public'
 
+
+class MLDatasetFolderSchema(BaseModel):
+    name: str
+    folder_name: str
+    dataset_id: int = 0
+    parent_folder_id: int = 0
+
+
+class ChunkedUploadSchema(BaseModel):
+    file_name: str = Field(min_length=1, max_length=50)
+    size: int = Field(ge=0)
+    # sha256 of the whole file, checked on complete when given
+    sha256: Optional[str] = Field(None, pattern=r"^[0-9a-fA-F]{64}$")
+    content_type: str = Field('file', max_length=20)
+    dataset_id: int = 0
+    dataset_folder_id: int = 0
+
+    @model_validator(mode='after')
+    def one_target(self):
+        if bool(self.dataset_id) == bool(self.dataset_folder_id):
+            raise ValueError("give exactly one of dataset_id and dataset_folder_id")
+        return self
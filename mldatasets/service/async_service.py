@@ -0,0 +1,176 @@
+import asyncio
+import uuid
+import os
+from pathlib import Path
+from fastapi import status, HTTPException
+from conf.db_config import async_db_dependency
+from database.crud.async_crud import AsyncMLDatasetCrud, AsyncMLDatasetFolderCrud, AsyncMLDatasetFilesCrud
+from database.models.model import DATASET_DELETING, MLDatasetFolder
+from schema.ml_schema import MLDatasetSchema, MLDatasetFolderSchema
+from service import blob_store, deletion
+from service.service import MLDatasetService, file_writer, static_dir
+import logging
+logger = logging.getLogger(__name__)
+
+
+class AsyncMLDatasetService:
+    """MLDatasetService over an AsyncSession.
+
+    Queries await the async engine and filesystem work runs in threads, so
+    nothing here blocks the event loop.
+    """
+
+    check_payload = staticmethod(MLDatasetService.check_payload)
+
+    @staticmethod
+    async def create_database(payload:MLDatasetSchema,db:async_db_dependency):
+        try:
+            unique_end=uuid.uuid4().hex[:8]
+            unique_name=f"{payload.name}_{unique_end}"
+            unique_path=Path(static_dir)/unique_name
+            try:
+                await asyncio.to_thread(unique_path.mkdir, parents=True, exist_ok=False)
+            except FileExistsError:
+                return False,"dataset is already created please retry"
+            new_payload={
+                "name":payload.name,
+                "path":str(unique_path),
+                "storage": payload.storage,
+                "visible":payload.visible
+            }
+            logger.debug("creating dataset", extra={"payload": new_payload})
+            try:
+                obj=await AsyncMLDatasetCrud(db).create_folder(new_payload)
+                logger.info("dataset created", extra={"dataset_id": obj.id})
+                return True,obj
+            except Exception as e:
+                return False,f"unexcepted error is {str(e)}"
+        except Exception as err:
+            return False,f"unexcepted error is {str(err)}"
+
+    @staticmethod
+    async def create_folder(payload:MLDatasetFolderSchema,db:async_db_dependency):
+        try:
+            obj=None
+            if payload.dataset_id == 0:
+                obj=await AsyncMLDatasetFolderCrud(db).get(payload.parent_folder_id)
+            if payload.parent_folder_id == 0:
+                obj=await AsyncMLDatasetCrud(db).get(payload.dataset_id)
+            if obj is None:
+                detail="dataset not found" if payload.dataset_id is not None else "folder not found"
+                return False,detail
+            if await AsyncMLDatasetService.is_deleting(db, obj):
+                return False,"dataset is being deleted"
+            unique_end=uuid.uuid4().hex[:8]
+            unique_name=f"{payload.name}_{unique_end}"
+            unique_path=Path(obj.path)/unique_name
+            try:
+                await asyncio.to_thread(unique_path.mkdir, parents=True, exist_ok=False)
+            except FileExistsError:
+                return False,"folder is already created please retry"
+            new_payload={
+                'name':payload.folder_name,
+                'path':str(unique_path),
+                'dataset_id':payload.dataset_id,
+                'parent_folder_id':payload.parent_folder_id
+            }
+            if payload.parent_folder_id == 0:
+                del new_payload['parent_folder_id']
+            if payload.dataset_id == 0:
+                del new_payload['dataset_id']
+            obj=await AsyncMLDatasetFolderCrud(db).create_folder(new_payload)
+            logger.info("folder created", extra={"folder_id": obj.id})
+            return True,obj
+        except Exception as err:
+            return False,f"unexcepted error is {str(err)}"
+
+    @staticmethod
+    async def delete_database(Id:int,db:async_db_dependency):
+        try:
+            obj=await AsyncMLDatasetCrud(db).mark_deleting(Id)
+            logger.info("deleting dataset", extra={"dataset_id": Id, "path": obj.path})
+            deletion.schedule(Id)
+            return True
+        except Exception as e:
+            logger.exception("error in delete dataset")
+            raise HTTPException(status_code=404,detail="Dataset not found")
+
+    @staticmethod
+    async def delete_folder(id:int,db:async_db_dependency):
+        try:
+            digests=await AsyncMLDatasetFilesCrud(db).content_hashes(folder_id=id)
+            await AsyncMLDatasetFolderCrud(db).delete(id)
+            await AsyncMLDatasetService.release_blobs(db, digests)
+            return True
+        except Exception as e:
+            logger.exception("error in delete folder")
+            return False
+
+    @staticmethod
+    async def create_files(db:async_db_dependency,payload:any,files:any):
+        try:
+            dataset_id = payload.get('dataset_id')
+            folder_id = payload.get('dataset_folder_id')
+            if dataset_id is None:
+                obj = await AsyncMLDatasetFolderCrud(db).get(folder_id)
+            else:
+                obj = await AsyncMLDatasetCrud(db).get(dataset_id)
+            if await AsyncMLDatasetService.is_deleting(db, obj):
+                return False,"dataset is being deleted"
+
+            target_path = Path(obj.path)
+            await asyncio.to_thread(os.makedirs, str(target_path), exist_ok=True)
+            locations = MLDatasetService.upload_locations(target_path, files)
+
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(
+                *(loop.run_in_executor(file_writer, blob_store.store_file, file.file, location)
+                  for file, location in zip(files, locations)),
+                return_exceptions=True
+            )
+            stored = [result for result in results if not isinstance(result, Exception)]
+            created = [path for digest, size, path, is_new in stored if is_new]
+            failed = [result for result in results if isinstance(result, Exception)]
+            if failed:
+                await AsyncMLDatasetService.discard_upload(db, stored, created)
+                raise failed[0]
+
+            file_payloads=[
+                {
+                    "file_name":path.name,
+                    "file_path":str(path),
+                    "dataset_id":dataset_id,
+                    "dataset_folder_id":folder_id,
+                    "content_type":file.content_type,
+                    "file_size":str(size),
+                    "content_hash":digest
+                }
+                for file, (digest, size, path, is_new) in zip(files, results) if is_new
+            ]
+            try:
+                await AsyncMLDatasetFilesCrud(db).upload_files(file_payloads)
+            except Exception:
+                await db.rollback()
+                await AsyncMLDatasetService.discard_upload(db, stored, created)
+                raise
+            logger.info("files uploaded", extra={"count": len(files), "path": str(target_path)})
+            return True,f"files uploaded successfully"
+        except Exception as err:
+            logger.exception("error in create files")
+            return False
+
+    @staticmethod
+    async def is_deleting(db:async_db_dependency, obj) -> bool:
+        if isinstance(obj, MLDatasetFolder):
+            return await AsyncMLDatasetFolderCrud(db).dataset_status(obj) == DATASET_DELETING
+        return obj.status == DATASET_DELETING
+
+    @staticmethod
+    async def release_blobs(db:async_db_dependency, digests:list):
+        refcounts = await AsyncMLDatasetFilesCrud(db).refcounts(digests)
+        await asyncio.to_thread(blob_store.release, digests, refcounts)
+
+    @staticmethod
+    async def discard_upload(db:async_db_dependency, stored:list, created:list):
+        await asyncio.to_thread(MLDatasetService.remove_files, created)
+        await AsyncMLDatasetService.release_blobs(db, [digest for digest, *_ in stored])
@@ -0,0 +1,199 @@
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from conf.uploads import upload_settings
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed storage for uploaded dataset files.
+#
+# Every upload is hashed (sha256) while it is streamed into a temp file
+# under the blob root and then moved to blobs/<ab>/<cd>/<digest>; if that
+# blob already exists the temp file is dropped, so identical content is
+# stored once. The dataset path a file is listed under is a reflink (copy on
+# write clone), a hardlink or, failing both, a copy of its blob. Each
+# MLDatasetFiles row keeps the digest in content_hash; the number of rows
+# sharing a digest is the blob's refcount and release() removes blobs nobody
+# references any more.
+
+CHUNK_SIZE = 1024 * 1024
+# linux FICLONE ioctl (btrfs, xfs with reflink=1, ...)
+FICLONE = 0x40049409
+
+blob_root = Path(upload_settings.BLOB_DIR)
+tmp_root = blob_root / "tmp"
+tmp_root.mkdir(parents=True, exist_ok=True)
+
+
+def blob_path(digest: str) -> Path:
+    return blob_root / digest[:2] / digest[2:4] / digest
+
+
+def ingest(source):
+    """Stream ``source`` into the store; returns (digest, size, blob path)."""
+    source.seek(0)
+    sha = hashlib.sha256()
+    size = 0
+    fd, tmp_name = tempfile.mkstemp(dir=tmp_root)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while chunk := source.read(CHUNK_SIZE):
+                sha.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        digest = sha.hexdigest()
+        return digest, size, _commit(tmp_name, digest)
+    except BaseException:
+        _discard(tmp_name)
+        raise
+
+
+def ingest_path(path: Path):
+    """Move the file at ``path`` into the store (it is read once to hash it,
+    never copied); returns (digest, size, blob path)."""
+    sha = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as source:
+        while chunk := source.read(CHUNK_SIZE):
+            sha.update(chunk)
+            size += len(chunk)
+    digest = sha.hexdigest()
+    try:
+        return digest, size, _commit(path, digest)
+    except OSError as err:
+        if err.errno != errno.EXDEV:
+            raise
+    # on another filesystem than the store: copy it in instead
+    with open(path, "rb") as source:
+        result = ingest(source)
+    os.unlink(path)
+    return result
+
+
+def _commit(tmp_name, digest: str) -> Path:
+    path = blob_path(digest)
+    if path.exists():
+        os.unlink(tmp_name)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.chmod(tmp_name, 0o444)
+        os.replace(tmp_name, path)
+    return path
+
+
+def _discard(tmp_name):
+    try:
+        os.unlink(tmp_name)
+    except FileNotFoundError:
+        pass
+
+
+def _reflink(blob: Path, location: Path):
+    with blob.open("rb") as src, location.open("xb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            location.unlink()
+            raise
+
+
+def _hardlink(blob: Path, location: Path):
+    os.link(blob, location)
+
+
+def _copy(blob: Path, location: Path):
+    with blob.open("rb") as src, location.open("xb") as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+LINKERS = {"reflink": _reflink, "hardlink": _hardlink, "copy": _copy}
+link_modes = [mode.strip() for mode in upload_settings.BLOB_LINK_MODES.split(",") if mode.strip()]
+
+
+def materialize(blob: Path, location: Path):
+    """Make ``blob`` visible at ``location`` using the first link mode the
+    filesystem supports. Never overwrites: raises FileExistsError."""
+    error = None
+    for mode in link_modes:
+        try:
+            return LINKERS[mode](blob, location)
+        except FileExistsError:
+            raise
+        except OSError as err:
+            if err.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EPERM,
+                                 errno.EINVAL, errno.EMLINK, errno.ENOSYS):
+                raise
+            error = err
+    raise error or OSError(errno.EOPNOTSUPP, "no blob link mode configured")
+
+
+def free_location(location: Path, digest: str) -> Path:
+    """``location``, or ``name_<digest[:8]>.ext`` (then numbered) beside it
+    when another file already has that name."""
+    candidate = location.with_name(f"{location.stem}_{digest[:8]}{location.suffix}")
+    n = 1
+    while candidate.exists():
+        candidate = location.with_name(f"{location.stem}_{digest[:8]}_{n}{location.suffix}")
+        n += 1
+    return candidate
+
+
+def store_file(source, location: Path):
+    """Ingest ``source`` and materialize it at ``location``.
+
+    Returns (digest, size, path, created): ``path`` is where the file ended
+    up and ``created`` is False when an identical file was already there.
+    """
+    return place(ingest(source), location, lambda: ingest(source))
+
+
+def place(ingested, location: Path, reingest=None):
+    """Materialize an ingested (digest, size, blob path) at ``location``;
+    returns what store_file does."""
+    digest, size, blob = ingested
+    while True:
+        try:
+            materialize(blob, location)
+            return digest, size, location, True
+        except FileExistsError:
+            if same_content(location, blob):
+                return digest, size, location, False
+            location = free_location(location, digest)
+        except FileNotFoundError:
+            if blob.exists() or reingest is None:
+                raise
+            # released by a concurrent delete between ingest and link
+            digest, size, blob = reingest()
+
+
+def same_content(location: Path, blob: Path) -> bool:
+    try:
+        if os.path.samefile(location, blob):
+            return True
+        if location.stat().st_size != blob.stat().st_size:
+            return False
+        with location.open("rb") as existing:
+            sha = hashlib.sha256()
+            while chunk := existing.read(CHUNK_SIZE):
+                sha.update(chunk)
+        return sha.hexdigest() == blob.name
+    except FileNotFoundError:
+        return False
+
+
+def release(digests, refcounts: dict):
+    """Remove the blobs of ``digests`` whose refcount dropped to zero."""
+    for digest in set(digests):
+        if not digest or refcounts.get(digest, 0):
+            continue
+        try:
+            blob_path(digest).unlink(missing_ok=True)
+        except OSError:
+            logger.warning("could not remove blob", extra={"digest": digest})
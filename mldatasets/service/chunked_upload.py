@@ -0,0 +1,316 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from fastapi import HTTPException, status
+
+from conf.db_config import pg_session_dependency, session_scope
+from conf.uploads import upload_settings
+from database.crud.crud import MLDatasetCrud, MLDatasetFilesCrud, MLDatasetFolderCrud
+from schema.ml_schema import ChunkedUploadSchema
+from service import blob_store
+from service.service import MLDatasetService, file_writer
+
+logger = logging.getLogger(__name__)
+
+# Resumable chunked uploads.
+#
+#   POST   /uploads                   open a session, answers its upload_id
+#   PUT    /uploads/{id}?offset=N     append one chunk (X-Chunk-SHA256 optional)
+#   GET    /uploads/{id}              state and current offset, to resume
+#   POST   /uploads/{id}/complete     202; the file is registered in the background
+#   DELETE /uploads/{id}              abort
+#
+# Each session is a directory holding meta.json and data.part. Chunks are
+# written straight into data.part at their offset (which must be its current
+# size) and fsynced, so the offset reported after a crash or a dropped
+# connection is always safe to resume from. A chunk that fails its checksum
+# or breaks off is cut back off the file. On complete the part file is
+# hashed once and moved, not copied, into the blob store and materialized
+# in the dataset like a regular upload; the digest goes into meta.json
+# before that, so a finish interrupted by a restart resumes from the blob,
+# and a finish that fails releases it again. Sessions older than
+# UPLOAD_SESSION_TTL are swept whenever a new one is opened.
+
+UPLOADING = "uploading"
+COMPLETING = "completing"
+COMPLETE = "complete"
+FAILED = "failed"
+
+UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+WRITE_SIZE = 1024 * 1024
+
+session_root = Path(upload_settings.UPLOAD_SESSION_DIR)
+session_root.mkdir(parents=True, exist_ok=True)
+
+# hashing a multi-GB part file takes a while; keep it off the upload writers
+upload_finisher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="upload-finish")
+_finishing = set()
+_finishing_lock = threading.Lock()
+
+
+def session_dir(upload_id: str) -> Path:
+    path = session_root / upload_id
+    if not UPLOAD_ID.match(upload_id) or not path.is_dir():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found.")
+    return path
+
+
+def load_meta(path: Path) -> dict:
+    try:
+        return json.loads((path / "meta.json").read_text())
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found.")
+
+
+def save_meta(path: Path, meta: dict):
+    tmp = path / "meta.json.tmp"
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, path / "meta.json")
+
+
+def part_size(path: Path) -> int:
+    try:
+        return (path / "data.part").stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def describe(path: Path, meta: dict) -> dict:
+    # once every byte is in, the part file moves into the blob store
+    offset = part_size(path) if meta["state"] == UPLOADING else meta["size"]
+    return {**meta, "offset": offset, "chunk_size": upload_settings.UPLOAD_CHUNK_SIZE}
+
+
+def offset_conflict(detail: str, offset: int):
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=detail,
+        headers={"Upload-Offset": str(offset)}
+    )
+
+
+def upload_target(db, meta: dict):
+    if meta["dataset_id"]:
+        obj = MLDatasetCrud(db).get(meta["dataset_id"])
+    else:
+        obj = MLDatasetFolderCrud(db).get(meta["dataset_folder_id"])
+    if MLDatasetService.is_deleting(db, obj):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="dataset is being deleted")
+    return obj
+
+
+async def settle(pending):
+    """Wait for an executor job that is already running to finish, even
+    through further cancellation of the calling task."""
+    while not pending.done():
+        try:
+            await asyncio.wait([asyncio.wrap_future(pending)])
+        except asyncio.CancelledError:
+            continue
+
+
+class ChunkedUploadService:
+
+    @staticmethod
+    def init(payload: ChunkedUploadSchema, db: pg_session_dependency):
+        ChunkedUploadService.sweep()
+        if payload.size > upload_settings.MAX_CHUNKED_UPLOAD_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                detail=f"upload exceeds {upload_settings.MAX_CHUNKED_UPLOAD_SIZE} bytes"
+            )
+        meta = {
+            "upload_id": uuid.uuid4().hex,
+            "file_name": Path(payload.file_name).name,
+            "size": payload.size,
+            "sha256": payload.sha256.lower() if payload.sha256 else None,
+            "content_type": payload.content_type,
+            "dataset_id": payload.dataset_id or None,
+            "dataset_folder_id": payload.dataset_folder_id or None,
+            "state": UPLOADING,
+            "created": time.time(),
+        }
+        upload_target(db, meta)
+        path = session_root / meta["upload_id"]
+        path.mkdir()
+        (path / "data.part").touch()
+        save_meta(path, meta)
+        logger.info("chunked upload opened", extra={"upload_id": meta["upload_id"], "size": payload.size})
+        return describe(path, meta)
+
+    @staticmethod
+    def get_upload(upload_id: str):
+        path = session_dir(upload_id)
+        return describe(path, load_meta(path))
+
+    @staticmethod
+    async def write_chunk(upload_id: str, offset: int, body, chunk_sha256: str = None):
+        """Append ``body`` (an async iterator of bytes) at ``offset``."""
+        path = session_dir(upload_id)
+        meta = load_meta(path)
+        if meta["state"] != UPLOADING:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"upload is {meta['state']}")
+        with open(path / "data.part", "r+b") as part:
+            try:
+                fcntl.flock(part.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise offset_conflict("another chunk is being written", offset)
+            current = os.fstat(part.fileno()).st_size
+            if offset != current:
+                raise offset_conflict(f"expected offset {current}", current)
+            limit = min(upload_settings.MAX_UPLOAD_CHUNK_SIZE, meta["size"] - offset)
+            sha = hashlib.sha256()
+            written = 0
+            buffer = bytearray()
+            pending = None
+            part.seek(offset)
+            try:
+                async for piece in body:
+                    written += len(piece)
+                    if written > limit:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                            detail=f"chunk runs past {limit} bytes"
+                        )
+                    sha.update(piece)
+                    buffer += piece
+                    if len(buffer) >= WRITE_SIZE:
+                        pending = file_writer.submit(part.write, bytes(buffer))
+                        await asyncio.wrap_future(pending)
+                        buffer.clear()
+                if chunk_sha256 and sha.hexdigest() != chunk_sha256.lower():
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="chunk checksum mismatch")
+                pending = file_writer.submit(ChunkedUploadService.flush, part, bytes(buffer))
+                await asyncio.wrap_future(pending)
+            except BaseException:
+                # a cancelled request leaves its last write running in the
+                # executor; let it land before cutting it off again
+                if pending is not None:
+                    await settle(pending)
+                # drop the partial chunk so the offset stays on a chunk boundary
+                part.truncate(offset)
+                raise
+        return describe(path, meta)
+
+    @staticmethod
+    def flush(part, data: bytes):
+        part.write(data)
+        part.flush()
+        os.fsync(part.fileno())
+
+    @staticmethod
+    def complete(upload_id: str):
+        path = session_dir(upload_id)
+        meta = load_meta(path)
+        if meta["state"] in (COMPLETE, FAILED):
+            return describe(path, meta)
+        offset = part_size(path)
+        if meta["state"] == UPLOADING and offset != meta["size"]:
+            raise offset_conflict(f"{meta['size'] - offset} bytes still missing", offset)
+        meta["state"] = COMPLETING
+        save_meta(path, meta)
+        # a session left completing by a restart is picked up again here
+        with _finishing_lock:
+            if upload_id not in _finishing:
+                _finishing.add(upload_id)
+                upload_finisher.submit(ChunkedUploadService.finish, upload_id)
+        return describe(path, meta)
+
+    @staticmethod
+    def finish(upload_id: str):
+        path = session_root / upload_id
+        meta = load_meta(path)
+        ingested = None
+        placed = None
+        try:
+            with session_scope() as db:
+                obj = upload_target(db, meta)
+                ingested = ChunkedUploadService.ingest(path, meta)
+                digest = ingested[0]
+                if meta["sha256"] and digest != meta["sha256"]:
+                    raise ValueError("file checksum mismatch")
+                os.makedirs(obj.path, exist_ok=True)
+                digest, size, location, created = blob_store.place(ingested, Path(obj.path) / meta["file_name"])
+                if created:
+                    placed = location
+                    MLDatasetFilesCrud(db).upload_files([{
+                        "file_name": location.name,
+                        "file_path": str(location),
+                        "dataset_id": meta["dataset_id"],
+                        "dataset_folder_id": meta["dataset_folder_id"],
+                        "content_type": meta["content_type"],
+                        "file_size": str(size),
+                        "content_hash": digest,
+                    }])
+            meta.update(state=COMPLETE, file_path=str(location), content_hash=digest)
+            logger.info("chunked upload complete", extra={"upload_id": upload_id, "path": str(location)})
+        except Exception as err:
+            logger.exception("chunked upload failed", extra={"upload_id": upload_id})
+            if ingested is not None:
+                try:
+                    ChunkedUploadService.discard(ingested[0], placed)
+                except Exception:
+                    logger.exception("could not discard failed upload", extra={"upload_id": upload_id})
+            detail = err.detail if isinstance(err, HTTPException) else str(err)
+            meta.update(state=FAILED, detail=detail)
+        finally:
+            save_meta(path, meta)
+            with _finishing_lock:
+                _finishing.discard(upload_id)
+
+    @staticmethod
+    def ingest(path: Path, meta: dict):
+        """Move data.part into the blob store. The digest is saved in meta
+        first thing, so a finish retried after a restart reuses the blob
+        instead of looking for the part file."""
+        part = path / "data.part"
+        if meta.get("content_hash") and not part.exists():
+            blob = blob_store.blob_path(meta["content_hash"])
+            if not blob.exists():
+                raise ValueError("upload data is gone")
+            return meta["content_hash"], blob.stat().st_size, blob
+        ingested = blob_store.ingest_path(part)
+        meta["content_hash"] = ingested[0]
+        save_meta(path, meta)
+        return ingested
+
+    @staticmethod
+    def discard(digest: str, placed: Path = None):
+        """Undo a failed finish: the file it materialized, and its blob
+        unless another file row shares it."""
+        if placed is not None:
+            placed.unlink(missing_ok=True)
+        with session_scope() as db:
+            blob_store.release([digest], MLDatasetFilesCrud(db).refcounts([digest]))
+
+    @staticmethod
+    def abort(upload_id: str):
+        path = session_dir(upload_id)
+        with _finishing_lock:
+            if upload_id in _finishing:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="upload is completing")
+        shutil.rmtree(path, ignore_errors=True)
+        return True
+
+    @staticmethod
+    def sweep():
+        """Remove sessions untouched for UPLOAD_SESSION_TTL seconds."""
+        cutoff = time.time() - upload_settings.UPLOAD_SESSION_TTL
+        for path in session_root.iterdir():
+            try:
+                touched = max([path.stat().st_mtime] + [item.stat().st_mtime for item in path.iterdir()])
+            except FileNotFoundError:
+                continue
+            if touched < cutoff and path.name not in _finishing:
+                shutil.rmtree(path, ignore_errors=True)
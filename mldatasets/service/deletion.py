@@ -0,0 +1,92 @@
+import logging
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from conf.db_config import session_scope
+from conf.settings import settings
+from database.crud.crud import MLDatasetCrud, MLDatasetFilesCrud
+from database.models.model import DATASET_DELETING, MLDataset
+from service import blob_store
+
+logger = logging.getLogger(__name__)
+
+# Background dataset deletion.
+#
+# delete_database only flips the dataset to status "deleting" and schedules
+# purge() here; the caller answers 202 straight away. The purge deletes the
+# file rows, then the folder rows (deepest first), in committed batches of
+# DATASET_DELETE_BATCH_SIZE, removes the dataset directory and finally the
+# dataset row itself. The "deleting" row stays until the very end, so a
+# purge cut short by a crash or restart is picked up again by
+# resume_pending(), which the app runs at startup (or python -m
+# service.deletion), or by the next delete call.
+
+deletion_worker = ThreadPoolExecutor(
+    max_workers=settings.DATASET_DELETE_WORKERS,
+    thread_name_prefix="dataset-delete"
+)
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+
+def schedule(dataset_id: int):
+    """Queue a purge of ``dataset_id`` unless one is already queued."""
+    with _scheduled_lock:
+        if dataset_id in _scheduled:
+            return None
+        _scheduled.add(dataset_id)
+    return deletion_worker.submit(_run, dataset_id)
+
+
+def _run(dataset_id: int):
+    try:
+        purge(dataset_id)
+    except Exception:
+        logger.exception("dataset purge failed", extra={"dataset_id": dataset_id})
+        raise
+    finally:
+        with _scheduled_lock:
+            _scheduled.discard(dataset_id)
+
+
+def purge(dataset_id: int, batch_size: int = None):
+    batch_size = batch_size or settings.DATASET_DELETE_BATCH_SIZE
+    with session_scope() as db:
+        obj = db.get(MLDataset, dataset_id)
+        if obj is None or obj.status != DATASET_DELETING:
+            return False
+        path = obj.path
+        crud = MLDatasetCrud(db)
+        files = 0
+        while True:
+            batch = crud.purge_files(dataset_id, batch_size)
+            files += len(batch)
+            digests = [digest for digest in batch if digest]
+            blob_store.release(digests, MLDatasetFilesCrud(db).refcounts(digests))
+            if len(batch) < batch_size:
+                break
+        folders = 0
+        while True:
+            deleted = crud.purge_folders(dataset_id, batch_size)
+            folders += deleted
+            if deleted < batch_size:
+                break
+        shutil.rmtree(path, ignore_errors=True)
+        crud.purge(dataset_id)
+    logger.info("dataset purged", extra={"dataset_id": dataset_id, "files": files, "folders": folders})
+    return True
+
+
+def resume_pending():
+    """Schedule every dataset a previous process left half deleted."""
+    with session_scope() as db:
+        pending = MLDatasetCrud(db).pending_deletions()
+    return [future for future in map(schedule, pending) if future is not None]
+
+
+if __name__ == "__main__":
+    from log import setup_logging
+    setup_logging("mldataset")
+    for future in resume_pending():
+        future.result()
@@ -1,16 +1,28 @@
 import os 
 import uuid
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from fastapi import status, HTTPException
 from conf.db_config import pg_session_dependency
 import json
 from database.crud.crud import MLDatasetCrud,MLDatasetFolderCrud, MLDatasetFilesCrud
-from fastapi_api_gateway.api_gateway.mldatasets.schema.ml_schema import MLDatasetSchema, MLDatasetFolderSchema
+from database.models.model import DATASET_DELETING, MLDatasetFolder
+from schema.ml_schema import MLDatasetSchema, MLDatasetFolderSchema
 import shutil
+import logging
+from conf.uploads import upload_settings
+from service import blob_store, deletion
+logger = logging.getLogger(__name__)
 static_dir = "static/mldatabase"
 os.makedirs(static_dir, exist_ok=True)
 
+# disk writes run here so a large upload never blocks the event loop
+file_writer = ThreadPoolExecutor(
+    max_workers=upload_settings.FILE_WRITE_WORKERS,
+    thread_name_prefix="file-writer"
+)
+
 class MLDatasetService:
     @staticmethod
     def create_database(payload:MLDatasetSchema,db:pg_session_dependency):
@@ -28,12 +40,10 @@ class MLDatasetService:
                 "storage": payload.storage,
                 "visible":payload.visible
             }
-            print("phase2")
-            print(new_payload)
+            logger.debug("creating dataset", extra={"payload": new_payload})
             try:
                 obj=MLDatasetCrud(db).create_folder(new_payload)
-                print("obj is generated",obj)
-                print("Object contents:", obj.__dict__ if hasattr(obj, '__dict__') else obj)
+                logger.info("dataset created", extra={"dataset_id": obj.id})
                 return True,obj
             except Exception as e:
                 return False,f"unexcepted error is {str(e)}"
@@ -51,59 +61,53 @@ class MLDatasetService:
             if obj is None:
                 detail="dataset not found" if payload.dataset_id is not None else "folder not found"
                 return False,detail
-            print("phase1")
+            if MLDatasetService.is_deleting(db, obj):
+                return False,"dataset is being deleted"
             unique_end=uuid.uuid4().hex[:8]
             unique_name=f"{payload.name}_{unique_end}"
             unique_path=Path(obj.path)/unique_name
-            print("phase2")
             try:
                 unique_path.mkdir(parents=True,exist_ok=False)
             except FileExistsError:
                 return False,"folder is already created please retry"
-            print("phase3")
             new_payload={
                 'name':payload.folder_name,
                 'path':str(unique_path),
                 'dataset_id':payload.dataset_id,
                 'parent_folder_id':payload.parent_folder_id               
             }
-            print("phase4")
             if payload.parent_folder_id == 0:
                 del new_payload['parent_folder_id']
             if payload.dataset_id == 0:
                 del new_payload['dataset_id']
             obj=MLDatasetFolderCrud(db).create_folder(new_payload)
-            print('send before [ay;oad]',obj)
-            print("phase5")
+            logger.info("folder created", extra={"folder_id": obj.id})
             return True,obj
         except Exception as err:
             return False,f"unexcepted error is {str(err)}"
 
     @staticmethod        
     def delete_database(Id:int,db:pg_session_dependency):
+        """Mark the dataset as deleting and purge it in the background (see
+        service.deletion); the route answers 202 Accepted."""
         try:
-            obj_path=MLDatasetCrud(db).get(Id)
-            print("obj_path",obj_path)
-            print("pahse 1")
-            if not os.path.exists(obj_path.path):
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Folder with this path  not found")
-            shutil.rmtree(obj_path.path)
-            obj=MLDatasetCrud(db).get(Id)
-            if obj is None:
-                return False
-            obj=MLDatasetCrud(db).delete_dataset(Id)
+            obj=MLDatasetCrud(db).mark_deleting(Id)
+            logger.info("deleting dataset", extra={"dataset_id": Id, "path": obj.path})
+            deletion.schedule(Id)
             return True
         except Exception as e:
-            print('error in delete dataset',(e))
+            logger.exception("error in delete dataset")
             raise HTTPException(status_code=404,detail="Dataset not found")
             
     @staticmethod
     def delete_folder(id:int,db:pg_session_dependency):
         try:
-            if MLDatasetFolderCrud(db).delete(id):
-                return True
+            digests=MLDatasetFilesCrud(db).content_hashes(folder_id=id)
+            MLDatasetFolderCrud(db).delete(id)
+            blob_store.release(digests, MLDatasetFilesCrud(db).refcounts(digests))
+            return True
         except Exception as e:
-            print(e)
+            logger.exception("error in delete folder")
             return False
     
     @staticmethod
@@ -123,6 +127,8 @@ class MLDatasetService:
 
     @staticmethod 
     def create_files(db:pg_session_dependency,payload:any,files:any):
+        # blocking (session and disk I/O); call it from async code through
+        # run_in_threadpool
         try:
             dataset_id = payload.get('dataset_id')
             folder_id = payload.get('dataset_folder_id')
@@ -133,23 +139,85 @@ class MLDatasetService:
 
             if obj is None:
                 return False,f"dataset or folder not found"
-            obj1=MLDatasetFilesCrud(db)
-            for file in files:
-                target_path = Path(obj.path)
-                os.makedirs(str(target_path), exist_ok=True)
-                file_location = Path(target_path).joinpath(file.filename)
-                with file_location.open("wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
-                file_payload={
-                    "file_name":file.filename,
-                    "file_path":str(file_location),
+            if MLDatasetService.is_deleting(db, obj):
+                return False,"dataset is being deleted"
+            target_path = Path(obj.path)
+            os.makedirs(str(target_path), exist_ok=True)
+            locations = MLDatasetService.upload_locations(target_path, files)
+
+            futures = [file_writer.submit(blob_store.store_file, file.file, location)
+                       for file, location in zip(files, locations)]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as err:
+                    results.append(err)
+            stored = [result for result in results if not isinstance(result, Exception)]
+            created = [path for digest, size, path, is_new in stored if is_new]
+            failed = [result for result in results if isinstance(result, Exception)]
+            if failed:
+                MLDatasetService.discard_upload(db, stored, created)
+                raise failed[0]
+
+            # an identical file already at the same path is not listed twice
+            file_payloads=[
+                {
+                    "file_name":path.name,
+                    "file_path":str(path),
                     "dataset_id":payload.get('dataset_id'),
                     "dataset_folder_id":payload.get('dataset_folder_id'),
                     "content_type":file.content_type,
-                    "file_size":file.size
+                    "file_size":str(size),
+                    "content_hash":digest
                 }
-                obj1.upload_file(file_payload)
+                for file, (digest, size, path, is_new) in zip(files, results) if is_new
+            ]
+            try:
+                MLDatasetFilesCrud(db).upload_files(file_payloads)
+            except Exception:
+                db.rollback()
+                MLDatasetService.discard_upload(db, stored, created)
+                raise
+            logger.info("files uploaded", extra={"count": len(files), "path": str(target_path)})
             return True,f"files uploaded successfully"
         except Exception as err:
-            print(err)
-            return False
\ No newline at end of file
+            logger.exception("error in create files")
+            return False
+
+    @staticmethod
+    def is_deleting(db:pg_session_dependency, obj) -> bool:
+        """Whether ``obj``, a dataset or any folder of one, belongs to a dataset
+        being deleted."""
+        if isinstance(obj, MLDatasetFolder):
+            return MLDatasetFolderCrud(db).dataset_status(obj) == DATASET_DELETING
+        return obj.status == DATASET_DELETING
+
+    @staticmethod
+    def upload_locations(target_path:Path, files:list):
+        # same-named files in one batch would race for one path
+        locations = []
+        seen = set()
+        for file in files:
+            location = target_path.joinpath(Path(file.filename).name)
+            n = 1
+            while location in seen:
+                location = target_path.joinpath(f"{Path(file.filename).stem}_{n}{Path(file.filename).suffix}")
+                n += 1
+            seen.add(location)
+            locations.append(location)
+        return locations
+
+    @staticmethod
+    def discard_upload(db:pg_session_dependency, stored:list, created:list):
+        MLDatasetService.remove_files(created)
+        digests = [digest for digest, *_ in stored]
+        blob_store.release(digests, MLDatasetFilesCrud(db).refcounts(digests))
+
+    @staticmethod
+    def remove_files(locations:list):
+        for location in locations:
+            try:
+                location.unlink(missing_ok=True)
+            except OSError:
+                logger.warning("could not remove file", extra={"path": str(location)})
@@ -1,6 +1,12 @@
+import time
 from conf.settings import settings
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from metrics import DB_POOL_CHECKED_OUT, DB_POOL_OVERFLOW, DB_POOL_SIZE, DB_POOL_TIMEOUTS, DB_POOL_WAIT
 
 if settings.DEBUG:
     if settings.ENV == "local":
@@ -10,12 +16,99 @@ if settings.DEBUG:
 else:
     DB_URI = settings.SQLALCHEMY_DATABASE_URL_PROD
 
+
+class _MeteredPool:
+    """Records checkout wait time and pool occupancy for /metrics."""
+
+    engine_label = ""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            DB_POOL_TIMEOUTS.labels(self.engine_label).inc()
+            raise
+        finally:
+            DB_POOL_WAIT.labels(self.engine_label).observe(time.perf_counter() - started)
+            self._record()
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._record()
+
+    def _record(self):
+        DB_POOL_SIZE.labels(self.engine_label).set(self.size())
+        DB_POOL_CHECKED_OUT.labels(self.engine_label).set(self.checkedout())
+        DB_POOL_OVERFLOW.labels(self.engine_label).set(max(0, self.overflow()))
+
+
+class MeteredQueuePool(_MeteredPool, QueuePool):
+    engine_label = "sync"
+
+
+class MeteredAsyncQueuePool(_MeteredPool, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+
+def pool_sizing():
+    if settings.POSTGRES_POOL_SIZE:
+        return settings.POSTGRES_POOL_SIZE, settings.POSTGRES_MAX_POOL
+    engines = 2 if settings.DB_ASYNC else 1
+    per_engine = max(2, settings.POSTGRES_MAX_CONNECTIONS // (max(1, settings.WEB_CONCURRENCY) * engines))
+    pool_size = max(1, per_engine // 2)
+    return pool_size, per_engine - pool_size
+
+
+def connect_args(url, is_async=False):
+    # a runaway query is cancelled by the server instead of holding its
+    # connection (and a pool slot) indefinitely
+    if url.get_backend_name() != "postgresql":
+        return {}
+    timeout = settings.POSTGRES_STATEMENT_TIMEOUT_MS
+    if is_async:
+        return {"server_settings": {"statement_timeout": str(timeout)}}
+    return {"options": f"-c statement_timeout={timeout}"}
+
+
+POOL_SIZE, MAX_OVERFLOW = pool_sizing()
+SYNC_URL = make_url(DB_URI)
+
 engine = create_engine(
-    DB_URI,
+    SYNC_URL,
+    poolclass=MeteredQueuePool,
     pool_pre_ping=True,
-    pool_size=settings.POSTGRES_POOL_SIZE,
-    max_overflow=settings.POSTGRES_MAX_POOL,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+    connect_args=connect_args(SYNC_URL),
     echo=settings.POSTGRES_ENGINE_ECHO
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ASYNC:
+    ASYNC_URL = async_url(DB_URI)
+    async_engine = create_async_engine(
+        ASYNC_URL,
+        poolclass=MeteredAsyncQueuePool,
+        pool_pre_ping=True,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+        connect_args=connect_args(ASYNC_URL, is_async=True),
+        echo=settings.POSTGRES_ENGINE_ECHO
+    )
+    # objects stay readable after commit without an implicit (sync) refresh
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
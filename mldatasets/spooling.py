@@ -0,0 +1,58 @@
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+import starlette.requests
+from starlette import status
+from starlette.exceptions import HTTPException
+from starlette.formparsers import MultiPartParser
+
+# mldatasets carries an identical copy, checked by tests/test_shared_modules.py
+
+_spool_max_size: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("spool_max_size", default=None)
+_max_file_size: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("max_file_size", default=None)
+
+
+class SpoolingMultiPartParser(MultiPartParser):
+    """Rolls uploads over from memory to a temp file at the threshold set
+    with ``spool_uploads()`` for the request being parsed, and stops with
+    413 as soon as one file grows past its ``max_file_size``.
+
+    Requests that never enter ``spool_uploads()`` keep Starlette's own
+    threshold and no file limit, so nothing else in the process is affected.
+    """
+
+    @property
+    def spool_max_size(self) -> int:
+        return _spool_max_size.get() or MultiPartParser.spool_max_size
+
+    def on_part_begin(self) -> None:
+        super().on_part_begin()
+        self._part_size = 0
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        limit = _max_file_size.get()
+        if self._current_part.file is not None and limit:
+            # counted before the bytes are queued for writing to the spool
+            self._part_size += end - start
+            if self._part_size > limit:
+                raise HTTPException(
+                    status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                    detail=f"File {self._current_part.file.filename} exceeds {limit} bytes"
+                )
+        super().on_part_data(data, start, end)
+
+
+# Request.form() builds its parser from this name
+starlette.requests.MultiPartParser = SpoolingMultiPartParser
+
+
+@contextmanager
+def spool_uploads(max_size: int, max_file_size: Optional[int] = None):
+    spool_token = _spool_max_size.set(max_size)
+    file_token = _max_file_size.set(max_file_size)
+    try:
+        yield
+    finally:
+        _max_file_size.reset(file_token)
+        _spool_max_size.reset(spool_token)
@@ -0,0 +1,79 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+# the service is run from its own directory (see the Dockerfile)
+sys.path.insert(0, str(SERVICE_DIR))
+
+# Local mode against a SQLite file: settings resolve sql.db and the static/
+# upload directories relative to the working directory, so the whole run
+# happens in a scratch directory.
+WORK_DIR = tempfile.mkdtemp(prefix="mldataset-tests-")
+os.chdir(WORK_DIR)
+for name, value in {
+    "DEBUG": "true", "ENV": "local", "DB_ASYNC": "true",
+    "REDIS_HOST": "localhost", "REDIS_PORT": "6379", "REDIS_DB": "0",
+    "CELERY_BROKER_URL": "memory://", "CELERY_RESULT_BACKEND": "cache+memory://",
+    "POSTGRES_DB": "mldataset", "POSTGRES_HOST": "localhost", "POSTGRES_PORT": "5432",
+    "POSTGRES_USER": "mldataset", "POSTGRES_PASSWORD": "mldataset",
+}.items():
+    os.environ.setdefault(name, value)
+
+import sqlalchemy as sa  # noqa: E402
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+
+from conf.db_config import session_scope  # noqa: E402
+from database.models.model import Base  # noqa: E402
+from session import DB_URI, async_engine, engine  # noqa: E402
+
+
+def pytest_configure(config):
+    # the models' overlapping backrefs warn on every mapper configuration
+    config.addinivalue_line("filterwarnings", "ignore::sqlalchemy.exc.SAWarning")
+
+
+def alembic_config(url: str) -> Config:
+    config = Config(str(SERVICE_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(SERVICE_DIR / "migrations"))
+    config.set_main_option("sqlalchemy.url", str(url))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated():
+    command.upgrade(alembic_config(DB_URI), "head")
+    yield
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def empty_tables(migrated):
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+
+@pytest.fixture
+def db():
+    with session_scope() as session:
+        yield session
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def async_db():
+    from conf.db_config import async_session_scope
+    async with async_session_scope() as session:
+        yield session
+    await async_engine.dispose()
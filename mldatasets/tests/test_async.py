@@ -0,0 +1,174 @@
+import io
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from starlette.datastructures import Headers, UploadFile
+
+from database.crud.async_crud import AsyncMLDatasetCrud, AsyncMLDatasetFilesCrud, AsyncMLDatasetFolderCrud
+from database.models.model import DATASET_DELETING, MLDatasetFiles
+from schema.ml_schema import MLDatasetFolderSchema, MLDatasetSchema
+from service import deletion
+from service.async_service import AsyncMLDatasetService
+from session import async_engine
+
+pytestmark = pytest.mark.anyio
+
+
+def upload(name: str, content: bytes, content_type: str = "text/plain") -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename=name, size=len(content),
+                      headers=Headers({"content-type": content_type}))
+
+
+async def make_dataset(db, name="images"):
+    ok, obj = await AsyncMLDatasetService.create_database(MLDatasetSchema(name=name), db)
+    assert ok, obj
+    return obj
+
+
+async def make_folder(db, name, dataset_id=0, parent_folder_id=0):
+    ok, obj = await AsyncMLDatasetService.create_folder(
+        MLDatasetFolderSchema(name=name, folder_name=name, dataset_id=dataset_id,
+                              parent_folder_id=parent_folder_id), db)
+    assert ok, obj
+    return obj
+
+
+async def test_crud_create_get_update_delete(async_db):
+    crud = AsyncMLDatasetCrud(async_db)
+    obj = await crud.create({"name": "a", "path": "p", "storage": "local", "visible": "public"})
+    assert (await crud.get(obj.id)).name == "a"
+    await crud.update({"id": obj.id, "name": "b"})
+    assert (await crud.get(obj.id)).name == "b"
+    await crud.delete(obj.id)
+    with pytest.raises(HTTPException) as error:
+        await crud.get(obj.id)
+    assert error.value.status_code == 404
+
+
+async def test_bulk_operations_and_keyset_pages(async_db):
+    crud = AsyncMLDatasetCrud(async_db)
+    rows = await crud.bulk_create([
+        {"name": f"d{n}", "path": f"p{n}", "storage": "local", "visible": "public"} for n in range(7)
+    ])
+    ids = [row.id for row in rows]
+    await crud.bulk_update([{"id": ids[0], "name": "renamed"}])
+
+    seen, cursor = [], None
+    while True:
+        page = await crud.get_all(page_size=3, cursor=cursor)
+        seen += [obj.id for obj in page]
+        cursor = crud.next_cursor(page, 3)
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(ids) and len(seen) == len(set(seen))
+    assert "renamed" in [obj.name for obj in await crud.get_all(page_size=10)]
+
+    assert await crud.bulk_delete(ids[:2]) == 2
+    assert len(await crud.get_all(page_size=10)) == 5
+
+
+async def test_listing_skips_datasets_being_deleted(async_db):
+    crud = AsyncMLDatasetCrud(async_db)
+    kept = await crud.create({"name": "kept", "path": "k", "storage": "local", "visible": "public"})
+    gone = await crud.create({"name": "gone", "path": "g", "storage": "local", "visible": "public"})
+    await crud.mark_deleting(gone.id)
+    assert [obj.id for obj in await crud.get_all_dataset()] == [kept.id]
+
+
+async def test_folder_tree_paths_and_ancestors(async_db):
+    dataset = await make_dataset(async_db)
+    top = await make_folder(async_db, "top", dataset_id=dataset.id)
+    middle = await make_folder(async_db, "middle", parent_folder_id=top.id)
+    leaf = await make_folder(async_db, "leaf", parent_folder_id=middle.id)
+    assert leaf.tree_path == f"/{top.id}/{middle.id}/{leaf.id}/"
+
+    crud = AsyncMLDatasetFolderCrud(async_db)
+    assert [f.id for f in await crud.get_ancestors(leaf.id)] == [top.id, middle.id]
+    tree = await crud.get_tree(dataset_id=dataset.id)
+    assert tree[0]["id"] == top.id
+    assert tree[0]["folders"][0]["folders"][0]["id"] == leaf.id
+
+    await crud.bulk_update([{"id": leaf.id, "tree_path": None}])
+    assert await crud.rebuild_tree_paths() == 3
+    assert (await crud.get(leaf.id)).tree_path == f"/{top.id}/{middle.id}/{leaf.id}/"
+
+
+async def test_search_finds_by_name(async_db):
+    crud = AsyncMLDatasetCrud(async_db)
+    await crud.create({"name": "street cats", "path": "a", "storage": "local", "visible": "public"})
+    await crud.create({"name": "dogs", "path": "b", "storage": "local", "visible": "public"})
+    assert [obj.name for obj in await crud.search("cats")] == ["street cats"]
+
+
+async def test_service_stores_files_and_releases_blobs(async_db):
+    dataset = await make_dataset(async_db)
+    folder = await make_folder(async_db, "docs", dataset_id=dataset.id)
+
+    ok, _ = await AsyncMLDatasetService.create_files(
+        async_db, {"dataset_folder_id": folder.id},
+        [upload("a.txt", b"same"), upload("b.txt", b"same"), upload("c.txt", b"other")])
+    assert ok
+    files = AsyncMLDatasetFilesCrud(async_db)
+    digests = await files.content_hashes(folder_id=folder.id)
+    assert len(set(digests)) == 2
+    refcounts = await files.refcounts(digests)
+    assert sorted(refcounts.values()) == [1, 2]
+    assert all(Path(folder.path, name).read_bytes() for name in ("a.txt", "b.txt", "c.txt"))
+
+    from service import blob_store
+    assert await AsyncMLDatasetService.delete_folder(folder.id, async_db)
+    assert not any(blob_store.blob_path(digest).exists() for digest in digests)
+    assert await files.refcounts(digests) == {}
+
+
+async def test_file_sizes_are_bound_as_strings(async_db):
+    # file_size is a String(10) column and asyncpg refuses ints for it,
+    # while SQLite's text affinity would quietly convert them
+    bound = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO ml_dataset_files"):
+            bound.extend(params["file_size"] for params in context.compiled_parameters)
+
+    dataset = await make_dataset(async_db)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        ok, _ = await AsyncMLDatasetService.create_files(
+            async_db, {"dataset_id": dataset.id}, [upload("a.txt", b"abc"), upload("b.txt", b"de")])
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert ok
+    assert sorted(bound) == ["2", "3"]
+
+
+async def test_service_refuses_uploads_to_a_dataset_being_deleted(async_db):
+    dataset = await make_dataset(async_db)
+    await AsyncMLDatasetCrud(async_db).mark_deleting(dataset.id)
+    assert await AsyncMLDatasetService.create_files(
+        async_db, {"dataset_id": dataset.id}, [upload("a.txt", b"x")]) == (False, "dataset is being deleted")
+
+
+async def test_service_delete_marks_and_purges_in_the_background(async_db, monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(deletion, "schedule", scheduled.append)
+    dataset = await make_dataset(async_db)
+    assert await AsyncMLDatasetService.delete_database(dataset.id, async_db)
+    assert scheduled == [dataset.id]
+    assert (await AsyncMLDatasetCrud(async_db).get(dataset.id)).status == DATASET_DELETING
+    with pytest.raises(HTTPException):
+        await AsyncMLDatasetService.delete_database(dataset.id + 1000, async_db)
+
+
+async def test_nested_folders_of_a_dataset_being_deleted_take_no_uploads(async_db):
+    dataset = await make_dataset(async_db)
+    top = await make_folder(async_db, "top", dataset_id=dataset.id)
+    child = await make_folder(async_db, "child", parent_folder_id=top.id)
+    await AsyncMLDatasetCrud(async_db).mark_deleting(dataset.id)
+
+    assert await AsyncMLDatasetService.create_files(
+        async_db, {"dataset_folder_id": child.id}, [upload("a.txt", b"x")]) == (False, "dataset is being deleted")
+    assert await AsyncMLDatasetService.create_folder(
+        MLDatasetFolderSchema(name="n", folder_name="n", dataset_id=0, parent_folder_id=child.id), async_db
+    ) == (False, "dataset is being deleted")
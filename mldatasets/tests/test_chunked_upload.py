@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+from database.crud.crud import MLDatasetCrud, MLDatasetFilesCrud, MLDatasetFolderCrud
+from database.models.model import MLDatasetFiles
+from schema.ml_schema import ChunkedUploadSchema
+from service import blob_store, chunked_upload
+from service.chunked_upload import COMPLETE, COMPLETING, FAILED, ChunkedUploadService, load_meta, part_size, save_meta
+
+DATA = bytes(range(256)) * 40
+
+
+class Crash(BaseException):
+    """Stands in for the process dying half way through."""
+
+
+@pytest.fixture
+def dataset(db, tmp_path):
+    return MLDatasetCrud(db).create({
+        "name": "d", "path": str(tmp_path / "dataset"), "storage": "local", "visible": "public",
+    })
+
+
+def open_upload(db, dataset, data=DATA, sha256=None, file_name="data.bin"):
+    payload = ChunkedUploadSchema(file_name=file_name, size=len(data), sha256=sha256, dataset_id=dataset.id)
+    return ChunkedUploadService.init(payload, db)["upload_id"]
+
+
+async def body(*pieces):
+    for piece in pieces:
+        yield piece
+
+
+async def upload_all(upload_id, data=DATA, chunk=4096):
+    for offset in range(0, len(data), chunk):
+        await ChunkedUploadService.write_chunk(upload_id, offset, body(data[offset:offset + chunk]))
+
+
+def finish(upload_id):
+    path = chunked_upload.session_root / upload_id
+    meta = load_meta(path)
+    meta["state"] = COMPLETING
+    save_meta(path, meta)
+    ChunkedUploadService.finish(upload_id)
+    return load_meta(path)
+
+
+def stored_files(db):
+    db.expire_all()
+    return db.query(MLDatasetFiles).all()
+
+
+@pytest.mark.anyio
+async def test_chunks_complete_into_a_dataset_file(db, dataset):
+    upload_id = open_upload(db, dataset, sha256=hashlib.sha256(DATA).hexdigest())
+    await upload_all(upload_id)
+    assert ChunkedUploadService.get_upload(upload_id)["offset"] == len(DATA)
+
+    ChunkedUploadService.complete(upload_id)
+    deadline = time.monotonic() + 10
+    while ChunkedUploadService.get_upload(upload_id)["state"] == COMPLETING and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+    meta = ChunkedUploadService.get_upload(upload_id)
+    assert meta["state"] == COMPLETE
+    assert Path(meta["file_path"]).read_bytes() == DATA
+    [row] = stored_files(db)
+    assert row.content_hash == hashlib.sha256(DATA).hexdigest()
+
+
+@pytest.mark.anyio
+async def test_chunk_at_the_wrong_offset_is_refused(db, dataset):
+    upload_id = open_upload(db, dataset)
+    await ChunkedUploadService.write_chunk(upload_id, 0, body(DATA[:100]))
+    with pytest.raises(HTTPException) as error:
+        await ChunkedUploadService.write_chunk(upload_id, 50, body(DATA[50:150]))
+    assert error.value.status_code == 409
+    assert error.value.headers["Upload-Offset"] == "100"
+
+
+@pytest.mark.anyio
+async def test_chunk_failing_its_checksum_is_cut_off(db, dataset):
+    upload_id = open_upload(db, dataset)
+    await ChunkedUploadService.write_chunk(upload_id, 0, body(DATA[:100]))
+    with pytest.raises(HTTPException) as error:
+        await ChunkedUploadService.write_chunk(upload_id, 100, body(DATA[100:200]), chunk_sha256="0" * 64)
+    assert error.value.status_code == 400
+    assert part_size(chunked_upload.session_root / upload_id) == 100
+
+
+class SlowWriter(ThreadPoolExecutor):
+    """Holds every write back until ``release`` is set."""
+
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def submit(self, fn, *args):
+        def slow():
+            self.started.set()
+            self.release.wait(10)
+            return fn(*args)
+        return super().submit(slow)
+
+
+@pytest.mark.anyio
+async def test_cancelled_chunk_is_cut_off_after_its_pending_write(db, dataset, monkeypatch):
+    writer = SlowWriter()
+    monkeypatch.setattr(chunked_upload, "file_writer", writer)
+    monkeypatch.setattr(chunked_upload, "WRITE_SIZE", 1024)
+    upload_id = open_upload(db, dataset)
+
+    task = asyncio.ensure_future(ChunkedUploadService.write_chunk(upload_id, 0, body(DATA[:2048], DATA[2048:4096])))
+    while not writer.started.is_set():
+        await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.sleep(0.05)
+    assert not task.done()
+    writer.release.set()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    writer.shutdown()
+    assert part_size(chunked_upload.session_root / upload_id) == 0
+
+
+@pytest.mark.anyio
+async def test_checksum_mismatch_fails_and_releases_the_blob(db, dataset):
+    upload_id = open_upload(db, dataset, sha256="0" * 64)
+    await upload_all(upload_id)
+    meta = finish(upload_id)
+    assert meta["state"] == FAILED
+    assert meta["detail"] == "file checksum mismatch"
+    assert not blob_store.blob_path(hashlib.sha256(DATA).hexdigest()).exists()
+    assert stored_files(db) == []
+
+
+@pytest.mark.anyio
+async def test_failed_registration_removes_the_file_and_its_blob(db, dataset, monkeypatch):
+    upload_id = open_upload(db, dataset)
+    await upload_all(upload_id)
+
+    def broken(self, payloads):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(MLDatasetFilesCrud, "upload_files", broken)
+    meta = finish(upload_id)
+    assert meta["state"] == FAILED
+    assert not Path(dataset.path, "data.bin").exists()
+    assert not blob_store.blob_path(meta["content_hash"]).exists()
+
+
+@pytest.mark.anyio
+async def test_failure_keeps_a_blob_other_files_share(db, dataset, monkeypatch):
+    first = open_upload(db, dataset, file_name="first.bin")
+    await upload_all(first)
+    assert finish(first)["state"] == COMPLETE
+
+    second = open_upload(db, dataset, file_name="second.bin")
+    await upload_all(second)
+    monkeypatch.setattr(blob_store, "place", lambda *args: (_ for _ in ()).throw(OSError("disk full")))
+    meta = finish(second)
+    assert meta["state"] == FAILED
+    assert blob_store.blob_path(meta["content_hash"]).exists()
+
+
+@pytest.mark.anyio
+async def test_finish_resumes_from_the_blob_after_a_restart(db, dataset, monkeypatch):
+    upload_id = open_upload(db, dataset)
+    await upload_all(upload_id)
+    place = blob_store.place
+
+    def crash(*args):
+        raise Crash()
+
+    monkeypatch.setattr(blob_store, "place", crash)
+    with pytest.raises(Crash):
+        finish(upload_id)
+    path = chunked_upload.session_root / upload_id
+    assert not (path / "data.part").exists()
+    assert load_meta(path)["state"] == COMPLETING
+
+    monkeypatch.setattr(blob_store, "place", place)
+    ChunkedUploadService.finish(upload_id)
+    meta = load_meta(path)
+    assert meta["state"] == COMPLETE
+    assert Path(meta["file_path"]).read_bytes() == DATA
+    assert len(stored_files(db)) == 1
+
+
+@pytest.mark.anyio
+async def test_finish_creates_a_missing_dataset_directory(db, dataset):
+    assert not Path(dataset.path).exists()
+    upload_id = open_upload(db, dataset)
+    await upload_all(upload_id)
+    assert finish(upload_id)["state"] == COMPLETE
+    assert Path(dataset.path, "data.bin").read_bytes() == DATA
+
+
+def test_nested_folder_of_a_dataset_being_deleted_takes_no_upload(db, dataset):
+    folders = MLDatasetFolderCrud(db)
+    top = folders.create_folder({"name": "top", "path": str(Path(dataset.path, "top")), "dataset_id": dataset.id})
+    child = folders.create_folder({"name": "child", "path": str(Path(dataset.path, "child")), "parent_folder_id": top.id})
+    MLDatasetCrud(db).mark_deleting(dataset.id)
+
+    payload = ChunkedUploadSchema(file_name="data.bin", size=len(DATA), dataset_folder_id=child.id)
+    with pytest.raises(HTTPException) as error:
+        ChunkedUploadService.init(payload, db)
+    assert error.value.status_code == 409
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from database.crud.crud import MLDatasetCrud, MLDatasetFolderCrud
+from database.models.model import MLDataset, MLDatasetFolder
+from main import app
+from service import deletion
+
+
+@pytest.fixture
+def dataset(db, tmp_path):
+    obj = MLDatasetCrud(db).create({"name": "d", "path": str(tmp_path / "d"), "storage": "local", "visible": "public"})
+    (tmp_path / "d").mkdir()
+    top = MLDatasetFolderCrud(db).create_folder({"name": "a", "path": "a", "dataset_id": obj.id})
+    MLDatasetFolderCrud(db).create_folder({"name": "b", "path": "b", "parent_folder_id": top.id})
+    return obj
+
+
+@pytest.fixture
+def purges(monkeypatch):
+    futures = []
+    schedule = deletion.schedule
+
+    def recording(dataset_id):
+        future = schedule(dataset_id)
+        futures.append(future)
+        return future
+
+    monkeypatch.setattr(deletion, "schedule", recording)
+    return futures
+
+
+def wait(futures):
+    deadline = time.monotonic() + 10
+    while not futures and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for future in futures:
+        if future is not None:
+            future.result(timeout=10)
+
+
+def test_delete_route_answers_202_and_purges_in_the_background(db, dataset, purges):
+    dataset_id = dataset.id
+    with TestClient(app) as client:
+        response = client.delete(f"/datasets/{dataset_id}")
+        assert response.status_code == 202
+        wait(purges)
+    db.expire_all()
+    assert db.get(MLDataset, dataset_id) is None
+    assert db.query(MLDatasetFolder).count() == 0
+
+
+def test_delete_route_answers_404_for_an_unknown_dataset():
+    with TestClient(app) as client:
+        assert client.delete("/datasets/424242").status_code == 404
+
+
+def test_startup_resumes_purges_left_by_a_previous_process(db, dataset, purges):
+    dataset_id = dataset.id
+    MLDatasetCrud(db).mark_deleting(dataset_id)
+    with TestClient(app):
+        wait(purges)
+    db.expire_all()
+    assert db.get(MLDataset, dataset_id) is None
@@ -0,0 +1,65 @@
+import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from database.crud.crud import MLDatasetCrud
+from database.models.model import DATASET_DELETING, MLDataset
+
+START = datetime.datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def datasets(db):
+    # pairs of rows share a modified_at so the id has to break the tie
+    rows = [
+        {"name": f"d{n}", "path": f"p{n}", "storage": "local", "visible": "public",
+         "modified_at": START + datetime.timedelta(minutes=n // 2)}
+        for n in range(25)
+    ]
+    MLDatasetCrud(db).bulk_create(rows, returning=False)
+    return db.query(MLDataset).order_by(MLDataset.modified_at.desc(), MLDataset.id.desc()).all()
+
+
+def walk(crud, page_size):
+    pages, cursor = [], None
+    while True:
+        items = crud.get_all(page_size=page_size, cursor=cursor)
+        pages.append([item.id for item in items])
+        cursor = crud.next_cursor(items, page_size)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("page_size", [1, 4, 5, 25, 30])
+def test_cursor_pages_cover_every_row_once_in_order(db, datasets, page_size):
+    pages = walk(MLDatasetCrud(db), page_size)
+    assert [i for page in pages for i in page] == [obj.id for obj in datasets]
+    assert all(len(page) == page_size for page in pages[:-1])
+
+
+def test_first_page_matches_offset_pagination(db, datasets):
+    crud = MLDatasetCrud(db)
+    assert [o.id for o in crud.get_all(page=1, page_size=7)] == [o.id for o in datasets[:7]]
+    assert [o.id for o in crud.get_all(page=3, page_size=7)] == [o.id for o in datasets[14:21]]
+
+
+def test_cursor_round_trips(datasets):
+    assert MLDatasetCrud.decode_cursor(MLDatasetCrud.encode_cursor(datasets[3])) == (
+        datasets[3].modified_at, datasets[3].id)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "W10", "WyJ4IiwgMV0"])
+def test_invalid_cursor_is_a_400(db, cursor):
+    with pytest.raises(HTTPException) as error:
+        MLDatasetCrud(db).get_all(cursor=cursor)
+    assert error.value.status_code == 400
+
+
+def test_dataset_listing_skips_datasets_being_deleted(db, datasets):
+    crud = MLDatasetCrud(db)
+    crud.mark_deleting(datasets[0].id)
+    listed = crud.get_all_dataset(page_size=100)
+    assert datasets[0].id not in [o.id for o in listed]
+    assert len(listed) == len(datasets) - 1
+    assert db.get(MLDataset, datasets[0].id).status == DATASET_DELETING
@@ -0,0 +1,29 @@
+import sqlalchemy as sa
+from alembic import command
+
+from conftest import alembic_config
+
+
+def test_folder_tree_paths_are_backfilled(tmp_path):
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    config = alembic_config(url)
+    command.upgrade(config, "0005")
+    engine = sa.create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(sa.text("INSERT INTO ml_dataset (id, name, path, storage) VALUES (1, 'd', 'd', 'local')"))
+        conn.execute(sa.text(
+            "INSERT INTO ml_dataset_folder (id, name, path, dataset_id, parent_folder_id) VALUES "
+            "(1, 'a', 'a', 1, NULL), (2, 'b', 'b', NULL, 1), (3, 'c', 'c', NULL, 2), (4, 'e', 'e', 1, NULL)"
+        ))
+
+    command.upgrade(config, "head")
+    with engine.connect() as conn:
+        paths = dict(conn.execute(sa.text("SELECT id, tree_path FROM ml_dataset_folder")).all())
+        indexes = {index["name"] for index in sa.inspect(conn).get_indexes("ml_dataset_folder")}
+    assert paths == {1: "/1/", 2: "/1/2/", 3: "/1/2/3/", 4: "/4/"}
+    assert "ix_ml_dataset_folder_tree_path" in indexes
+
+    command.downgrade(config, "0005")
+    with engine.connect() as conn:
+        assert "tree_path" not in {column["name"] for column in sa.inspect(conn).get_columns("ml_dataset_folder")}
+    engine.dispose()
@@ -0,0 +1,128 @@
+import random
+import warnings
+
+import pytest
+import sqlalchemy as sa
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+
+from conftest import alembic_config
+from database.crud.tree import (
+    content_hashes_statement, dataset_files_batch, dataset_folders_batch, refcounts_statement, subtree_statements,
+)
+from database.models.model import Base, MLDataset, MLDatasetFiles, MLDatasetFolder
+
+DATASETS = 10
+FOLDERS_PER_DATASET = 100
+FILES = 20000
+
+
+def seed(engine):
+    """Random-ish tree per dataset: each folder hangs under an earlier one
+    (or the dataset root), files are spread over all folders."""
+    rng = random.Random(0)
+    now = sa.func.current_timestamp()
+    with engine.begin() as conn:
+        conn.execute(sa.insert(MLDataset.__table__), [
+            {"id": d, "name": f"dataset {d}", "path": f"static/mldatabase/dataset {d}",
+             "storage": "local", "visible": "public"}
+            for d in range(1, DATASETS + 1)
+        ])
+        folders = []
+        folder_id = 0
+        for dataset_id in range(1, DATASETS + 1):
+            first = folder_id + 1
+            for _ in range(FOLDERS_PER_DATASET):
+                folder_id += 1
+                parent = rng.randint(first, folder_id - 1) if folder_id > first and rng.random() < 0.8 else None
+                folders.append({"id": folder_id, "name": f"folder {folder_id}", "path": f"f{folder_id}",
+                                "dataset_id": dataset_id, "parent_folder_id": parent})
+        conn.execute(sa.insert(MLDatasetFolder.__table__), folders)
+        conn.execute(sa.insert(MLDatasetFiles.__table__), [
+            {"file_name": f"img_{n}.png", "file_path": f"p/img_{n}.png", "file_size": "0.1",
+             "content_type": "image/png", "content_hash": f"{n % (FILES // 2):064x}",
+             "dataset_id": folder["dataset_id"], "dataset_folder_id": folder["id"]}
+            for n, folder in ((n, rng.choice(folders)) for n in range(FILES))
+        ])
+        for table in (MLDataset.__table__, MLDatasetFolder.__table__, MLDatasetFiles.__table__):
+            conn.execute(sa.update(table).values(created_at=now, modified_at=now))
+        conn.execute(sa.text("ANALYZE"))
+
+
+@pytest.fixture(scope="module")
+def seeded(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}"
+    command.upgrade(alembic_config(url), "head")
+    engine = sa.create_engine(url)
+    seed(engine)
+    yield engine
+    engine.dispose()
+
+
+def hot_queries() -> dict:
+    """name -> (statement, index the plan must use)."""
+    folders, files = subtree_statements(folder_id=1)
+    dataset_folders, _ = subtree_statements(dataset_id=1)
+
+    def listing(Model):
+        return sa.select(Model).order_by(sa.desc(Model.modified_at), sa.desc(Model.id)).limit(10)
+
+    def keyset(Model):
+        return listing(Model).where(sa.tuple_(Model.modified_at, Model.id) < sa.tuple_(sa.func.current_timestamp(), 10**9))
+
+    return {
+        "dataset listing": (listing(MLDataset), "ix_ml_dataset_modified_at_id"),
+        "file listing": (listing(MLDatasetFiles), "ix_ml_dataset_files_modified_at_id"),
+        "file keyset page": (keyset(MLDatasetFiles), "ix_ml_dataset_files_modified_at_id"),
+        "folder subtree": (folders, "ix_ml_dataset_folder_parent_folder_id"),
+        "dataset tree roots": (dataset_folders, "ix_ml_dataset_folder_dataset_parent"),
+        "subtree files": (files, "ix_ml_dataset_files_folder_file_name"),
+        "dataset files": (
+            sa.select(MLDatasetFiles.id).where(MLDatasetFiles.dataset_id == 1),
+            "ix_ml_dataset_files_dataset_id",
+        ),
+        "folder files by name": (
+            sa.select(MLDatasetFiles).where(MLDatasetFiles.dataset_folder_id == 1).order_by(MLDatasetFiles.file_name),
+            "ix_ml_dataset_files_folder_file_name",
+        ),
+        "blob refcounts": (refcounts_statement([f"{n:064x}" for n in range(20)]), "ix_ml_dataset_files_content_hash"),
+        "dataset content hashes": (content_hashes_statement(dataset_id=1), "ix_ml_dataset_files_dataset_id"),
+        "purge file batch": (dataset_files_batch(1, 5000), "ix_ml_dataset_files_dataset_id"),
+        "purge folder batch": (dataset_folders_batch(1, 5000), "ix_ml_dataset_folder_parent_folder_id"),
+        "folder by path": (
+            sa.select(MLDatasetFolder.id).where(MLDatasetFolder.tree_path == "/1/"),
+            "ix_ml_dataset_folder_tree_path",
+        ),
+    }
+
+
+def explain(conn, statement) -> list:
+    sql = str(statement.compile(conn, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+@pytest.mark.parametrize("name", list(hot_queries()))
+def test_hot_query_uses_its_index(seeded, name):
+    statement, index = hot_queries()[name]
+    with seeded.connect() as conn:
+        plan = explain(conn, statement)
+    assert any(index in step for step in plan), f"{name}: expected {index} in {' | '.join(plan)}"
+
+
+def same_dialect(obj, name, type_, reflected, compare_to):
+    # the PostgreSQL-only search indexes are not expected on SQLite
+    ddl_if = getattr(obj, "_ddl_if", None)
+    return ddl_if is None or ddl_if.dialect in (None, "sqlite")
+
+
+def test_migrations_create_the_indexes_the_models_declare(seeded):
+    with seeded.connect() as conn, warnings.catch_warnings():
+        # SQLite cannot reflect the (PostgreSQL-only) expression indexes
+        warnings.filterwarnings("ignore", message="autogenerate skipping")
+        context = MigrationContext.configure(conn, opts={"compare_type": False, "include_object": same_dialect})
+        diff = [
+            f"{change[0]} {change[1].name}" for change in compare_metadata(context, Base.metadata)
+            if isinstance(change, tuple) and change[0] in ("add_index", "remove_index")
+        ]
+    assert diff == []
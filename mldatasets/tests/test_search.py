@@ -0,0 +1,65 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from database.crud.crud import MLDatasetCrud
+from database.models.model import MLDataset
+from database.models.search import encode_search_cursor, search_statement
+
+
+@pytest.fixture
+def crud(db):
+    return MLDatasetCrud(db)
+
+
+def add(crud, *names):
+    crud.bulk_create([
+        {"name": name, "path": f"p{n}", "storage": "local", "visible": "public"} for n, name in enumerate(names)
+    ], returning=False)
+
+
+def test_closer_matches_rank_first(crud):
+    add(crud, "street cats and other animals", "cats", "dogs", "cats in hats")
+    items = crud.search("cats")
+    assert [obj.name for obj in items] == ["cats", "cats in hats", "street cats and other animals"]
+    assert items[0].search_rank > items[1].search_rank > items[2].search_rank
+
+
+def test_words_match_by_prefix_and_all_must_match(crud):
+    add(crud, "catalog scans", "cat pictures", "concatenated")
+    assert sorted(obj.name for obj in crud.search("ca")) == ["cat pictures", "catalog scans"]
+    assert [obj.name for obj in crud.search("cat pic")] == ["cat pictures"]
+    assert crud.search("  ") == []
+
+
+def test_cursor_pages_continue_after_equal_ranks(crud):
+    # equal ranks everywhere, so only the id keeps the pages apart
+    add(crud, *[f"cat {n}" for n in range(7)])
+    everything = crud.search("cat", page_size=10)
+    assert len({obj.search_rank for obj in everything}) == 1
+
+    seen, cursor = [], None
+    while True:
+        page = crud.search("cat", page_size=3, cursor=cursor)
+        seen += [obj.id for obj in page]
+        cursor = crud.search_cursor(page, 3)
+        if cursor is None:
+            break
+    assert seen == [obj.id for obj in everything]
+
+
+def test_broken_cursor_is_refused(crud):
+    with pytest.raises(HTTPException) as error:
+        crud.search("cat", cursor="not-a-cursor")
+    assert error.value.status_code == 400
+
+
+def test_postgres_cursor_compares_ranks_as_real():
+    class Row:
+        search_rank = 0.0607927
+        id = 5
+
+    statement = search_statement(MLDataset, "cat", "postgresql", cursor=encode_search_cursor(Row))
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "ts_rank(" in sql
+    assert "CAST(%(param_1)s AS REAL)" in sql
@@ -0,0 +1,105 @@
+import hashlib
+import io
+from pathlib import Path
+
+import pytest
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, UploadFile
+
+from database.crud.crud import MLDatasetCrud, MLDatasetFilesCrud
+from database.models.model import MLDatasetFiles
+from schema.ml_schema import MLDatasetFolderSchema, MLDatasetSchema
+from service import blob_store
+from service.service import MLDatasetService
+
+
+def upload(name: str, content: bytes, content_type: str = "text/plain") -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename=name, size=len(content),
+                      headers=Headers({"content-type": content_type}))
+
+
+def make_dataset(db, name="images"):
+    ok, obj = MLDatasetService.create_database(MLDatasetSchema(name=name), db)
+    assert ok, obj
+    return obj
+
+
+def make_folder(db, name, dataset_id=0, parent_folder_id=0):
+    ok, obj = MLDatasetService.create_folder(
+        MLDatasetFolderSchema(name=name, folder_name=name, dataset_id=dataset_id,
+                              parent_folder_id=parent_folder_id), db)
+    assert ok, obj
+    return obj
+
+
+def test_files_are_written_and_recorded(db):
+    dataset = make_dataset(db)
+    ok, _ = MLDatasetService.create_files(
+        db, {"dataset_id": dataset.id}, [upload("a.txt", b"abc"), upload("a.txt", b"de", "image/png")])
+    assert ok
+    rows = db.query(MLDatasetFiles).order_by(MLDatasetFiles.file_name).all()
+    assert [(row.file_name, row.file_size, row.content_type) for row in rows] == [
+        ("a.txt", "3", "text/plain"), ("a_1.txt", "2", "image/png"),
+    ]
+    assert Path(dataset.path, "a.txt").read_bytes() == b"abc"
+    assert Path(dataset.path, "a_1.txt").read_bytes() == b"de"
+
+
+def test_a_failed_write_leaves_nothing_behind(db, monkeypatch):
+    dataset = make_dataset(db)
+    store_file = blob_store.store_file
+
+    def failing(file, location):
+        if location.name == "bad.txt":
+            raise OSError("disk full")
+        return store_file(file, location)
+
+    monkeypatch.setattr(blob_store, "store_file", failing)
+    assert MLDatasetService.create_files(
+        db, {"dataset_id": dataset.id}, [upload("good.txt", b"g"), upload("bad.txt", b"b")]) is False
+    assert db.query(MLDatasetFiles).count() == 0
+    assert not Path(dataset.path, "good.txt").exists()
+    assert not blob_store.blob_path(hashlib.sha256(b"g").hexdigest()).exists()
+
+
+@pytest.mark.anyio
+async def test_runs_off_the_event_loop(db):
+    dataset = make_dataset(db)
+    ok, _ = await run_in_threadpool(
+        MLDatasetService.create_files, db, {"dataset_id": dataset.id}, [upload("a.txt", b"abc")])
+    assert ok
+
+
+def test_identical_files_share_one_blob(db):
+    dataset = make_dataset(db)
+    folder = make_folder(db, "docs", dataset_id=dataset.id)
+    ok, _ = MLDatasetService.create_files(
+        db, {"dataset_folder_id": folder.id},
+        [upload("a.txt", b"same"), upload("b.txt", b"same"), upload("c.txt", b"other")])
+    assert ok
+
+    files = MLDatasetFilesCrud(db)
+    digests = files.content_hashes(folder_id=folder.id)
+    assert len(set(digests)) == 2
+    assert sorted(files.refcounts(digests).values()) == [1, 2]
+    assert [Path(folder.path, name).read_bytes() for name in ("a.txt", "b.txt", "c.txt")] == [b"same", b"same", b"other"]
+    assert all(blob_store.blob_path(digest).exists() for digest in digests)
+
+    assert MLDatasetService.delete_folder(folder.id, db)
+    assert not any(blob_store.blob_path(digest).exists() for digest in digests)
+
+
+def test_nested_folders_of_a_dataset_being_deleted_take_no_uploads(db):
+    dataset = make_dataset(db)
+    top = make_folder(db, "top", dataset_id=dataset.id)
+    child = make_folder(db, "child", parent_folder_id=top.id)
+    assert child.dataset_id is None
+    MLDatasetCrud(db).mark_deleting(dataset.id)
+
+    for folder in (top, child):
+        assert MLDatasetService.create_files(
+            db, {"dataset_folder_id": folder.id}, [upload("a.txt", b"x")]) == (False, "dataset is being deleted")
+    assert MLDatasetService.create_folder(
+        MLDatasetFolderSchema(name="n", folder_name="n", dataset_id=0, parent_folder_id=child.id), db
+    ) == (False, "dataset is being deleted")
+    assert db.query(MLDatasetFiles).count() == 0
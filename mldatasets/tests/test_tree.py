@@ -0,0 +1,91 @@
+import pytest
+
+from database.crud.crud import MLDatasetCrud, MLDatasetFilesCrud, MLDatasetFolderCrud
+from database.crud.tree import ancestor_ids, child_tree_path
+from database.models.model import MLDatasetFolder
+
+
+@pytest.fixture
+def tree(db):
+    """dataset
+         a/            a.txt
+           b/          b1.txt b2.txt
+             c/
+           d/
+         e/            e.txt
+    """
+    dataset = MLDatasetCrud(db).create({"name": "t", "path": "t", "storage": "local", "visible": "public"})
+    crud = MLDatasetFolderCrud(db)
+    folders = {}
+
+    def folder(name, parent=None):
+        folders[name] = crud.create_folder({
+            "name": name, "path": name,
+            "dataset_id": None if parent else dataset.id,
+            "parent_folder_id": folders[parent].id if parent else None,
+        })
+
+    for name, parent in (("a", None), ("b", "a"), ("c", "b"), ("d", "a"), ("e", None)):
+        folder(name, parent)
+    MLDatasetFilesCrud(db).upload_files([
+        {"file_name": name, "file_path": name, "file_size": "1", "content_type": "text/plain",
+         "dataset_folder_id": folders[owner].id}
+        for name, owner in (("a.txt", "a"), ("b2.txt", "b"), ("b1.txt", "b"), ("e.txt", "e"))
+    ])
+    return dataset, folders
+
+
+def names(nodes):
+    return [node["name"] for node in nodes]
+
+
+def test_tree_path_helpers():
+    assert child_tree_path(None, 3) == "/3/"
+    assert child_tree_path("/3/17/", 42) == "/3/17/42/"
+    assert ancestor_ids("/3/17/42/") == [3, 17, 42]
+    assert ancestor_ids(None) == []
+
+
+def test_create_folder_stores_the_path_of_ids(db, tree):
+    _, folders = tree
+    a, b, c = folders["a"], folders["b"], folders["c"]
+    assert a.tree_path == f"/{a.id}/"
+    assert c.tree_path == f"/{a.id}/{b.id}/{c.id}/"
+
+
+def test_dataset_tree_nests_folders_and_sorted_files(db, tree):
+    dataset, _ = tree
+    roots = MLDatasetFolderCrud(db).get_tree(dataset_id=dataset.id)
+    assert names(roots) == ["a", "e"]
+    a = roots[0]
+    assert names(a["folders"]) == ["b", "d"]
+    assert names(a["folders"][0]["folders"]) == ["c"]
+    assert [f["file_name"] for f in a["folders"][0]["files"]] == ["b1.txt", "b2.txt"]
+    assert [f["file_name"] for f in a["files"]] == ["a.txt"]
+
+
+def test_folder_subtree_starts_at_that_folder(db, tree):
+    _, folders = tree
+    subtree = MLDatasetFolderCrud(db).get_tree(folder_id=folders["b"].id)
+    assert names(subtree) == ["b"]
+    assert names(subtree[0]["folders"]) == ["c"]
+    assert MLDatasetFolderCrud(db).get_tree(folder_id=10**6) == []
+
+
+def test_ancestors_run_from_the_top_down(db, tree):
+    _, folders = tree
+    crud = MLDatasetFolderCrud(db)
+    assert [f.name for f in crud.get_ancestors(folders["c"].id)] == ["a", "b"]
+    assert crud.get_ancestors(folders["a"].id) == []
+
+
+def test_rebuild_tree_paths_repairs_missing_and_stale_paths(db, tree):
+    _, folders = tree
+    crud = MLDatasetFolderCrud(db)
+    crud.bulk_update([{"id": folders["b"].id, "tree_path": None}, {"id": folders["c"].id, "tree_path": "/999/"}])
+    assert crud.rebuild_tree_paths() == len(folders)
+    db.expire_all()
+    paths = {folder.name: folder.tree_path for folder in db.query(MLDatasetFolder)}
+    a, b, c = (folders[name].id for name in "abc")
+    assert paths["b"] == f"/{a}/{b}/"
+    assert paths["c"] == f"/{a}/{b}/{c}/"
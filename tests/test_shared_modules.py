@@ -0,0 +1,26 @@
+"""Modules every service carries its own copy of (each service image is
+built from its own directory) must stay identical."""
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+SERVICES = ("auth", "gateway", "mldatasets", "websocket")
+
+
+@pytest.mark.parametrize("service", [s for s in SERVICES if s != "gateway"])
+def test_log_module_matches_gateway(service):
+    assert (ROOT / service / "log.py").read_bytes() == (ROOT / "gateway" / "log.py").read_bytes()
+
+
+def test_spooling_module_matches_gateway():
+    assert (ROOT / "mldatasets" / "spooling.py").read_bytes() == (ROOT / "gateway" / "spooling.py").read_bytes()
+
+
+@pytest.mark.parametrize("service", ["auth", "mldatasets"])
+def test_fastjson_module_matches_gateway(service):
+    assert (ROOT / service / "fastjson.py").read_bytes() == (ROOT / "gateway" / "fastjson.py").read_bytes()
+
+
+def test_prometheus_module_matches_gateway():
+    assert (ROOT / "mldatasets" / "prometheus.py").read_bytes() == (ROOT / "gateway" / "prometheus.py").read_bytes()
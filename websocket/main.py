@@ -1,6 +1,9 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, WebSocketException
 from typing import Set
 import json
+import struct
+import logging
+from log import setup_logging
 
 
 # Sending data
@@ -20,6 +23,9 @@ import json
 
 
 
+setup_logging("websocket")
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 class ConnectionManager:
@@ -72,6 +78,7 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             try:
                 message = await websocket.receive_text() #raw data liya 
+                logger.debug("message", extra={"size": len(message), "sample": 0.01})
                 await websocket.send(message.upper())
                 # message_type = message.get("type")
                 
@@ -95,8 +102,46 @@ async def websocket_endpoint(websocket: WebSocket):
                 break
                 
             except Exception as e:
+                logger.warning("message handling error", extra={"error": str(e)})
                 await websocket.send_text(f"Error: {str(e)}")
                 continue
                 
     except Exception as e:
         raise WebSocketException(code=1003, reason=str(e))
+
+
+# Multiplexed endpoint used by the gateway when WEBSOCKET_MULTIPLEX is on.
+# Frames are binary: 4-byte channel id | 1-byte opcode | payload.
+MUX_HEADER = struct.Struct("!IB")
+OP_OPEN, OP_TEXT, OP_BYTES, OP_CLOSE = 1, 2, 3, 4
+
+
+def mux_frame(channel: int, op: int, payload: bytes = b"") -> bytes:
+    return MUX_HEADER.pack(channel, op) + payload
+
+
+@app.websocket("/mux")
+async def websocket_mux_endpoint(websocket: WebSocket):
+    await manager.connect(websocket)
+    channels: Set[int] = set()
+    try:
+        while True:
+            frame = await websocket.receive_bytes()
+            channel, op = MUX_HEADER.unpack_from(frame)
+            payload = frame[MUX_HEADER.size:]
+
+            if op == OP_OPEN:
+                channels.add(channel)
+                await websocket.send_bytes(mux_frame(channel, OP_TEXT, b"Connected to WebSocket server"))
+            elif op == OP_CLOSE:
+                channels.discard(channel)
+            elif channel not in channels:
+                continue
+            elif op == OP_TEXT:
+                message = payload.decode("utf-8")
+                await websocket.send_bytes(mux_frame(channel, OP_TEXT, message.upper().encode("utf-8")))
+            elif op == OP_BYTES:
+                await websocket.send_bytes(mux_frame(channel, OP_BYTES, payload))
+
+    except WebSocketDisconnect:
+        manager.disconnect(websocket)